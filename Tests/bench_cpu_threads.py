@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Find the throughput-optimal split of CPU cores between concurrent transcriptions.
+
+For each number of concurrent jobs and each thread count per job, runs that
+many transcriptions of the same audio at once (each model loaded with
+cpu_threads=threads) and prints a matrix of total throughput in audio
+seconds per wall-clock second. Cells where jobs x threads exceeds the core
+count show the cost of oversubscription. Use the best cell to choose
+JOB_WORKERS or worker.py --threads: with a full queue each job gets
+TRANSCRIBE_CPU_CORES / workers threads. Without --audio,
+synthetic speech-like audio is generated.
+
+    python Tests/bench_cpu_threads.py --minutes 2 --model tiny --jobs 1,2,4 --threads 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_long_form import synthetic_audio
+from faster_whisper import decode_audio
+from cpu_partition import core_allocator
+from gen import model_cache, run_whisper
+
+SAMPLE_RATE = 16000
+
+def transcribe(model, audio):
+    segments, _ = run_whisper(model, audio)
+    return sum(1 for _ in segments)  # Segments are decoded lazily
+
+def run(model_size, audio, jobs, threads):
+    # Jobs with the same thread count share one model, loaded with a worker per job
+    model = model_cache.acquire(model_size, "int8", threads)
+    try:
+        transcribe(model, audio[:SAMPLE_RATE * 5])  # Warm-up
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(lambda _: transcribe(model, audio), range(jobs)))
+        return time.perf_counter() - start
+    finally:
+        model_cache.release(model_size, "int8", threads)
+        model_cache.clear()
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='Concurrent jobs x threads per job throughput matrix')
+    parser.add_argument('--audio', help='audio or video file (default: synthetic audio)')
+    parser.add_argument('--minutes', type=float, default=2, help='length of synthetic audio (default: 2)')
+    parser.add_argument('--model', default='tiny', help='model size (default: tiny)')
+    parser.add_argument('--jobs', default='1,2,4', help='concurrent jobs (default: 1,2,4)')
+    parser.add_argument('--threads', default=','.join(str(t) for t in (1, 2, 4, 8) if t <= cores) or '1',
+                        help='threads per job (default: powers of two up to the core count)')
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio) if args.audio else synthetic_audio(args.minutes)
+    seconds = len(audio) / SAMPLE_RATE
+    job_counts = [int(j) for j in args.jobs.split(',')]
+    thread_counts = [int(t) for t in args.threads.split(',')]
+    print(f"🎧 {seconds / 60:.1f} min of audio, {args.model} model, {cores} CPU core(s)")
+    print("Audio seconds transcribed per second (all jobs together); * marks jobs x threads > cores")
+    print('jobs \\ threads'.ljust(16) + ''.join(f'{t:>10}' for t in thread_counts))
+
+    best = None
+    for jobs in job_counts:
+        row = f'{jobs:<16}'
+        for threads in thread_counts:
+            # The model is loaded with cores / threads CTranslate2 workers: one per concurrent job
+            core_allocator.cores = jobs * threads
+            throughput = jobs * seconds / run(args.model, audio, jobs, threads)
+            mark = '*' if jobs * threads > cores else ' '
+            row += f'{throughput:>9.1f}{mark}'
+            if best is None or throughput > best[0]:
+                best = (throughput, jobs, threads)
+        print(row)
+
+    throughput, jobs, threads = best
+    print(f"🏆 Best: {jobs} job(s) x {threads} thread(s), {throughput:.1f}x realtime in total")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare transcription throughput of the sequential and batched engines.
+
+For each model size, transcribes the same audio with the sequential engine
+and with the batched engine at each batch size, and prints the wall-clock
+time and real-time factor (audio seconds per second of processing). Use the
+result to pick WHISPER_ENGINE / WHISPER_BATCH_SIZE per model size. Without
+--audio, synthetic speech-like audio is generated (fine for throughput, not
+for transcript quality).
+
+    python Tests/bench_engines.py --minutes 5 --models tiny,base --batch-sizes 4,8,16
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_long_form import synthetic_audio
+from faster_whisper import decode_audio
+from gen import model_cache, run_whisper
+
+SAMPLE_RATE = 16000
+
+def run(model, audio, engine, batch_size):
+    start = time.perf_counter()
+    segments, _ = run_whisper(model, audio, engine, batch_size)
+    count = sum(1 for _ in segments)  # Segments are decoded lazily
+    return time.perf_counter() - start, count
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential vs batched engine throughput benchmark')
+    parser.add_argument('--audio', help='audio or video file (default: synthetic audio)')
+    parser.add_argument('--minutes', type=float, default=5, help='length of synthetic audio (default: 5)')
+    parser.add_argument('--models', default='tiny,base', help='comma-separated model sizes (default: tiny,base)')
+    parser.add_argument('--batch-sizes', default='4,8,16', help='batched engine batch sizes (default: 4,8,16)')
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio) if args.audio else synthetic_audio(args.minutes)
+    seconds = len(audio) / SAMPLE_RATE
+    print(f"🎧 {seconds / 60:.1f} min of audio, {os.cpu_count()} CPU core(s)")
+    print(f"{'model':<10}{'engine':<16}{'seconds':>10}{'x realtime':>12}{'segments':>10}")
+
+    for model_size in args.models.split(','):
+        model = model_cache.acquire(model_size)
+        try:
+            # Warm-up run so model initialisation is not timed
+            run(model, audio[:SAMPLE_RATE * 10], 'sequential', 1)
+            configs = [('sequential', 1)] + [('batched', int(b)) for b in args.batch_sizes.split(',')]
+            for engine, batch_size in configs:
+                elapsed, count = run(model, audio, engine, batch_size)
+                label = engine if engine == 'sequential' else f'batched x{batch_size}'
+                print(f"{model_size:<10}{label:<16}{elapsed:>10.1f}{seconds / elapsed:>12.1f}{count:>10}")
+        finally:
+            model_cache.release(model_size)
+
+if __name__ == "__main__":
+    main()
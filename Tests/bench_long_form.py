@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark long-form parallel transcription against the serial path.
+
+Transcribes the same audio once with gen.transcribe_audio and then with
+long_form.transcribe_long_audio for each process count, and prints the
+wall-clock time and speedup. Set LONG_FORM_PROCESSES to the best count to
+turn the mode on. Without --audio, synthetic speech-like audio
+(noise bursts separated by pauses) is generated, which is enough to compare
+timings but not transcript quality.
+
+    python Tests/bench_long_form.py --minutes 20 --model tiny --processes 1,2,4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import long_form
+from gen import transcribe_audio
+from faster_whisper import decode_audio
+
+def synthetic_audio(minutes, seed=0):
+    rng = np.random.default_rng(seed)
+    sr = long_form.SAMPLE_RATE
+    n_samples = int(minutes * 60 * sr)
+    parts = []
+    total = 0
+    while total < n_samples:
+        # 2-8 s "utterances" of band-limited noise, then a 0.3-1.5 s pause
+        burst = rng.standard_normal(int(rng.uniform(2, 8) * sr)).astype(np.float32)
+        burst = np.convolve(burst, np.ones(8) / 8, mode='same') * 0.3
+        pause = np.zeros(int(rng.uniform(0.3, 1.5) * sr), dtype=np.float32)
+        parts.extend([burst, pause])
+        total += len(burst) + len(pause)
+    return np.concatenate(parts)[:n_samples]
+
+def main():
+    cores = os.cpu_count() or 1
+    default_processes = ','.join(str(p) for p in (1, 2, 4, 8, 16) if p <= cores) or '1'
+    parser = argparse.ArgumentParser(description='Long-form transcription speedup benchmark')
+    parser.add_argument('--audio', help='audio or video file (default: synthetic audio)')
+    parser.add_argument('--minutes', type=float, default=10, help='length of synthetic audio (default: 10)')
+    parser.add_argument('--model', default='tiny', help='Whisper model size (default: tiny)')
+    parser.add_argument('--processes', default=default_processes,
+                        help=f'comma-separated process counts (default: {default_processes})')
+    parser.add_argument('--chunk-seconds', type=float, default=60,
+                        help='target chunk length (default: 60, shorter than production to get enough chunks)')
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio) if args.audio else synthetic_audio(args.minutes)
+    minutes = len(audio) / long_form.SAMPLE_RATE / 60
+    print(f"🎧 {minutes:.1f} min of audio, model {args.model}, {cores} CPU core(s)")
+
+    start = time.perf_counter()
+    serial = transcribe_audio(audio, args.model)
+    baseline = time.perf_counter() - start
+    print(f"{'mode':<14}{'seconds':>10}{'speedup':>10}{'segments':>10}")
+    print(f"{'serial':<14}{baseline:>10.1f}{1.0:>10.2f}{len(serial):>10}")
+
+    for processes in [int(p) for p in args.processes.split(',')]:
+        # Includes starting the job's processes and loading their models, as every long-form job does
+        start = time.perf_counter()
+        subtitles = long_form.transcribe_long_audio(audio, args.model, processes=processes,
+                                                    chunk_seconds=args.chunk_seconds)
+        elapsed = time.perf_counter() - start
+        print(f"{f'{processes} process(es)':<14}{elapsed:>10.1f}{baseline / elapsed:>10.2f}{len(subtitles):>10}")
+
+if __name__ == "__main__":
+    main()
@@ -28,9 +28,10 @@ def inspect_database():
         
         if job_count > 0:
             c.execute('''SELECT id, url, video_title, status, 
-                                LENGTH(subtitle_content) as content_length,
+                                LENGTH(s.content) as content_length,
                                 created_at, completed_at 
-                         FROM jobs ORDER BY created_at DESC''')
+                         FROM jobs LEFT JOIN job_subtitles s ON s.job_id = jobs.id
+                         ORDER BY created_at DESC''')
             jobs = c.fetchall()
             
             for job in jobs:
@@ -46,7 +47,7 @@ def inspect_database():
                 if status == 'completed' and content_len and content_len > 0:
                     # Show first few lines of subtitle content
                     c2 = conn.cursor()
-                    c2.execute('SELECT subtitle_content FROM jobs WHERE id = ?', (job_id,))
+                    c2.execute('SELECT content FROM job_subtitles WHERE job_id = ?', (job_id,))
                     content = c2.fetchone()[0]
                     if content:
                         lines = content.split('\n')[:6]  # First 6 lines
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Database migration script to fix URL constraint for upload functionality
+(superseded by migrations.py, which applies this automatically at startup)
 """
 
 import sqlite3
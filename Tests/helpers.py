@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Shared setup for the tests: a fresh database and audio folder, and a stand-in Whisper model
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_prep
+import db
+import gen
+from gen import ModelCache
+
+def use_temp_db(folder=None):
+    # Point db at a new, migrated database (in `folder` if given); returns the previous DB_PATH to restore
+    original = db.DB_PATH
+    db.DB_PATH = os.path.join(folder or tempfile.mkdtemp(), 'test.db')
+    db.init_db()
+    return original
+
+def use_temp_audio_folder(folder=None):
+    # Decode job audio into `folder`/audio; returns the previous AUDIO_FOLDER to restore
+    original = audio_prep.AUDIO_FOLDER
+    audio_prep.AUDIO_FOLDER = os.path.join(folder or tempfile.mkdtemp(), 'audio')
+    return original
+
+def one_segment(model_size, seconds):
+    return [{'start': 0.0, 'end': 1.0, 'text': f' {model_size} words '}]
+
+class FakeModel:
+    """Stand-in WhisperModel.
+
+    segments(model_size, seconds) gives the segment dicts heard in `seconds`
+    of audio (the array's length, or `duration` for file paths); VAD drops
+    `silence` seconds of it. The options of every call are kept in `calls`,
+    and `during`, when set, runs before the first segment is decoded.
+    """
+
+    def __init__(self, model_size='base', segments=one_segment, duration=None, silence=0.0, calls=None,
+                 during=None):
+        self.model_size = model_size
+        self.segments = segments
+        self.duration = duration
+        self.silence = silence
+        self.calls = [] if calls is None else calls
+        self.during = during
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        seconds = self.duration if self.duration is not None else len(audio) / audio_prep.SAMPLE_RATE
+
+        def segments():
+            if self.during:
+                self.during()
+            for segment in self.segments(self.model_size, seconds):
+                yield SimpleNamespace(**segment)
+        return segments(), SimpleNamespace(duration=seconds, duration_after_vad=seconds - self.silence)
+
+def use_fake_model(make_model=FakeModel):
+    # Load make_model(model_size) for every model; returns the previous model cache to restore
+    original = gen.model_cache
+    gen.model_cache = ModelCache(budget_mb=100000, loader=lambda model_size, *rest: make_model(model_size))
+    return original
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Database migration script to add new columns for video upload functionality
+(superseded by migrations.py, which applies this automatically at startup)
 """
 
 import sqlite3
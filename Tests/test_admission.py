@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test load-adaptive model selection at submit time
+"""
+
+import functools
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import admission
+from scheduler import pick_next
+from test_video_metadata import FakeCache, URL
+
+def test_idle_queue_keeps_the_requested_model():
+    assert admission.decide('small', 600, 0, 2, mode='downgrade', slo_seconds=900) == ('small', None, None)
+
+def test_busy_queue_downgrades_within_the_slo():
+    # Ten minutes of queued work on one worker: only base still finishes a 10 min video within 15 min
+    backlog = 600 * admission.BASE_MODEL_SPEED
+    model, decision, note = admission.decide('medium', 600, backlog, 1, mode='downgrade', slo_seconds=900,
+                                             min_model='tiny')
+    assert (model, decision) == ('base', 'downgraded')
+    assert admission.estimate_finish_seconds(model, 600, backlog, 1) <= 900
+    assert 'medium' in note
+
+    # Never below the floor, even if the SLO is still missed
+    model, decision, _ = admission.decide('medium', 600, 10 ** 7, 1, mode='downgrade', slo_seconds=900,
+                                          min_model='small')
+    assert (model, decision) == ('small', 'downgraded')
+    assert admission.decide('medium', 600, 10 ** 7, 1, mode='off', slo_seconds=900)[1] is None
+    assert admission.smaller_models('large-v3', 'tiny') == ['medium', 'small', 'base', 'tiny']
+
+def test_free_worker_means_no_queue_wait():
+    # 40 min of queued work per worker, which alone misses the 15 min target
+    backlog = 4 * 2400 * admission.BASE_MODEL_SPEED
+    # ...all of it one job running on one of four workers: the new job starts at once
+    assert admission.decide('small', 600, backlog, 4, jobs_ahead=1, mode='downgrade', slo_seconds=900,
+                            min_model='tiny')[1] is None
+    # Four jobs ahead of it: it waits for the backlog
+    assert admission.decide('small', 600, backlog, 4, jobs_ahead=4, mode='downgrade', slo_seconds=900,
+                            min_model='tiny')[1] == 'downgraded'
+
+def test_deferred_jobs_wait_for_an_idle_queue():
+    upgrade = {'id': 'u', 'user_id': 1, 'cost': 10, 'waited': 3600, 'deferred': True}
+    normal = {'id': 'n', 'user_id': 2, 'cost': 5000, 'waited': 0}
+    assert pick_next([upgrade, normal], {}, {})['id'] == 'n'
+    assert pick_next([upgrade], {}, {})['id'] == 'u'
+
+def test_submit_records_the_decision():
+    with FakeCache():
+        import app
+        original = (app.INLINE_WORKERS, app.job_executor.db_path, app.admission_decide, app.TRANSCRIBE_WORKERS,
+                    app.job_executor.workers)
+        app.INLINE_WORKERS = False
+        # One worker process transcribes; the web process's own executor size does not count
+        app.TRANSCRIBE_WORKERS, app.job_executor.workers = 1, 64
+        app.job_executor.db_path = db.DB_PATH
+        try:
+            user_id = db.create_user('busy', 'busy@example.com', 'secret')
+            client = app.app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+            # Hours of medium-model work already waiting
+            for _ in range(3):
+                db.create_job(user_id, None, 'medium', 'upload', 'x.mp4', 1, 'x.mp4', duration_seconds=3600)
+
+            app.admission_decide = functools.partial(admission.decide, mode='downgrade', slo_seconds=900,
+                                                     min_model='tiny')
+            result = client.post('/submit-job', json={'url': URL, 'model_size': 'medium'}).get_json()
+            job = db.get_job(result['job_id'])
+            assert job['admission_decision'] == 'downgraded' and job['requested_model_size'] == 'medium'
+            assert job['model_size'] != 'medium' and job['admission_note']
+            assert result['admission']['model_size'] == job['model_size']
+
+            # Users can opt out
+            result = client.post('/submit-job', json={'url': 'https://youtu.be/aaaaaaaaaaa', 'model_size': 'medium',
+                                                      'allow_downgrade': False}).get_json()
+            job = db.get_job(result['job_id'])
+            assert job['model_size'] == 'medium' and job['admission_decision'] is None
+
+            # Draft mode also queues the requested model as a deferred upgrade
+            app.admission_decide = functools.partial(admission.decide, mode='draft', slo_seconds=900,
+                                                     min_model='tiny')
+            result = client.post('/submit-job', json={'url': 'https://youtu.be/ccccccccccc',
+                                                      'model_size': 'medium'}).get_json()
+            draft, upgrade = db.get_job(result['job_id']), db.get_job(result['upgrade_job_id'])
+            assert draft['admission_decision'] == 'draft' and draft['model_size'] != 'medium'
+            assert (upgrade['model_size'], upgrade['admission_decision']) == ('medium', 'upgrade')
+            assert upgrade['upgrade_of_job_id'] == draft['id'] and upgrade['leader_job_id'] is None
+            # The upgrade does not count towards the backlog new jobs wait behind
+            assert app.job_executor.backlog_cost() == sum(
+                admission.job_cost(j['duration_seconds'], j['model_size'])
+                for j in db.get_connection().execute("SELECT * FROM jobs WHERE admission_decision IS NOT 'upgrade'"))
+        finally:
+            (app.INLINE_WORKERS, app.job_executor.db_path, app.admission_decide, app.TRANSCRIBE_WORKERS,
+             app.job_executor.workers) = original
+
+if __name__ == "__main__":
+    test_idle_queue_keeps_the_requested_model()
+    test_busy_queue_downgrades_within_the_slo()
+    test_free_worker_means_no_queue_wait()
+    test_deferred_jobs_wait_for_an_idle_queue()
+    test_submit_records_the_decision()
+    print("✅ Admission tests passed")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test one-time audio extraction, reuse of decoded audio and its purge
+"""
+
+import os
+import sys
+import tempfile
+
+import av
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import audio_prep
+from helpers import use_temp_audio_folder, use_temp_db
+
+def write_stereo_sine(path, seconds=2, rate=44100):
+    # Stereo 44.1 kHz AAC, like the audio track of a typical upload
+    with av.open(path, 'w') as container:
+        stream = container.add_stream('aac', rate=rate)
+        stream.layout = 'stereo'
+        t = np.arange(int(seconds * rate)) / rate
+        tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        samples = np.stack([tone, tone])
+        for start in range(0, samples.shape[1], 1024):
+            frame = av.AudioFrame.from_ndarray(np.ascontiguousarray(samples[:, start:start + 1024]),
+                                               format='fltp', layout='stereo')
+            frame.rate = rate
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+def test_extract_audio_to_16k_mono():
+    folder = tempfile.mkdtemp()
+    source = os.path.join(folder, 'talk.m4a')
+    write_stereo_sine(source)
+    dest = os.path.join(folder, 'talk.f32')
+    duration = audio_prep.extract_audio(source, dest)
+    audio = audio_prep.load_audio(dest)
+    assert abs(duration - 2) < 0.1
+    assert audio.dtype == np.float32 and audio.ndim == 1
+    assert len(audio) == int(round(duration * audio_prep.SAMPLE_RATE))
+    # Both channels are mixed down to one (the tone is still there, not clipped)
+    assert 0.3 < np.abs(audio[8000:24000]).max() < 1.0
+
+def test_source_is_deleted_and_decoded_audio_reused():
+    folder = tempfile.mkdtemp()
+    original = use_temp_db(folder), use_temp_audio_folder(folder)
+    try:
+        user_id = db.create_user('audio', 'audio@example.com', 'secret')
+        source = os.path.join(folder, 'talk.m4a')
+        write_stereo_sine(source)
+        job_id = db.create_job(user_id, None, 'tiny', 'upload', source, 1, 'talk')
+        first = audio_prep.prepare_audio(job_id, source)
+        assert not os.path.exists(source)
+
+        # A retry finds the decoded audio although the upload is gone
+        again = audio_prep.prepare_audio(job_id, source)
+        assert np.array_equal(first, again)
+        assert db.get_job_audio(job_id).endswith(f'{job_id}.f32')
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER = original
+
+def test_purge_expired_audio():
+    folder = tempfile.mkdtemp()
+    original = use_temp_db(folder), use_temp_audio_folder(folder)
+    try:
+        user_id = db.create_user('purge', 'purge@example.com', 'secret')
+        jobs = []
+        for name in ('done', 'running'):
+            source = os.path.join(folder, f'{name}.m4a')
+            write_stereo_sine(source, seconds=1)
+            job_id = db.create_job(user_id, None, 'tiny', 'upload', source, 1, name)
+            audio_prep.prepare_audio(job_id, source)
+            jobs.append(job_id)
+        done, running = jobs
+        db.update_job_status(done, 'completed', 'done', subtitle_content='1\n')
+        conn = db.get_connection()
+        with conn:
+            conn.execute("UPDATE jobs SET completed_at = datetime('now', '-2 hours') WHERE id = ?", (done,))
+
+        assert audio_prep.purge_expired_audio(retention_seconds=3600) == 1
+        assert db.get_job_audio(done) is None
+        assert not os.path.exists(os.path.join(audio_prep.AUDIO_FOLDER, f'{done}.f32'))
+        assert audio_prep.decoded_audio(running) is not None
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER = original
+
+if __name__ == "__main__":
+    test_extract_audio_to_16k_mono()
+    test_source_is_deleted_and_decoded_audio_reused()
+    test_purge_expired_audio()
+    print("✅ Audio extraction tests passed")
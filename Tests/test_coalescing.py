@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test coalescing of identical in-flight YouTube jobs and job cancellation
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from job_queue import JobExecutor
+from helpers import use_temp_db
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+VIDEO_ID = 'dQw4w9WgXcQ'
+
+def make_users(count):
+    return [db.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(count)]
+
+def test_identical_jobs_share_one_leader():
+    original = use_temp_db()
+    try:
+        alice, bob = make_users(2)
+        leader, none = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        follower, leader_id = db.create_coalesced_job(bob, URL, 'base', VIDEO_ID)
+        other_model, other_leader = db.create_coalesced_job(bob, URL, 'small', VIDEO_ID)
+        assert none is None and leader_id == leader and other_leader is None
+
+        # Only leaders are queued, so the follower is never claimed
+        executor = JobExecutor(None, db.DB_PATH)
+        assert executor.depth() == 2
+        claimed = [executor.claim()['id'], executor.claim()['id']]
+        assert sorted(claimed) == sorted([leader, other_model]) and executor.claim() is None
+
+        db.update_job_status(leader, 'processing', 'Downloading audio...')
+        assert db.get_job(follower)['progress'] == 'Downloading audio...'
+        db.update_job_status(leader, 'completed', 'done', 'Title', '1\nsrt\n\n')
+        assert db.get_job(follower)['status'] == 'completed'
+        assert db.get_job_subtitles(follower) == '1\nsrt\n\n'
+
+        # Finished jobs no longer attract followers
+        _, leader_id = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        assert leader_id is None
+    finally:
+        db.DB_PATH = original
+
+def test_cancelling_follower_keeps_leader():
+    original = use_temp_db()
+    try:
+        alice, bob = make_users(2)
+        leader, _ = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        follower, _ = db.create_coalesced_job(bob, URL, 'base', VIDEO_ID)
+
+        assert db.cancel_job(follower)
+        assert not db.cancel_job(follower)
+        db.update_job_status(leader, 'completed', 'done', 'Title', 'srt')
+        assert db.get_job(leader)['status'] == 'completed'
+        assert db.get_job(follower)['status'] == 'cancelled'
+        assert db.get_job_subtitles(follower) is None
+    finally:
+        db.DB_PATH = original
+
+def test_cancelling_pending_leader_promotes_follower():
+    original = use_temp_db()
+    try:
+        alice, bob, carol = make_users(3)
+        leader, _ = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        first, _ = db.create_coalesced_job(bob, URL, 'base', VIDEO_ID)
+        second, _ = db.create_coalesced_job(carol, URL, 'base', VIDEO_ID)
+
+        assert db.cancel_job(leader)
+        assert db.get_job(first)['leader_job_id'] is None
+        assert db.get_job(second)['leader_job_id'] == first
+
+        executor = JobExecutor(None, db.DB_PATH)
+        assert executor.claim()['id'] == first and executor.claim() is None
+    finally:
+        db.DB_PATH = original
+
+def test_cancelled_running_leader_is_abandoned_only_without_followers():
+    original = use_temp_db()
+    try:
+        alice, bob = make_users(2)
+        leader, _ = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        follower, _ = db.create_coalesced_job(bob, URL, 'base', VIDEO_ID)
+        JobExecutor(None, db.DB_PATH).claim()
+
+        assert db.cancel_job(leader)
+        assert not db.is_job_abandoned(leader)
+        db.update_job_status(leader, 'completed', 'done', 'Title', 'srt')
+        assert db.get_job(follower)['status'] == 'completed'
+        assert db.get_job(leader)['status'] == 'cancelled'
+
+        solo, _ = db.create_coalesced_job(alice, URL, 'small', VIDEO_ID)
+        JobExecutor(None, db.DB_PATH).claim()
+        assert db.cancel_job(solo) and db.is_job_abandoned(solo)
+    finally:
+        db.DB_PATH = original
+
+def test_requeue_expired_leader_keeps_followers_attached():
+    original = use_temp_db()
+    try:
+        alice, bob = make_users(2)
+        leader, _ = db.create_coalesced_job(alice, URL, 'base', VIDEO_ID)
+        follower, _ = db.create_coalesced_job(bob, URL, 'base', VIDEO_ID)
+        executor = JobExecutor(None, db.DB_PATH, lease_seconds=-1)
+        executor.claim()
+        db.update_job_status(leader, 'processing', 'Downloading audio...')
+
+        assert executor.requeue_expired() == 1
+        assert db.get_job(leader)['status'] == 'pending'
+        follower_job = db.get_job(follower)
+        assert follower_job['status'] == 'pending' and follower_job['leader_job_id'] == leader
+    finally:
+        db.DB_PATH = original
+
+if __name__ == "__main__":
+    test_identical_jobs_share_one_leader()
+    test_cancelling_follower_keeps_leader()
+    test_cancelling_pending_leader_promotes_follower()
+    test_cancelled_running_leader_is_abandoned_only_without_followers()
+    test_requeue_expired_leader_keeps_followers_attached()
+    print("✅ Coalescing tests passed")
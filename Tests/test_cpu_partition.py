@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test that concurrent transcriptions split the CPU cores instead of each using all of them
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gen
+import long_form
+from cpu_partition import CoreAllocator
+from gen import ModelCache
+from helpers import FakeModel, use_fake_model
+
+def test_shares_follow_the_load_and_never_oversubscribe():
+    # A job on an idle host gets every core
+    allocator = CoreAllocator(cores=8, slots=8)
+    with allocator.reserve() as alone:
+        assert alone == 8
+        # Running jobs keep their threads, one starting meanwhile gets what is left (at least one)
+        with allocator.reserve() as late:
+            assert late == 1 and allocator.reserved == 9
+    assert (allocator.active, allocator.reserved) == (0, 0)
+
+    # With jobs waiting, each of 4 workers on 8 cores gets a 2-thread share
+    queue = [3]
+    allocator = CoreAllocator(cores=8, slots=4, waiting=lambda: queue[0])
+    with allocator.reserve() as first:
+        assert first == 2
+        with allocator.reserve() as second, allocator.reserve() as third, allocator.reserve() as fourth:
+            assert (second, third, fourth, allocator.reserved) == (2, 2, 2, 8)
+        # The queue drained: a new job gets a bigger share of the free cores, still a cores // k share
+        queue[0] = 0
+        with allocator.reserve() as again:
+            assert again == 4 and allocator.reserved == 6
+            with allocator.reserve() as last:
+                assert last == 2 and allocator.reserved == 8
+    assert (allocator.active, allocator.reserved) == (0, 0)
+
+def test_workers_configure_their_part_of_the_cores():
+    # worker.py --processes 2 --threads 1 with TRANSCRIBE_CPU_CORES=4: 2 threads per job
+    import worker
+    allocator = CoreAllocator()
+    executor = SimpleNamespace(workers=1, depth=lambda: 5)
+    assert worker.share_cores(executor, 2, allocator, host_cores=4) == 2
+    with allocator.reserve() as threads:
+        assert threads == 2 and allocator.slot_threads == 2
+
+def test_long_form_pool_fits_the_reserved_threads():
+    sizes = []
+
+    def get_pool(processes):
+        sizes.append(processes)
+        return ThreadPoolExecutor(max_workers=processes)
+
+    original = long_form.core_allocator, long_form.get_pool, use_fake_model()
+    long_form.core_allocator = CoreAllocator(cores=4, slots=2, waiting=lambda: 1)
+    long_form.get_pool = get_pool
+    try:
+        audio = np.zeros(130 * long_form.SAMPLE_RATE, dtype=np.float32)
+        assert long_form.transcribe_long_audio(audio, 'tiny', processes=8, chunk_seconds=60)
+        # A 2-thread share runs 2 single-threaded processes, not 8
+        assert sizes == [2] and gen.model_cache.cached_keys() == [('tiny', 'int8', 1)]
+    finally:
+        long_form.core_allocator, long_form.get_pool, gen.model_cache = original
+
+def test_concurrent_transcriptions_get_explicit_thread_counts():
+    loaded = []
+    started = threading.Barrier(2)
+
+    def loader(model_size, compute_type, cpu_threads):
+        loaded.append(cpu_threads)
+        # Both jobs are running at once before either yields a segment
+        return FakeModel(model_size, duration=1.0, during=lambda: started.wait(timeout=5))
+
+    original = gen.model_cache, gen.core_allocator
+    gen.model_cache = ModelCache(budget_mb=100000, loader=loader)
+    gen.core_allocator = CoreAllocator(cores=4, slots=2, waiting=lambda: 1)
+    try:
+        # Both jobs get the same 2-thread share, so they share one model instance
+        first = threading.Thread(target=gen.transcribe_audio, args=('a.wav', 'tiny'))
+        first.start()
+        while gen.core_allocator.active == 0:
+            time.sleep(0.01)
+        assert gen.transcribe_audio('b.wav', 'tiny')[0]['text'] == 'tiny words'
+        first.join()
+        assert loaded == [2] and gen.core_allocator.reserved == 0
+    finally:
+        gen.model_cache, gen.core_allocator = original
+
+if __name__ == "__main__":
+    test_shares_follow_the_load_and_never_oversubscribe()
+    test_workers_configure_their_part_of_the_cores()
+    test_long_form_pool_fits_the_reserved_threads()
+    test_concurrent_transcriptions_get_explicit_thread_counts()
+    print("✅ CPU partition tests passed")
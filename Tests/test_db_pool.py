@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test the pooled SQLite data layer (per-thread connections, WAL readers)
+"""
+
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from helpers import use_temp_db
+
+def test_connections_are_pooled_per_thread():
+    original = use_temp_db()
+    try:
+        check_connections_are_pooled_per_thread()
+    finally:
+        db.DB_PATH = original
+
+def check_connections_are_pooled_per_thread():
+    main_conn = db.get_connection()
+    assert db.get_connection() is main_conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_conn
+
+    assert main_conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+def test_readers_are_not_blocked_by_a_writer():
+    original = use_temp_db()
+    try:
+        check_readers_are_not_blocked_by_a_writer()
+    finally:
+        db.DB_PATH = original
+
+def check_readers_are_not_blocked_by_a_writer():
+    user_id = db.create_user('reader', 'reader@example.com', 'secret')
+    job_id = db.create_job(user_id, 'https://youtu.be/abcdefghijk')
+
+    writer_ready = threading.Event()
+    reader_done = threading.Event()
+    seen = []
+
+    def writer():
+        conn = db.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("UPDATE jobs SET progress = 'writing' WHERE id = ?", (job_id,))
+        writer_ready.set()
+        reader_done.wait(5)
+        conn.commit()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writer_ready.wait(5)
+
+    # The write transaction is still open, the read must not wait for it
+    seen.append(db.get_job(job_id))
+    reader_done.set()
+    thread.join()
+
+    assert seen[0][6] == 'Queued for processing'
+    assert db.get_job(job_id)[6] == 'writing'
+
+def test_job_queries_skip_subtitle_bodies():
+    original = use_temp_db()
+    try:
+        user_id = db.create_user('lister', 'lister@example.com', 'secret')
+        job_id = db.create_job(user_id, 'https://youtu.be/abcdefghijk')
+        db.update_job_status(job_id, 'completed', 'done', 'Title', '1\n00:00:00,000 --> 00:00:01,000\nHi\n\n')
+
+        job = db.get_job(job_id)
+        assert job['status'] == 'completed'
+        assert 'subtitle_content' not in job.keys()
+        assert 'subtitle_content' not in db.get_user_jobs(user_id)[0][0].keys()
+        assert db.get_job_subtitles(job_id).endswith('Hi\n\n')
+    finally:
+        db.DB_PATH = original
+
+def test_user_jobs_are_keyset_paginated():
+    original = use_temp_db()
+    try:
+        user_id = db.create_user('pager', 'pager@example.com', 'secret')
+        conn = db.get_connection()
+        with conn:
+            for i in range(45):
+                # Several jobs share a created_at second, the id breaks the tie
+                conn.execute('''INSERT INTO jobs (id, user_id, url, status, created_at)
+                                VALUES (?, ?, 'https://youtu.be/x', ?, ?)''',
+                             (f'job-{i:02}', user_id, 'failed' if i % 3 == 0 else 'completed',
+                              f'2025-01-01 00:00:{i // 4:02}'))
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = db.get_user_jobs(user_id, limit=10, cursor=cursor)
+            seen.extend(job['id'] for job in page)
+            if cursor is None:
+                break
+        assert seen == [f'job-{i:02}' for i in reversed(range(45))]
+
+        failed, cursor = db.get_user_jobs(user_id, limit=100, statuses=['failed'])
+        assert len(failed) == 15 and cursor is None
+    finally:
+        db.DB_PATH = original
+
+if __name__ == "__main__":
+    test_connections_are_pooled_per_thread()
+    test_readers_are_not_blocked_by_a_writer()
+    test_job_queries_skip_subtitle_bodies()
+    test_user_jobs_are_keyset_paginated()
+    print("✅ Database pool tests passed")
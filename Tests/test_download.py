@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test audio stream selection and the parallel ranged downloader against a local HTTP server
+"""
+
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gen
+import ranged_download
+
+class StandInServer:
+    # Serves one file with Range support, optionally cutting off the first response for each
+    # range starting at a multiple of `flaky` bytes
+    def __init__(self, data, ranges=True, flaky=None):
+        self.data = data
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                header = self.headers.get('Range')
+                server.requests.append(header)
+                match = re.fullmatch(r'bytes=(\d+)-(\d+)', header or '')
+                if not ranges or not match:
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(server.data)))
+                    self.end_headers()
+                    self.wfile.write(server.data)
+                    return
+                start, end = int(match[1]), min(int(match[2]), len(server.data) - 1)
+                body = server.data[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(server.data)}')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                # The first request for a range dies half way through
+                if flaky and start % flaky == 0 and len(body) > 1 and server.requests.count(header) == 1:
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/audio.webm'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def test_parallel_download_retries_cut_off_ranges():
+    data = os.urandom(100_000)
+    server = StandInServer(data, flaky=16_384)
+    try:
+        dest = os.path.join(tempfile.mkdtemp(), 'audio.webm')
+        ranged_download.download(server.url, dest, connections=4, chunk_bytes=16_384, retries=3)
+        assert open(dest, 'rb').read() == data
+        assert not os.path.exists(dest + '.part.chunks')
+        # A retry asks only for the bytes the cut-off response did not deliver
+        assert 'bytes=8192-16383' in server.requests
+    finally:
+        server.close()
+
+def test_interrupted_download_resumes():
+    data = os.urandom(50_000)
+    server = StandInServer(data)
+    try:
+        dest = os.path.join(tempfile.mkdtemp(), 'audio.webm')
+        # An earlier attempt got chunks 0 and 2 before it stopped
+        with open(dest + '.part', 'wb') as f:
+            f.write(data[:10_000] + b'\0' * 10_000 + data[20_000:30_000] + b'\0' * 20_000)
+        with open(dest + '.part.chunks', 'w') as f:
+            f.write('chunk=10000\n0\n2\n')
+        ranged_download.download(server.url, dest, chunk_bytes=10_000)
+        assert open(dest, 'rb').read() == data
+        assert sorted(r for r in server.requests if r != 'bytes=0-0') == [
+            'bytes=10000-19999', 'bytes=30000-39999', 'bytes=40000-49999']
+    finally:
+        server.close()
+
+def test_server_without_ranges():
+    data = os.urandom(30_000)
+    server = StandInServer(data, ranges=False)
+    try:
+        dest = os.path.join(tempfile.mkdtemp(), 'audio.webm')
+        ranged_download.download(server.url, dest, chunk_bytes=4096)
+        assert open(dest, 'rb').read() == data
+    finally:
+        server.close()
+
+def fake_stream(itag, bitrate, subtype='webm', url=None, is_otf=False):
+    return SimpleNamespace(itag=itag, bitrate=bitrate, subtype=subtype, url=url, is_otf=is_otf, is_drc=False)
+
+def test_select_lowest_adequate_audio_stream():
+    streams = [fake_stream(140, 130_000, 'mp4'), fake_stream(249, 57_000), fake_stream(250, 74_000),
+               fake_stream(251, 142_000), fake_stream(599, 31_000, 'mp4')]
+    assert gen.select_audio_stream(streams, 48_000).itag == 249
+    assert gen.select_audio_stream(streams, 100_000).itag == 140
+    # Nothing good enough: take the best there is
+    assert gen.select_audio_stream(streams[-1:], 48_000).itag == 599
+    assert gen.select_audio_stream([], 48_000) is None
+
+def test_download_audio_picks_stream():
+    data = os.urandom(20_000)
+    server = StandInServer(data)
+    try:
+        streams = [fake_stream(251, 142_000, url=server.url + '?itag=251'),
+                   fake_stream(249, 57_000, url=server.url + '?itag=249')]
+        yt = SimpleNamespace(title='Talk', streams=SimpleNamespace(filter=lambda only_audio: streams))
+        original = gen.fetch_video
+        gen.fetch_video = lambda url: yt
+        output_dir = tempfile.mkdtemp()
+        try:
+            path = gen.download_audio('https://www.youtube.com/watch?v=dQw4w9WgXcQ', output_dir, name='job-1')
+        finally:
+            gen.fetch_video = original
+        assert path == os.path.join(output_dir, 'job-1.webm')
+        assert open(path, 'rb').read() == data
+    finally:
+        server.close()
+
+def test_leftover_downloads_are_removed():
+    output_dir = tempfile.mkdtemp()
+    for name in ('job-1.webm.part', 'job-1.webm.part.chunks', 'job-2.webm', 'job-3.webm.part', 'job-3.webm.part.chunks'):
+        open(os.path.join(output_dir, name), 'wb').close()
+    # A failed job's partial download goes right away
+    gen.remove_downloads('job-1', output_dir)
+    assert sorted(os.listdir(output_dir)) == ['job-2.webm', 'job-3.webm.part', 'job-3.webm.part.chunks']
+
+    # Partial downloads nobody wrote to for a day are purged, recent ones may still be resumed
+    day_ago = time.time() - 25 * 3600
+    for name in ('job-3.webm.part', 'job-3.webm.part.chunks'):
+        os.utime(os.path.join(output_dir, name), (day_ago, day_ago))
+    open(os.path.join(output_dir, 'job-4.webm.part'), 'wb').close()
+    assert gen.purge_stale_downloads(output_dir=output_dir) == 2
+    assert sorted(os.listdir(output_dir)) == ['job-2.webm', 'job-4.webm.part']
+
+if __name__ == "__main__":
+    test_parallel_download_retries_cut_off_ranges()
+    test_interrupted_download_resumes()
+    test_server_without_ranges()
+    test_select_lowest_adequate_audio_stream()
+    test_download_audio_picks_stream()
+    test_leftover_downloads_are_removed()
+    print("✅ Download tests passed")
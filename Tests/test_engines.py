@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the per-job choice of decoding engine (sequential / batched)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import gen
+from helpers import FakeModel, use_fake_model, use_temp_db
+from job_queue import JobExecutor
+
+def hi(model_size, seconds):
+    return [{'start': 0.0, 'end': 1.0, 'text': ' hi'}]
+
+def test_engine_selects_pipeline():
+    calls, batched = [], []
+    original_pipeline = gen.BatchedInferencePipeline
+
+    class FakePipeline:
+        def __init__(self, model):
+            self.model = model
+
+        def transcribe(self, audio, **kwargs):
+            batched.append(kwargs)
+            return self.model.transcribe(audio)
+
+    original_cache = use_fake_model(lambda model_size: FakeModel(model_size, hi, duration=1.0, calls=calls))
+    gen.BatchedInferencePipeline = FakePipeline
+    try:
+        assert gen.transcribe_audio('a.wav', 'tiny') == [{'start': 0.0, 'end': 1.0, 'text': 'hi'}]
+        assert len(calls) == 1 and not batched
+
+        gen.transcribe_audio('a.wav', 'tiny', engine='batched', batch_size=16)
+        assert batched[0]['batch_size'] == 16 and batched[0]['vad_filter'] is True
+    finally:
+        gen.model_cache, gen.BatchedInferencePipeline = original_cache, original_pipeline
+
+def test_options_are_validated():
+    from app import parse_transcribe_options
+    assert parse_transcribe_options({}) == {}
+    assert parse_transcribe_options({'engine': 'batched', 'batch_size': '16'}) == {'engine': 'batched', 'batch_size': 16}
+    for bad in ({'engine': 'turbo'}, {'batch_size': 'lots'}, {'batch_size': 0}, {'batch_size': 65}):
+        try:
+            parse_transcribe_options(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f'{bad} should be rejected')
+
+def test_options_reach_the_worker():
+    original = use_temp_db()
+    try:
+        user_id = db.create_user('engine', 'engine@example.com', 'secret')
+        url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        batched, _ = db.create_coalesced_job(user_id, url, 'base', 'dQw4w9WgXcQ', {'engine': 'batched'})
+        # Different settings give a different result, so the jobs are not coalesced
+        sequential, leader = db.create_coalesced_job(user_id, url, 'base', 'dQw4w9WgXcQ')
+        assert leader is None
+
+        executor = JobExecutor(None, db.DB_PATH)
+        first, second = executor.claim(), executor.claim()
+        assert (first['id'], db.decode_options(first['options'])) == (batched, {'engine': 'batched'})
+        assert (second['id'], db.decode_options(second['options'])) == (sequential, {})
+    finally:
+        db.DB_PATH = original
+
+if __name__ == "__main__":
+    test_engine_selects_pipeline()
+    test_options_are_validated()
+    test_options_reach_the_worker()
+    print("✅ Engine tests passed")
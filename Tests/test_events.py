@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the job change event broker behind /events and /events/poll
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from events import EventBroker, changes_since, EVENTS_RETRY_SECONDS
+from helpers import use_temp_db
+from test_video_metadata import FakeCache
+
+def drain(events):
+    received = []
+    while not events.empty():
+        received.append(events.get_nowait())
+    return received
+
+def test_updates_are_pushed_to_the_owner_once():
+    original = use_temp_db()
+    broker = EventBroker()
+    db.job_change_listeners.append(broker.publish)
+    try:
+        alice = db.create_user('alice', 'alice@example.com', 'secret')
+        bob = db.create_user('bob', 'bob@example.com', 'secret')
+        job_id = db.create_job(alice, 'https://youtu.be/dQw4w9WgXcQ')
+        alice_events, bob_events = broker.subscribe(alice), broker.subscribe(bob)
+
+        db.update_job_status(job_id, 'processing', 'Downloading audio...', 'Title')
+        db.update_job_status(job_id, 'processing', 'Downloading audio...', 'Title')  # no change
+        received = drain(alice_events)
+        assert [(e['id'], e['progress'], e['video_title']) for e in received] == \
+            [(job_id, 'Downloading audio...', 'Title')]
+        assert drain(bob_events) == []
+
+        # The poller re-reads recent rows but does not repeat delivered events
+        broker.poll_once()
+        assert drain(alice_events) == []
+
+        broker.unsubscribe(alice, alice_events)
+        db.update_job_status(job_id, 'completed', 'done', 'Title', 'srt')
+        assert drain(alice_events) == []
+    finally:
+        db.job_change_listeners.remove(broker.publish)
+        db.DB_PATH = original
+
+def test_poller_picks_up_changes_from_other_processes():
+    original = use_temp_db()
+    broker = EventBroker()
+    try:
+        alice = db.create_user('alice', 'alice@example.com', 'secret')
+        job_id = db.create_job(alice, 'https://youtu.be/dQw4w9WgXcQ')
+        events = broker.subscribe(alice)
+
+        # update_job_status in another process only notifies that process
+        db.update_job_status(job_id, 'processing', 'Generating subtitles with AI...')
+        assert drain(events) == []
+        broker.poll_once()
+        received = drain(events)
+        assert len(received) == 1 and received[0]['progress'] == 'Generating subtitles with AI...'
+    finally:
+        db.DB_PATH = original
+
+def test_long_poll_returns_missed_changes():
+    original = use_temp_db()
+    broker = EventBroker()
+    try:
+        alice = db.create_user('alice', 'alice@example.com', 'secret')
+        job_id = db.create_job(alice, 'https://youtu.be/dQw4w9WgXcQ')
+        since = time.time()
+        assert broker.wait(alice, since, timeout=0.05) == []
+
+        db.update_job_status(job_id, 'processing', 'Downloading audio...')
+        assert [e['id'] for e in changes_since(alice, since)] == [job_id]
+        assert [e['status'] for e in broker.wait(alice, since, timeout=0.05)] == ['processing']
+    finally:
+        db.DB_PATH = original
+
+def test_full_server_turns_streams_into_short_polls():
+    with FakeCache():
+        import app
+        original = use_temp_db(), app.broker.max_streams, app.EVENTS_LONG_POLL_SECONDS
+        app.broker.max_streams, app.EVENTS_LONG_POLL_SECONDS = 1, 0.05
+        try:
+            user_id = db.create_user('alice', 'alice@example.com', 'secret')
+            client = app.app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+
+            stream = client.get('/events', buffered=False)
+            assert stream.status_code == 200 and app.broker.open_streams == 1
+
+            # No thread is left for another stream or a long poll
+            refused = client.get('/events')
+            assert refused.status_code == 503 and refused.headers['Retry-After'] == str(EVENTS_RETRY_SECONDS)
+            started = time.time()
+            result = client.get(f'/events/poll?since={time.time()}').get_json()
+            assert result['success'] and result['retry_after'] == EVENTS_RETRY_SECONDS
+            assert time.time() - started < 1
+
+            stream.close()
+            assert app.broker.open_streams == 0
+            result = client.get(f'/events/poll?since={time.time()}').get_json()
+            assert result['retry_after'] is None and app.broker.open_streams == 0
+        finally:
+            db.DB_PATH, app.broker.max_streams, app.EVENTS_LONG_POLL_SECONDS = original
+
+if __name__ == "__main__":
+    test_updates_are_pushed_to_the_owner_once()
+    test_poller_picks_up_changes_from_other_processes()
+    test_long_poll_returns_missed_changes()
+    test_full_server_turns_streams_into_short_polls()
+    print("✅ Event tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the durable job queue (atomic claims, leases, recovery after restarts)
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobExecutor
+from migrations import migrate
+
+def make_db():
+    db_path = os.path.join(tempfile.mkdtemp(), 'queue.db')
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.close()
+    return db_path
+
+def add_job(db_path, job_id, status='pending', lease_expires_at=None, attempts=0):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, lease_expires_at, attempts)
+                    VALUES (?, 1, 'https://youtu.be/x', 'base', ?, ?, ?)''',
+                 (job_id, status, lease_expires_at, attempts))
+    conn.commit()
+    conn.close()
+
+def get_status(db_path, job_id):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute('SELECT status, lease_owner FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    return row
+
+def test_claims_are_fifo_and_exclusive():
+    db_path = make_db()
+    for job_id in ('a', 'b', 'c'):
+        add_job(db_path, job_id)
+
+    first = JobExecutor(None, db_path)
+    second = JobExecutor(None, db_path)
+    assert second.position('c') == 3
+
+    assert first.claim()[0] == 'a'
+    assert second.claim()[0] == 'b'
+    assert get_status(db_path, 'a') == ('processing', first.owner)
+    assert second.position('c') == 1
+    assert second.position('a') is None
+    assert first.depth() == 1
+
+def test_expired_leases_are_requeued():
+    db_path = make_db()
+    add_job(db_path, 'stale', status='processing', lease_expires_at=time.time() - 1, attempts=1)
+    add_job(db_path, 'zombie', status='processing')  # stuck from before leases existed
+    add_job(db_path, 'live', status='processing', lease_expires_at=time.time() + 60, attempts=1)
+    add_job(db_path, 'crashy', status='processing', lease_expires_at=time.time() - 1, attempts=3)
+
+    executor = JobExecutor(None, db_path)
+    assert executor.requeue_expired() == 2
+    assert get_status(db_path, 'stale')[0] == 'pending'
+    assert get_status(db_path, 'zombie')[0] == 'pending'
+    assert get_status(db_path, 'live')[0] == 'processing'
+    assert get_status(db_path, 'crashy')[0] == 'failed'
+
+def test_pending_jobs_are_processed_at_startup():
+    db_path = make_db()
+    add_job(db_path, 'left-over')
+    done = threading.Event()
+    handled = []
+
+    def handler(job_id, url, model_size, job_type, file_path, options):
+        handled.append(job_id)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE jobs SET status = 'completed' WHERE id = ?", (job_id,))
+        conn.commit()
+        conn.close()
+        done.set()
+
+    executor = JobExecutor(handler, db_path, workers=1)
+    executor.start()
+    assert done.wait(5)
+    for _ in range(100):
+        if get_status(db_path, 'left-over')[1] is None:
+            break
+        time.sleep(0.02)
+    assert handled == ['left-over']
+    assert get_status(db_path, 'left-over') == ('completed', None)
+
+if __name__ == "__main__":
+    test_claims_are_fifo_and_exclusive()
+    test_expired_leases_are_requeued()
+    test_pending_jobs_are_processed_at_startup()
+    print("✅ Job queue tests passed")
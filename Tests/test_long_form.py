@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test long-form chunking: silence-aligned cuts, offsets and overlap de-duplication
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gen
+import long_form
+from cpu_partition import CoreAllocator
+from helpers import FakeModel, use_fake_model
+
+SR = long_form.SAMPLE_RATE
+
+def tone(seconds):
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+def test_cuts_land_in_silence():
+    # Loud audio with a 2 s gap near each 60 s boundary
+    audio = np.concatenate([tone(55), silence(2), tone(58), silence(2), tone(50)])
+    cuts = long_form.find_split_points(audio, chunk_seconds=60, search_seconds=10)
+    assert len(cuts) == 2
+    assert 55 * SR <= cuts[0] <= 57 * SR
+    assert 115 * SR <= cuts[1] <= 117 * SR
+    assert long_form.find_split_points(tone(65), chunk_seconds=60, search_seconds=10) == []
+
+def test_stitching_applies_offsets_and_drops_overlap():
+    chunks = long_form.plan_chunks(20 * SR, [10 * SR], overlap_seconds=1.0)
+    assert chunks == [(0, 10 * SR, 0, 11 * SR), (10 * SR, 20 * SR, 9 * SR, 20 * SR)]
+
+    first = long_form.stitch_chunk(chunks[0], [
+        {'start': 0.0, 'end': 4.0, 'text': 'hello'},
+        {'start': 8.5, 'end': 10.5, 'text': 'across the cut'},   # midpoint 9.5, owned
+        {'start': 10.2, 'end': 11.0, 'text': 'next'}])           # midpoint 10.6, not owned
+    second = long_form.stitch_chunk(chunks[1], [
+        {'start': 0.0, 'end': 1.4, 'text': 'across the cut'},    # midpoint 9.7, not owned
+        {'start': 1.2, 'end': 2.0, 'text': 'next'},              # 10.2 - 11.0, owned
+        {'start': 3.0, 'end': 5.0, 'text': 'world'}], first[-1])
+    assert [(s['start'], s['text']) for s in first + second] == \
+        [(0.0, 'hello'), (8.5, 'across the cut'), (10.2, 'next'), (12.0, 'world')]
+
+def chunk_model(model_size):
+    # Says the chunk's length so stitched output can be checked; VAD drops 10 s of every chunk
+    return FakeModel(model_size, lambda size, length: [
+        {'start': length / 2 - 0.5, 'end': length / 2 + 0.5, 'text': f'{length:.0f}s'}], silence=10)
+
+def test_long_form_mode_is_opt_in():
+    # Every pool process loads its own model, so the mode is off unless processes are configured
+    if 'LONG_FORM_PROCESSES' not in os.environ:
+        assert long_form.LONG_FORM_PROCESSES == 1 and not long_form.use_long_form(4 * 3600)
+    assert long_form.use_long_form(long_form.LONG_FORM_MIN_SECONDS, processes=4)
+
+def test_chunks_are_transcribed_and_reported_in_order():
+    original = use_fake_model(chunk_model), long_form.get_pool, long_form.core_allocator
+    pool = ThreadPoolExecutor(max_workers=3)
+    long_form.get_pool = lambda processes: pool
+    long_form.core_allocator = CoreAllocator(cores=3)
+    try:
+        audio = np.concatenate([tone(55), silence(2), tone(58), silence(2), tone(50)])
+        reported, info = [], []
+        subtitles = long_form.transcribe_long_audio(
+            audio, 'tiny', lambda batch, duration: reported.append((len(batch), round(duration))),
+            lambda duration, speech: info.append((round(duration), round(speech))),
+            processes=3, chunk_seconds=60)
+        assert len(subtitles) == 3 and reported == [(1, 167), (1, 167), (1, 167)]
+        # Chunk speech is summed: 3 padded chunks of 57 + 62 + 52 s, minus 10 s each
+        assert info == [(167, 141)]
+        starts = [s['start'] for s in subtitles]
+        assert starts == sorted(starts) and 25 < starts[0] < 30 and 140 < starts[2] < 145
+        # The job's pool does not outlive it
+        assert pool._shutdown
+    finally:
+        gen.model_cache, long_form.get_pool, long_form.core_allocator = original
+        pool.shutdown()
+
+if __name__ == "__main__":
+    test_cuts_land_in_silence()
+    test_stitching_applies_offsets_and_drops_overlap()
+    test_long_form_mode_is_opt_in()
+    test_chunks_are_transcribed_and_reported_in_order()
+    print("✅ Long-form tests passed")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test the versioned schema migrations on new and legacy databases
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import MIGRATIONS, migrate, applied_versions
+
+def temp_connection():
+    return sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'migrate.db'))
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_new_database_gets_every_migration():
+    conn = temp_connection()
+    assert migrate(conn) == [version for version, _, _, _ in MIGRATIONS]
+    assert {'idx_jobs_user_created_id', 'idx_jobs_status_created'} <= index_names(conn)
+
+    # Running again is a no-op
+    assert migrate(conn) == []
+
+def test_legacy_database_is_upgraded_in_place():
+    conn = temp_connection()
+    # Jobs table as created before uploads were supported
+    conn.execute('''CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                                        email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+                                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE jobs (id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, url TEXT NOT NULL,
+                                       video_title TEXT, model_size TEXT DEFAULT 'base',
+                                       status TEXT DEFAULT 'pending', progress TEXT, subtitle_content TEXT,
+                                       error_message TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                       completed_at TIMESTAMP)''')
+    for i in range(2500):
+        conn.execute('''INSERT INTO jobs (id, user_id, url, status, subtitle_content)
+                        VALUES (?, 1, 'https://youtu.be/x', 'completed', ?)''', (f'job-{i}', f'srt {i}'))
+    conn.commit()
+
+    migrate(conn)
+
+    assert applied_versions(conn) == {version for version, _, _, _ in MIGRATIONS}
+    assert conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 2500
+    assert conn.execute('SELECT COUNT(*) FROM jobs WHERE job_type IS NULL').fetchone()[0] == 0
+
+    # Subtitle bodies were moved out of the jobs rows
+    assert conn.execute('SELECT COUNT(*) FROM jobs WHERE subtitle_content IS NOT NULL').fetchone()[0] == 0
+    assert conn.execute("SELECT content FROM job_subtitles WHERE job_id = 'job-7'").fetchone()[0] == 'srt 7'
+
+    # Upload jobs without a URL can now be stored
+    conn.execute("INSERT INTO jobs (id, user_id, url, job_type, file_path) VALUES ('upload', 1, NULL, 'upload', 'x.mp4')")
+    columns = [col[1] for col in conn.execute('PRAGMA table_info(jobs)')]
+    assert {'job_type', 'file_path', 'file_size', 'lease_owner', 'lease_expires_at', 'attempts'} <= set(columns)
+
+def test_dashboard_query_uses_index():
+    conn = temp_connection()
+    migrate(conn)
+    plan = conn.execute('''EXPLAIN QUERY PLAN SELECT id, status FROM jobs
+                           WHERE user_id = ? AND (created_at, id) < (?, ?)
+                           ORDER BY created_at DESC, id DESC LIMIT 21''', (1, '2025-01-01', 'x')).fetchall()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'idx_jobs_user_created_id' in details
+    assert 'TEMP B-TREE' not in details
+
+if __name__ == "__main__":
+    test_new_database_gets_every_migration()
+    test_legacy_database_is_upgraded_in_place()
+    test_dashboard_query_uses_index()
+    print("✅ Migration tests passed")
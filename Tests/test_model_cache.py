@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test the shared Whisper model cache (loading, reuse and LRU eviction)
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen import ModelCache
+
+def make_loader(calls):
+    def loader(model_size, compute_type, cpu_threads):
+        calls.append((model_size, compute_type, cpu_threads))
+        time.sleep(0.05)
+        return object()
+    return loader
+
+def test_model_is_loaded_once_across_threads():
+    calls = []
+    cache = ModelCache(budget_mb=1000, loader=make_loader(calls))
+    models = []
+
+    def worker():
+        models.append(cache.acquire("base"))
+        cache.release("base")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [("base", "int8", 0)]
+    assert len({id(m) for m in models}) == 1
+
+def test_lru_eviction_respects_budget():
+    calls = []
+    # tiny (75) + base (145) fit, small (480) forces eviction of the oldest
+    cache = ModelCache(budget_mb=600, loader=make_loader(calls))
+    for size in ("tiny", "base"):
+        cache.acquire(size)
+        cache.release(size)
+    cache.acquire("tiny")  # tiny becomes most recently used
+    cache.release("tiny")
+
+    cache.acquire("small")
+    cache.release("small")
+
+    keys = [key[0] for key in cache.cached_keys()]
+    assert keys == ["tiny", "small"]
+
+def test_models_in_use_are_not_evicted():
+    calls = []
+    cache = ModelCache(budget_mb=200, loader=make_loader(calls))
+    cache.acquire("base")  # held by a running job
+    cache.acquire("tiny")
+    cache.release("tiny")
+
+    assert ("base", "int8", 0) in cache.cached_keys()
+    cache.release("base")
+
+if __name__ == "__main__":
+    test_model_is_loaded_once_across_threads()
+    test_lru_eviction_respects_budget()
+    test_models_in_use_are_not_evicted()
+    print("✅ Model cache tests passed")
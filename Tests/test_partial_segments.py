@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test incremental segment saving and the /jobs/<id>/partial.srt endpoint
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import audio_prep
+import db
+import gen
+from helpers import FakeModel, use_fake_model, use_temp_audio_folder, use_temp_db
+
+def lines(count, duration):
+    # `count` two-second lines of `duration` seconds of audio
+    return lambda model_size: FakeModel(model_size, lambda *audio: [
+        {'start': i * 2.0, 'end': i * 2.0 + 2, 'text': f' line {i} '} for i in range(count)], duration)
+
+def test_segments_are_reported_in_batches():
+    original = use_fake_model(lines(45, 90.0))
+    try:
+        batches = []
+        subtitles = gen.transcribe_audio('audio.mp3', 'base',
+                                         on_segments=lambda batch, duration: batches.append((len(batch), duration)))
+        assert len(subtitles) == 45 and subtitles[0]['text'] == 'line 0'
+        assert batches == [(20, 90.0), (20, 90.0), (5, 90.0)]
+    finally:
+        gen.model_cache = original
+
+def test_partial_subtitles_while_running():
+    original_model = use_fake_model(lines(45, 100.0))
+    original_db = use_temp_db()
+    try:
+        import app
+        user_id = db.create_user('partial', 'partial@example.com', 'secret')
+        job_id = db.create_job(user_id, None, 'base', 'upload', 'video.mp4', 1, 'video')
+
+        seen = []
+        saver = app.partial_results_saver(job_id)
+
+        def on_segments(batch, duration):
+            saver(batch, duration)
+            job = db.get_job(job_id)
+            seen.append((len(db.get_job_segments(job_id)), job['progress_seconds'], job['duration_seconds']))
+
+        db.update_job_status(job_id, 'processing', 'Generating subtitles with AI...')
+        gen.transcribe_audio('video.mp4', 'base', on_segments)
+        assert seen == [(20, 40.0, 100.0), (40, 80.0, 100.0), (45, 90.0, 100.0)]
+
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        response = client.get(f'/jobs/{job_id}/partial.srt')
+        body = response.get_data(as_text=True)
+        assert response.headers['X-Transcribed-Seconds'] == '90.0'
+        assert body.startswith('1\n00:00:00,000 --> 00:00:02,000\nline 0\n\n') and '45\n' in body
+
+        # Completed jobs serve their final subtitles and drop the partial rows
+        db.update_job_status(job_id, 'completed', 'done', 'video', 'final srt')
+        assert db.get_job_segments(job_id) == []
+        assert client.get(f'/jobs/{job_id}/partial.srt').get_data(as_text=True) == 'final srt'
+    finally:
+        gen.model_cache = original_model
+        db.DB_PATH = original_db
+
+def test_cancelled_job_stops_without_failing():
+    original = use_fake_model(lines(45, 100.0)), use_temp_db(), use_temp_audio_folder()
+    try:
+        import app
+        user_id = db.create_user('partial', 'partial@example.com', 'secret')
+        job_id = db.create_job(user_id, None, 'base', 'upload', 'video.mp4', 1, 'video')
+        os.makedirs(audio_prep.AUDIO_FOLDER)
+        audio_path = os.path.join(audio_prep.AUDIO_FOLDER, f'{job_id}.f32')
+        np.zeros(100 * audio_prep.SAMPLE_RATE, dtype=np.float32).tofile(audio_path)
+        db.set_job_audio(job_id, audio_path)
+
+        # The callback's cancellation reaches the caller instead of looking like an empty transcript
+        db.update_job_status(job_id, 'processing', 'Generating subtitles with AI...')
+        db.cancel_job(job_id)
+        try:
+            gen.transcribe_audio(audio_path, 'base', app.partial_results_saver(job_id))
+            assert False, 'expected the cancellation to reach the caller'
+        except gen.JobCancelled:
+            pass
+
+        app.process_subtitle_job(job_id, None, 'base', 'upload', 'video.mp4')
+        job = db.get_job(job_id)
+        assert job['status'] == 'cancelled' and job['error_message'] is None
+        assert db.get_job_segments(job_id) == []
+    finally:
+        gen.model_cache, db.DB_PATH, audio_prep.AUDIO_FOLDER = original
+
+if __name__ == "__main__":
+    test_segments_are_reported_in_batches()
+    test_partial_subtitles_while_running()
+    test_cancelled_job_stops_without_failing()
+    print("✅ Partial segment tests passed")
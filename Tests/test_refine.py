@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test confidence-guided re-transcription of weak segments
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_prep
+import db
+import gen
+import refine
+from helpers import FakeModel, use_fake_model, use_temp_audio_folder, use_temp_db
+
+def segment(start, end, text, logprob=-0.2, compression=1.5, no_speech=0.01):
+    return {'start': start, 'end': end, 'text': text, 'avg_logprob': logprob,
+            'compression_ratio': compression, 'no_speech_prob': no_speech}
+
+# 60 s of audio, two unclear stretches: 10-14 s (two segments, merged) and a repeated-text hallucination at 40-44 s
+SEGMENTS = [segment(0, 5, 'hello'), segment(5, 10, 'clear words'),
+            segment(10, 12, 'mumble', logprob=-1.2), segment(12, 14, 'grumble', logprob=-0.9),
+            segment(14, 40, 'a long clear part'),
+            segment(40, 44, 'yes yes yes yes', compression=3.1),
+            segment(44, 60, 'the end')]
+
+def test_weak_ranges():
+    assert refine.weak_ranges(SEGMENTS) == [(10, 14), (40, 44)]
+    # Confident text over noise is kept, unscored segments (cached results) are never weak
+    assert not refine.is_weak(segment(0, 1, 'ok', no_speech=0.9))
+    assert refine.is_weak(segment(0, 1, '?', logprob=-0.5, no_speech=0.9))
+    assert not refine.is_weak({'start': 0, 'end': 1, 'text': 'x'})
+
+def test_only_weak_ranges_are_reprocessed():
+    audio = np.zeros(60 * audio_prep.SAMPLE_RATE, dtype=np.float32)
+    calls = []
+
+    def transcribe(piece, model_size, **options):
+        seconds = len(piece) / audio_prep.SAMPLE_RATE
+        calls.append(seconds)
+        # Padding context is transcribed too, but only segments inside the weak range are kept
+        return [segment(0, 1, 'context'), segment(1, seconds - 1, f'{model_size} fix'),
+                segment(seconds - 1, seconds, 'context')]
+
+    subtitles, reprocessed, ranges = refine.refine_subtitles(audio, SEGMENTS, 'medium', transcribe)
+    assert (ranges, calls, reprocessed) == (2, [6.0, 6.0], 12.0)
+    assert [s['text'] for s in subtitles] == ['hello', 'clear words', 'medium fix', 'a long clear part',
+                                               'medium fix', 'the end']
+    assert subtitles[2]['start'] == 10 and subtitles[4]['end'] == 44
+
+def test_refining_stops_when_cancelled():
+    audio = np.zeros(60 * audio_prep.SAMPLE_RATE, dtype=np.float32)
+    calls = []
+
+    def cancelled():
+        if calls:
+            raise gen.JobCancelled('refine')
+
+    def transcribe(piece, model_size, **options):
+        calls.append(len(piece))
+        return []
+
+    try:
+        refine.refine_subtitles(audio, SEGMENTS, 'medium', transcribe, before_range=cancelled)
+        assert False, 'expected the cancellation to stop refining'
+    except gen.JobCancelled:
+        pass
+    assert len(calls) == 1
+
+def confident_words(model_size, seconds):
+    # The larger model hears the whole slice clearly
+    return [segment(1.0, seconds - 1, f' {model_size} words ', logprob=-0.1, compression=1.2)]
+
+def test_upgrade_route_queues_and_splices():
+    folder = tempfile.mkdtemp()
+    original = (use_temp_db(folder), use_temp_audio_folder(folder),
+                use_fake_model(lambda model_size: FakeModel(model_size, confident_words)))
+    try:
+        import app
+        original_inline, original_db = app.INLINE_WORKERS, app.job_executor.db_path
+        app.INLINE_WORKERS = False
+        app.job_executor.db_path = db.DB_PATH
+        user_id = db.create_user('refine', 'refine@example.com', 'secret')
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+
+        job_id = db.create_job(user_id, None, 'base', 'upload', 'talk.mp4', 1, 'talk', duration_seconds=60)
+        os.makedirs(audio_prep.AUDIO_FOLDER)
+        audio_path = os.path.join(audio_prep.AUDIO_FOLDER, f'{job_id}.f32')
+        np.zeros(60 * audio_prep.SAMPLE_RATE, dtype=np.float32).tofile(audio_path)
+        db.set_job_audio(job_id, audio_path)
+        db.update_job_status(job_id, 'completed', 'done', 'talk', app.subtitles_to_srt(SEGMENTS), segments=SEGMENTS)
+
+        assert client.post(f'/jobs/{job_id}/upgrade', json={'model_size': 'tiny'}).status_code == 400
+        result = client.post(f'/jobs/{job_id}/upgrade', json={'model_size': 'medium'}).get_json()
+        assert (result['weak_ranges'], result['weak_seconds']) == (2, 8)
+
+        refined = db.get_job(result['job_id'])
+        assert (refined['job_type'], refined['upgrade_of_job_id']) == ('refine', job_id)
+        app.process_subtitle_job(refined['id'], None, 'medium', 'refine', None, {})
+
+        refined = db.get_job(refined['id'])
+        assert refined['status'] == 'completed' and refined['reprocessed_seconds'] == 12.0
+        body = db.get_job_subtitles(refined['id'])
+        assert body.count('medium words') == 2 and 'mumble' not in body and 'a long clear part' in body
+        # The source keeps its subtitles
+        assert 'mumble' in db.get_job_subtitles(job_id)
+
+        # Jobs completed from the subtitle cache keep the scores and can be refined too
+        import result_cache
+        result_cache.store_result('dQw4w9WgXcQ', 'base', 'translate', app.subtitles_to_srt(SEGMENTS), len(SEGMENTS),
+                                  'talk', segments=SEGMENTS)
+        url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        cached_job = db.create_job(user_id, url, 'base')
+        app.process_subtitle_job(cached_job, url, 'base', 'youtube')
+        assert db.get_job_scored_segments(cached_job) == SEGMENTS
+        assert client.post(f'/jobs/{cached_job}/upgrade', json={'model_size': 'medium'}).get_json()['job_id']
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER, gen.model_cache = original
+        app.INLINE_WORKERS, app.job_executor.db_path = original_inline, original_db
+
+def test_upgrade_needs_scores_and_audio():
+    folder = tempfile.mkdtemp()
+    original = use_temp_db(folder), use_temp_audio_folder(folder)
+    try:
+        import app
+        user_id = db.create_user('refine', 'refine@example.com', 'secret')
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'], session['username'] = user_id, 'refine'
+
+        def completed_upload(segments, audio):
+            job_id = db.create_job(user_id, None, 'base', 'upload', 'talk.mp4', 1, 'talk', duration_seconds=60)
+            if audio:
+                os.makedirs(audio_prep.AUDIO_FOLDER, exist_ok=True)
+                audio_path = os.path.join(audio_prep.AUDIO_FOLDER, f'{job_id}.f32')
+                np.zeros(audio_prep.SAMPLE_RATE, dtype=np.float32).tofile(audio_path)
+                db.set_job_audio(job_id, audio_path)
+            db.update_job_status(job_id, 'completed', 'done', 'talk', app.subtitles_to_srt(SEGMENTS),
+                                 segments=segments)
+            return job_id
+
+        unscored, purged, ready = (completed_upload(None, True), completed_upload(SEGMENTS, False),
+                                   completed_upload(SEGMENTS, True))
+        for job_id, reason in ((unscored, 'no_segments'), (purged, 'audio_purged')):
+            response = client.post(f'/jobs/{job_id}/upgrade', json={'model_size': 'medium'})
+            assert response.status_code == 409 and response.get_json()['reason'] == reason
+
+        # The dashboard only offers the button where the upgrade can run
+        page = client.get('/dashboard').get_data(as_text=True)
+        assert f"upgradeJob('{ready}')" in page
+        assert f"upgradeJob('{unscored}')" not in page and f"upgradeJob('{purged}')" not in page
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER = original
+
+if __name__ == "__main__":
+    test_weak_ranges()
+    test_only_weak_ranges_are_reprocessed()
+    test_refining_stops_when_cancelled()
+    test_upgrade_route_queues_and_splices()
+    test_upgrade_needs_scores_and_audio()
+    print("✅ Refine tests passed")
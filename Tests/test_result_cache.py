@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test the YouTube subtitle result cache (video ids, TTL, size eviction, cache hits)
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import result_cache
+from gen import extract_video_id
+from helpers import use_temp_db
+
+def test_extract_video_id():
+    for url in ('https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+                'https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42',
+                'https://youtu.be/dQw4w9WgXcQ?si=abc',
+                'https://m.youtube.com/shorts/dQw4w9WgXcQ',
+                'https://www.youtube.com/embed/dQw4w9WgXcQ'):
+        assert extract_video_id(url) == 'dQw4w9WgXcQ', url
+    assert extract_video_id('https://www.youtube.com/watch?v=short') is None
+    assert extract_video_id('https://example.com/watch?v=dQw4w9WgXcQ') is None
+
+def test_store_get_and_expiry():
+    original = use_temp_db()
+    try:
+        result_cache.store_result('dQw4w9WgXcQ', 'base', 'translate', 'srt body', 3, 'Title')
+        row = result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate')
+        assert row['content'] == 'srt body' and row['segment_count'] == 3
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'small', 'translate') is None
+
+        conn = db.get_connection()
+        with conn:
+            conn.execute('UPDATE subtitle_cache SET created_at = ?',
+                         (time.time() - result_cache.SUBTITLE_CACHE_TTL_SECONDS - 1,))
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate') is None
+    finally:
+        db.DB_PATH = original
+
+def test_transcription_options_are_part_of_the_key():
+    original = use_temp_db()
+    try:
+        result_cache.store_result('dQw4w9WgXcQ', 'base', 'translate', 'without vad', 1, options={'vad': False})
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate') is None
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate', {'vad': False})['content'] == 'without vad'
+
+        # Options equal to the defaults, and two_pass, share the default entry
+        result_cache.store_result('dQw4w9WgXcQ', 'base', 'translate', 'default', 1, options={'two_pass': True})
+        defaults = {'vad': result_cache.VAD_FILTER, 'vad_threshold': result_cache.VAD_THRESHOLD}
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate', defaults)['content'] == 'default'
+        assert result_cache.get_cached_result('dQw4w9WgXcQ', 'base', 'translate', {'vad_threshold': 0.3}) is None
+    finally:
+        db.DB_PATH = original
+
+def test_least_recently_used_entries_are_evicted():
+    original = use_temp_db()
+    try:
+        for video_id in ('aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc'):
+            result_cache.store_result(video_id, 'base', 'translate', 'x' * 100, 1)
+            time.sleep(0.01)
+        result_cache.get_cached_result('aaaaaaaaaaa', 'base', 'translate')  # now most recently used
+
+        assert result_cache.evict(max_bytes=200) == 1
+        assert result_cache.get_cached_result('bbbbbbbbbbb', 'base', 'translate') is None
+        assert result_cache.get_cached_result('aaaaaaaaaaa', 'base', 'translate') is not None
+    finally:
+        db.DB_PATH = original
+
+def test_cache_hit_skips_download_and_transcription():
+    original = use_temp_db()
+    try:
+        import app
+
+        def fail(*args, **kwargs):
+            raise AssertionError('cache hit must not download or transcribe')
+
+        saved = app.download_audio, app.transcribe_audio
+        app.download_audio = app.transcribe_audio = fail
+        try:
+            user_id = db.create_user('cached', 'cached@example.com', 'secret')
+            url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+            result_cache.store_result('dQw4w9WgXcQ', 'base', 'translate', '1\nsrt\n\n', 1, 'Cached Video')
+
+            job_id = db.create_job(user_id, url, 'base')
+            app.process_subtitle_job(job_id, url, 'base', 'youtube')
+        finally:
+            app.download_audio, app.transcribe_audio = saved
+
+        job = db.get_job(job_id)
+        assert job['status'] == 'completed' and job['video_title'] == 'Cached Video'
+        assert db.get_job_subtitles(job_id) == '1\nsrt\n\n'
+    finally:
+        db.DB_PATH = original
+
+if __name__ == "__main__":
+    test_extract_video_id()
+    test_store_get_and_expiry()
+    test_transcription_options_are_part_of_the_key()
+    test_least_recently_used_entries_are_evicted()
+    test_cache_hit_skips_download_and_transcription()
+    print("✅ Result cache tests passed")
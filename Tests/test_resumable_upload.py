@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test resumable chunked uploads and reuse of earlier uploads of the same file
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import audio_prep
+from gen import DEFAULT_ENGINE
+from helpers import use_temp_audio_folder, use_temp_db
+
+CHUNK = 1000
+
+class UploadApp:
+    # The Flask app on a temporary database and upload folder, logged in as a fresh user
+    def __enter__(self):
+        import app
+        self.app = app
+        self.folder = tempfile.mkdtemp()
+        self.original = (use_temp_db(self.folder), use_temp_audio_folder(self.folder), app.INLINE_WORKERS,
+                         app.UPLOAD_SESSION_CHUNK_BYTES, app.app.config['UPLOAD_FOLDER'])
+        app.INLINE_WORKERS = False
+        app.UPLOAD_SESSION_CHUNK_BYTES = CHUNK
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(self.folder, 'uploads')
+        self.user_id = db.create_user('chunks', 'chunks@example.com', 'secret')
+        self.client = app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = self.user_id
+        return self
+
+    def __exit__(self, *exc):
+        (db.DB_PATH, audio_prep.AUDIO_FOLDER, self.app.INLINE_WORKERS,
+         self.app.UPLOAD_SESSION_CHUNK_BYTES, self.app.app.config['UPLOAD_FOLDER']) = self.original
+
+    def init(self, data, **settings):
+        body = {'filename': 'talk.mp4', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(), **settings}
+        return self.client.post('/uploads', json=body).get_json()
+
+    def put(self, upload_id, index, data):
+        return self.client.put(f'/uploads/{upload_id}/chunks/{index}', data=data[index * CHUNK:(index + 1) * CHUNK])
+
+    def finalize(self, upload_id, **settings):
+        return self.client.post(f'/uploads/{upload_id}/finalize', json=settings)
+
+def test_interrupted_upload_resumes():
+    data = os.urandom(3500)
+    with UploadApp() as client:
+        upload = client.init(data, model_size='tiny')
+        assert (upload['chunk_size'], upload['chunk_count'], upload['received']) == (CHUNK, 4, [])
+        assert client.put(upload['upload_id'], 2, data).status_code == 200
+        assert client.put(upload['upload_id'], 0, data).status_code == 200
+        assert client.put(upload['upload_id'], 0, data).status_code == 200  # Retried chunk
+
+        # Finalizing too early names the missing chunks
+        response = client.finalize(upload['upload_id'])
+        assert response.status_code == 409 and response.get_json()['missing'] == [1, 3]
+
+        # After a reload the same file resumes the same upload
+        resumed = client.init(data, model_size='tiny')
+        assert (resumed['upload_id'], resumed['received']) == (upload['upload_id'], [0, 2])
+        for index in (1, 3):
+            assert client.put(upload['upload_id'], index, data).status_code == 200
+
+        result = client.finalize(upload['upload_id'], model_size='tiny', engine='batched').get_json()
+        job = db.get_job(result['job_id'])
+        assert open(job['file_path'], 'rb').read() == data
+        assert (job['model_size'], job['file_size'], job['video_title']) == ('tiny', 3500, 'talk')
+        assert db.decode_options(job['options']) == {'engine': 'batched'}
+        assert db.get_upload_session(upload['upload_id']) is None
+
+def test_bad_chunks_are_rejected():
+    data = os.urandom(2500)
+    with UploadApp() as client:
+        upload_id = client.init(data)['upload_id']
+        assert client.client.put(f'/uploads/{upload_id}/chunks/0', data=data[:900]).status_code == 400
+        assert client.client.put(f'/uploads/{upload_id}/chunks/3', data=data[:500]).status_code == 400
+
+        # A chunk corrupted in transit is caught by the checksum at the end
+        for index in range(3):
+            client.put(upload_id, index, data if index else b'x' * CHUNK + data[CHUNK:])
+        assert client.finalize(upload_id).status_code == 422
+        assert db.get_upload_session(upload_id) is None
+
+def test_identical_upload_is_not_sent_again():
+    data = os.urandom(1500)
+    with UploadApp() as client:
+        upload_id = client.init(data, model_size='base')['upload_id']
+        for index in range(2):
+            client.put(upload_id, index, data)
+        first = client.finalize(upload_id, model_size='base').get_json()['job_id']
+        os.makedirs(audio_prep.AUDIO_FOLDER)
+        decoded = os.path.join(audio_prep.AUDIO_FOLDER, f'{first}.f32')
+        open(decoded, 'wb').write(b'\0' * 64)
+        db.set_job_audio(first, decoded)
+        db.update_job_status(first, 'completed', 'done', 'talk', '1\n00:00:00,000 --> 00:00:01,000\nhi\n')
+
+        # Same settings: the subtitles are reused
+        reused = client.init(data, model_size='base')
+        assert reused['reused'] == 'subtitles'
+        assert db.get_job_subtitles(reused['job_id']).endswith('hi\n')
+        assert db.get_job(reused['job_id'])['status'] == 'completed'
+
+        # Another model: only the decoded audio is reused, as a separate file
+        other = client.init(data, model_size='small')
+        assert other['reused'] == 'audio'
+        audio_path = db.get_job_audio(other['job_id'])
+        assert audio_path != decoded and open(audio_path, 'rb').read() == b'\0' * 64
+
+        # Other users never see each other's uploads
+        with client.client.session_transaction() as session:
+            session['user_id'] = db.create_user('other', 'other@example.com', 'secret')
+        assert 'upload_id' in client.init(data, model_size='base')
+
+def test_reuse_compares_options_like_the_result_cache():
+    data = os.urandom(1500)
+    scored = [{'start': 0.0, 'end': 1.0, 'text': 'hi', 'confidence': 0.4}]
+    with UploadApp() as client:
+        first = db.create_job(client.user_id, None, 'base', 'upload', 'talk.mp4', len(data), 'talk',
+                              content_sha256=hashlib.sha256(data).hexdigest())
+        db.update_job_status(first, 'completed', 'done', 'talk', '1\n00:00:00,000 --> 00:00:01,000\nhi\n',
+                             segments=scored)
+
+        # Spelling out a default setting is still the same transcription, scores included
+        reused = client.init(data, model_size='base', engine=DEFAULT_ENGINE)
+        assert reused['reused'] == 'subtitles'
+        assert db.get_job_scored_segments(reused['job_id']) == scored
+
+        assert 'upload_id' in client.init(data, model_size='base', vad_threshold=0.9)
+
+def test_finalize_is_refused_when_the_queue_is_full():
+    data = os.urandom(500)
+    with UploadApp() as client:
+        executor = client.app.job_executor
+        original = executor.db_path, executor.max_depth
+        executor.db_path = db.DB_PATH
+        try:
+            upload_id = client.init(data)['upload_id']
+            client.put(upload_id, 0, data)
+            executor.max_depth = 0  # Filled up while the file was being sent
+            response = client.finalize(upload_id)
+            assert response.status_code == 429
+            # The chunks are kept for another try
+            assert db.get_upload_session(upload_id) is not None
+            executor.max_depth = 10
+            assert client.finalize(upload_id).get_json()['success']
+        finally:
+            executor.db_path, executor.max_depth = original
+
+if __name__ == "__main__":
+    test_interrupted_upload_resumes()
+    test_bad_chunks_are_rejected()
+    test_identical_upload_is_not_sent_again()
+    test_reuse_compares_options_like_the_result_cache()
+    test_finalize_is_refused_when_the_queue_is_full()
+    print("✅ Resumable upload tests passed")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test the job scheduler: shortest job first, weighted fair queuing across users,
+per-user caps, and a simulation of tail latency against first-come-first-served
+"""
+
+import heapq
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobExecutor
+from scheduler import job_cost, pick_next, schedule_order
+from test_job_queue import make_db
+
+def job(job_id, user_id, cost, waited=0):
+    return {'id': job_id, 'user_id': user_id, 'cost': cost, 'waited': waited}
+
+def test_short_jobs_and_light_users_go_first():
+    pending = [job('long', 1, 10800, waited=60), job('short', 2, 120), job('medium', 2, 600)]
+    assert pick_next(pending, {}, {})['id'] == 'short'
+    # A user who already had a lot transcribed waits behind the others
+    assert pick_next(pending, {}, {2: 20000})['id'] == 'long'
+    # ...unless their weight makes up for it
+    assert pick_next(pending, {}, {2: 20000}, weights={2: 4})['id'] == 'short'
+
+def test_user_cap():
+    pending = [job('a1', 1, 60), job('b1', 2, 6000)]
+    assert pick_next(pending, {1: 2}, {}, user_cap=2)['id'] == 'b1'
+    # The remaining worker stays free for whoever comes next
+    assert pick_next(pending[:1], {1: 2}, {}, user_cap=2) is None
+    assert pick_next(pending[:1], {1: 1}, {}, user_cap=2)['id'] == 'a1'
+
+def test_long_jobs_age_instead_of_starving():
+    fresh_short = job('short', 1, 600)
+    old_long = job('long', 1, 3600, waited=4 * 3600)
+    assert pick_next([fresh_short, old_long], {}, {}, aging_seconds=1800)['id'] == 'long'
+
+def simulate(arrivals, workers, policy, user_cap=None, speed=4.0):
+    """Discrete-event simulation; returns {job id: (finish - arrival) seconds}.
+
+    arrivals: (time, job id, user id, cost); a job runs for cost / speed seconds.
+    """
+    arrivals = sorted(arrivals)
+    pending, running, latency = [], [], {}
+    finished_cost = {}
+    now = 0.0
+    i = 0
+    while i < len(arrivals) or pending or running:
+        # Fill idle workers
+        while pending and len(running) < workers:
+            if policy == 'fifo':
+                chosen = min(pending, key=lambda j: j['arrival'])
+            else:
+                for j in pending:
+                    j['waited'] = now - j['arrival']
+                users_running = {}
+                served = dict(finished_cost)
+                for _, _, j in running:
+                    users_running[j['user_id']] = users_running.get(j['user_id'], 0) + 1
+                    served[j['user_id']] = served.get(j['user_id'], 0) + j['cost']
+                chosen = pick_next(pending, users_running, served, user_cap=user_cap)
+                if chosen is None:
+                    break
+            pending.remove(chosen)
+            heapq.heappush(running, (now + chosen['cost'] / speed, chosen['id'], chosen))
+        next_arrival = arrivals[i][0] if i < len(arrivals) else float('inf')
+        next_finish = running[0][0] if running else float('inf')
+        if next_arrival <= next_finish:
+            now, job_id, user_id, cost = arrivals[i]
+            pending.append({'id': job_id, 'user_id': user_id, 'cost': cost, 'arrival': now, 'waited': 0})
+            i += 1
+        else:
+            now, _, done = heapq.heappop(running)
+            latency[done['id']] = now - done['arrival']
+            # Work counts against a user's share for the fairness window (the whole simulation here)
+            finished_cost[done['user_id']] = finished_cost.get(done['user_id'], 0) + done['cost']
+    return latency
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def test_simulated_tail_latency():
+    # One user queues twenty 3-hour videos; four others send a 2-minute clip every 10 minutes
+    arrivals = [(0.0, f'big-{n}', 1, job_cost(3 * 3600, 'base')) for n in range(20)]
+    for user in range(2, 6):
+        for n in range(18):
+            arrivals.append((n * 600.0 + user, f'clip-{user}-{n}', user, job_cost(120, 'base')))
+
+    fifo = simulate(arrivals, workers=4, policy='fifo')
+    fair = simulate(arrivals, workers=4, policy='fair')
+    capped = simulate(arrivals, workers=4, policy='fair', user_cap=3)
+    clips = [key for key in fifo if key.startswith('clip')]
+    fifo_p95, fair_p95, capped_p95 = (percentile([result[key] for key in clips], 0.95)
+                                      for result in (fifo, fair, capped))
+    print(f"p95 clip latency: FIFO {fifo_p95 / 60:.0f} min, fair {fair_p95 / 60:.1f} min, "
+          f"fair with cap {capped_p95 / 60:.1f} min")
+    # Clips no longer wait for the whole backlog, only for the next worker to free up
+    assert fair_p95 * 4 < fifo_p95
+    # A cap below the number of workers keeps one free for them
+    assert capped_p95 < 5 * 60
+    # The heavy user is slowed down, not starved
+    bigs = [key for key in fifo if key.startswith('big')]
+    assert max(fair[key] for key in bigs) <= max(fifo[key] for key in bigs) * 1.05
+    assert max(capped[key] for key in bigs) <= max(fifo[key] for key in bigs) * 1.5
+
+def test_schedule_order_matches_repeated_picks():
+    rng = random.Random(7)
+    pending = [dict(job(f'j{i}', rng.randrange(6), rng.choice((60, 600, 3600)), waited=rng.randrange(7200)),
+                    deferred=rng.random() < 0.1)
+               for i in range(300)]
+    served = {user: rng.randrange(5000) for user in range(6)}
+    weights = {0: 2.0, 3: 0.5}
+
+    remaining, replay_served, replay = list(pending), dict(served), []
+    while remaining:
+        picked = pick_next(remaining, {}, replay_served, weights)
+        remaining.remove(picked)
+        replay_served[picked['user_id']] = replay_served.get(picked['user_id'], 0) + picked['cost']
+        replay.append(picked['id'])
+    assert [j['id'] for j in schedule_order(pending, {}, served, weights)] == replay
+
+def test_positions_are_cached_until_the_queue_changes():
+    db_path = make_db()
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@x', 'x')")
+    conn.executemany('''INSERT INTO jobs (id, user_id, url, model_size, status, duration_seconds)
+                        VALUES (?, 1, 'https://youtu.be/x', 'base', 'pending', ?)''',
+                     [(f'job-{i}', 60 + i) for i in range(2000)])
+    conn.commit()
+
+    executor = JobExecutor(None, db_path, workers=1)
+    assert executor.position('job-0') == 1
+    computed = executor._positions
+    assert executor.position('job-1999') == 2000 and executor._positions is computed
+    # A newly queued job changes the fingerprint
+    conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, duration_seconds)
+                    VALUES ('clip', 1, 'https://youtu.be/x', 'base', 'pending', 1)''')
+    conn.commit()
+    conn.close()
+    assert executor.position('clip') == 1 and executor.position('job-0') == 2
+    executor.claim()
+    assert executor.position('job-0') == 1
+
+def test_claim_follows_the_scheduler():
+    db_path = make_db()
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'heavy', 'h@x', 'x'), "
+                 "(2, 'light', 'l@x', 'x')")
+    for job_id, user_id, duration, created in (('long-1', 1, 3 * 3600, '-5 minutes'),
+                                               ('long-2', 1, 3 * 3600, '-4 minutes'),
+                                               ('clip', 2, 120, '-1 minutes'),
+                                               ('unknown', 2, None, '-1 minutes')):
+        conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, duration_seconds, created_at)
+                        VALUES (?, ?, 'https://youtu.be/x', 'base', 'pending', ?, datetime('now', ?))''',
+                     (job_id, user_id, duration, created))
+    conn.commit()
+    conn.close()
+
+    executor = JobExecutor(None, db_path, workers=8)
+    assert [executor.position(j) for j in ('clip', 'unknown', 'long-1')] == [1, 2, 3]
+    assert [executor.claim()['id'] for _ in range(4)] == ['clip', 'unknown', 'long-1', 'long-2']
+    assert executor.claim() is None
+
+if __name__ == "__main__":
+    test_short_jobs_and_light_users_go_first()
+    test_user_cap()
+    test_long_jobs_age_instead_of_starving()
+    test_simulated_tail_latency()
+    test_schedule_order_matches_repeated_picks()
+    test_positions_are_cached_until_the_queue_changes()
+    test_claim_follows_the_scheduler()
+    print("✅ Scheduler tests passed")
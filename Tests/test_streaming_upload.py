@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test streaming uploads: chunked writes, size limits and audio decoded while the upload arrives
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import audio_prep
+import streaming_upload
+from streaming_upload import StreamingUpload, UploadTooLarge
+from helpers import use_temp_audio_folder, use_temp_db
+from test_audio_prep import write_stereo_sine
+
+class SlowStream:
+    # A request body arriving over a slow connection, recording the largest read
+    def __init__(self, data, delay=0.002):
+        self.data = io.BytesIO(data)
+        self.delay = delay
+        self.largest_read = 0
+
+    def read(self, size):
+        self.largest_read = max(self.largest_read, size)
+        time.sleep(self.delay)
+        return self.data.read(size)
+
+def use_temp_folders():
+    folder = tempfile.mkdtemp()
+    original = use_temp_audio_folder(folder), streaming_upload.AUDIO_FOLDER
+    streaming_upload.AUDIO_FOLDER = audio_prep.AUDIO_FOLDER
+    return folder, original
+
+def test_audio_is_decoded_while_uploading():
+    folder, original = use_temp_folders()
+    try:
+        for name in ('talk.mkv', 'talk.mp4'):  # MP4 keeps its index at the end, MKV does not
+            source = os.path.join(folder, 'source_' + name)
+            write_stereo_sine(source, seconds=3)
+            data = open(source, 'rb').read()
+            expected = os.path.join(folder, name + '.f32')
+            audio_prep.extract_audio(source, expected)
+
+            file_path = os.path.join(folder, name)
+            upload = StreamingUpload(file_path, len(data), max_size=10 * 1024 * 1024)
+            stream = SlowStream(data)
+            assert upload.write_from(stream, chunk_bytes=4096) == len(data)
+            assert stream.largest_read == 4096
+            assert open(file_path, 'rb').read() == data
+
+            audio_path = upload.decoded_audio()
+            assert audio_path is not None
+            assert np.array_equal(audio_prep.load_audio(audio_path), audio_prep.load_audio(expected))
+    finally:
+        audio_prep.AUDIO_FOLDER, streaming_upload.AUDIO_FOLDER = original
+
+def test_oversized_upload_is_rejected_and_removed():
+    folder, original = use_temp_folders()
+    try:
+        file_path = os.path.join(folder, 'big.mp4')
+        upload = StreamingUpload(file_path, max_size=10000)
+        try:
+            upload.write_from(io.BytesIO(b'\0' * 20000), chunk_bytes=4096)
+        except UploadTooLarge:
+            pass
+        else:
+            raise AssertionError('upload over the limit should be rejected')
+        assert not os.path.exists(file_path)
+        assert not os.listdir(audio_prep.AUDIO_FOLDER)
+        assert not upload.decoder.is_alive()
+    finally:
+        audio_prep.AUDIO_FOLDER, streaming_upload.AUDIO_FOLDER = original
+
+def test_upload_endpoint_creates_job_with_decoded_audio():
+    folder, original = use_temp_folders()
+    original_db = use_temp_db(folder)
+    try:
+        import app
+        original_inline, original_uploads = app.INLINE_WORKERS, app.app.config['UPLOAD_FOLDER']
+        app.INLINE_WORKERS = False
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(folder, 'uploads')
+        try:
+            user_id = db.create_user('stream', 'stream@example.com', 'secret')
+            source = os.path.join(folder, 'lecture.mkv')
+            write_stereo_sine(source)
+            client = app.app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+
+            response = client.post('/submit-upload-stream?filename=lecture.mkv&engine=batched',
+                                   data=open(source, 'rb').read())
+            result = response.get_json()
+            assert result['success'], result
+            job = db.get_job(result['job_id'])
+            assert job['video_title'] == 'lecture' and db.decode_options(job['options']) == {'engine': 'batched'}
+            # The upload is gone, the worker finds its decoded audio
+            assert not os.path.exists(job['file_path'])
+            assert audio_prep.decoded_audio(job['id']) is not None
+
+            response = client.post('/submit-upload-stream?filename=notes.txt', data=b'hello')
+            assert response.status_code == 400
+        finally:
+            app.INLINE_WORKERS = original_inline
+            app.app.config['UPLOAD_FOLDER'] = original_uploads
+    finally:
+        db.DB_PATH = original_db
+        audio_prep.AUDIO_FOLDER, streaming_upload.AUDIO_FOLDER = original
+
+if __name__ == "__main__":
+    test_audio_is_decoded_while_uploading()
+    test_oversized_upload_is_rejected_and_removed()
+    test_upload_endpoint_creates_job_with_decoded_audio()
+    print("✅ Streaming upload tests passed")
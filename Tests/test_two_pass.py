@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test two-pass jobs: a tiny-model draft is published first, then replaced by the requested model's subtitles
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_prep
+import db
+import gen
+from helpers import FakeModel, use_fake_model, use_temp_audio_folder, use_temp_db
+from test_audio_prep import write_stereo_sine
+
+def use_two_pass_models(during):
+    # Each model writes its own name into the text; during[model_size] runs while that model is transcribing
+    return use_fake_model(lambda model_size: FakeModel(model_size, during=during.get(model_size)))
+
+def test_draft_is_served_until_the_refined_version_replaces_it():
+    folder = tempfile.mkdtemp()
+    during = {}
+    original = use_temp_db(folder), use_temp_audio_folder(folder), use_two_pass_models(during)
+    try:
+        import app
+        user_id = db.create_user('draft', 'draft@example.com', 'secret')
+        client = app.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+
+        video = os.path.join(folder, 'talk.m4a')
+        write_stereo_sine(video)
+        job_id = db.create_job(user_id, None, 'medium', 'upload', video, os.path.getsize(video), 'talk.m4a',
+                               options={'two_pass': True})
+
+        downloads = []
+        during['medium'] = lambda: downloads.append(
+            (db.get_job(job_id)['status'], client.get(f'/download/{job_id}').get_data(as_text=True)))
+        app.process_subtitle_job(job_id, None, 'medium', 'upload', video, {'two_pass': True})
+
+        # While the medium model ran, downloads returned the tiny draft
+        assert downloads[0][0] == 'processing' and 'tiny words' in downloads[0][1]
+        job = db.get_job(job_id)
+        assert (job['status'], job['draft_model_size']) == ('completed', 'tiny')
+        assert 'medium words' in client.get(f'/download/{job_id}').get_data(as_text=True)
+        # Both versions are kept
+        assert 'tiny words' in client.get(f'/download/{job_id}?version=draft').get_data(as_text=True)
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER, gen.model_cache = original
+
+def test_cancelled_job_stops_after_the_draft():
+    folder = tempfile.mkdtemp()
+    during = {}
+    original = use_temp_db(folder), use_temp_audio_folder(folder), use_two_pass_models(during)
+    import app
+    original_save = app.save_job_draft
+    try:
+        user_id = db.create_user('draft', 'draft@example.com', 'secret')
+        video = os.path.join(folder, 'talk.m4a')
+        write_stereo_sine(video)
+        job_id = db.create_job(user_id, None, 'medium', 'upload', video, os.path.getsize(video), 'talk.m4a',
+                               options={'two_pass': True})
+
+        def save_then_cancel(*args):
+            original_save(*args)
+            db.cancel_job(job_id)
+        app.save_job_draft = save_then_cancel
+        refined = []
+        during['medium'] = lambda: refined.append(True)
+        app.process_subtitle_job(job_id, None, 'medium', 'upload', video, {'two_pass': True})
+
+        assert not refined and db.get_job(job_id)['status'] == 'cancelled'
+    finally:
+        db.DB_PATH, audio_prep.AUDIO_FOLDER, gen.model_cache = original
+        app.save_job_draft = original_save
+
+def test_late_followers_get_the_published_draft():
+    original = use_temp_db()
+    try:
+        user_id = db.create_user('draft', 'draft@example.com', 'secret')
+        url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        leader_id, _ = db.create_coalesced_job(user_id, url, 'medium', 'dQw4w9WgXcQ', {'two_pass': True})
+        db.save_job_draft(leader_id, 'tiny words', 'tiny')
+
+        follower_id, leader = db.create_coalesced_job(user_id, url, 'medium', 'dQw4w9WgXcQ', {'two_pass': True})
+        assert leader == leader_id
+        assert db.get_job(follower_id)['draft_model_size'] == 'tiny'
+        assert tuple(db.get_job_draft(follower_id)) == ('tiny words', 'tiny')
+    finally:
+        db.DB_PATH = original
+
+def test_option_parsing():
+    import app
+    assert app.parse_transcribe_options({'two_pass': True}) == {'two_pass': True}
+    assert app.parse_transcribe_options({'two_pass': 'false'}) == {}
+
+if __name__ == "__main__":
+    test_draft_is_served_until_the_refined_version_replaces_it()
+    test_cancelled_job_stops_after_the_draft()
+    test_late_followers_get_the_published_draft()
+    test_option_parsing()
+    print("✅ Two-pass tests passed")
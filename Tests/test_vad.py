@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test voice activity detection settings and the skipped-audio stats on jobs
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import db
+import gen
+from helpers import FakeModel, use_fake_model, use_temp_db
+
+def ten_minutes(calls):
+    # 10 minutes of audio of which VAD keeps 2.5 minutes
+    return lambda model_size: FakeModel(model_size, lambda *audio: [{'start': 30.0, 'end': 32.0, 'text': ' speech'}],
+                                        duration=600.0, silence=450.0, calls=calls)
+
+def test_vad_is_on_by_default_and_configurable():
+    calls = []
+    original = use_fake_model(ten_minutes(calls))
+    try:
+        gen.transcribe_audio('a.wav', 'tiny')
+        assert calls[-1]['vad_filter'] is True
+        assert calls[-1]['vad_parameters'] == {'threshold': gen.VAD_THRESHOLD,
+                                               'min_silence_duration_ms': gen.VAD_MIN_SILENCE_MS}
+
+        gen.transcribe_audio('a.wav', 'tiny', vad_threshold=0.7, min_silence_ms=500)
+        assert calls[-1]['vad_parameters'] == {'threshold': 0.7, 'min_silence_duration_ms': 500}
+
+        gen.transcribe_audio('a.wav', 'tiny', vad=False)
+        assert calls[-1]['vad_filter'] is False and calls[-1]['vad_parameters'] is None
+    finally:
+        gen.model_cache = original
+
+def test_skipped_audio_is_recorded_on_the_job():
+    calls = []
+    original_model = use_fake_model(ten_minutes(calls))
+    original_db = use_temp_db()
+    try:
+        import app
+        options = app.parse_transcribe_options({'vad': 'on', 'vad_threshold': '0.6', 'min_silence_ms': '800'})
+        assert options == {'vad': True, 'vad_threshold': 0.6, 'min_silence_ms': 800}
+        assert app.parse_transcribe_options({'vad': False}) == {'vad': False}
+
+        user_id = db.create_user('vad', 'vad@example.com', 'secret')
+        job_id = db.create_job(user_id, None, 'tiny', 'upload', 'talk.mp4', 1, 'talk', options)
+        subtitles = app.run_transcription(job_id, np.zeros(16000, dtype=np.float32), 'tiny', options)
+        assert len(subtitles) == 1 and calls[-1]['vad_parameters']['threshold'] == 0.6
+
+        job = db.get_job(job_id)
+        assert (job['duration_seconds'], job['skipped_seconds']) == (600.0, 450.0)
+    finally:
+        gen.model_cache = original_model
+        db.DB_PATH = original_db
+
+if __name__ == "__main__":
+    test_vad_is_on_by_default_and_configurable()
+    test_skipped_audio_is_recorded_on_the_job()
+    print("✅ VAD tests passed")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the YouTube metadata cache and pre-submit validation
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from pytubefix.exceptions import VideoPrivate, BotDetection
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import video_metadata
+from helpers import use_temp_db
+
+URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+class FakeYouTube:
+    # Counts metadata fetches; streams carry signed URLs that expire in `expires_in` seconds
+    fetches = []
+    expires_in = 6 * 3600
+
+    def __init__(self, url):
+        FakeYouTube.fetches.append(url)
+        self.title = 'Never Gonna Give You Up'
+        self.length = 213
+        expire = int(time.time() + FakeYouTube.expires_in)
+        audio = [SimpleNamespace(itag=itag, bitrate=bitrate, subtype='webm', is_otf=False, is_drc=False,
+                                 url=f'https://rr1.googlevideo.com/videoplayback?itag={itag}&expire={expire}')
+                 for itag, bitrate in ((251, 142_000), (249, 57_000))]
+        self.streams = SimpleNamespace(filter=lambda only_audio: audio)
+
+class FakeCache:
+    def __enter__(self):
+        FakeYouTube.fetches = []
+        FakeYouTube.expires_in = 6 * 3600
+        self.original = use_temp_db(), video_metadata.fetch_video
+        video_metadata.fetch_video = FakeYouTube
+        return self
+
+    def __exit__(self, *exc):
+        db.DB_PATH, video_metadata.fetch_video = self.original
+
+def test_repeat_lookups_use_the_cache():
+    with FakeCache():
+        first = video_metadata.lookup_video(URL)
+        again = video_metadata.lookup_video('https://youtu.be/dQw4w9WgXcQ')
+        assert len(FakeYouTube.fetches) == 1
+        assert (again['title'], again['length_seconds'], again['audio_bitrate']) == (first['title'], 213, 57_000)
+
+        # Expired entries are fetched again
+        conn = db.get_connection()
+        with conn:
+            conn.execute('UPDATE video_metadata SET fetched_at = ?',
+                         (time.time() - video_metadata.VIDEO_METADATA_TTL_SECONDS - 1,))
+        video_metadata.lookup_video(URL)
+        assert len(FakeYouTube.fetches) == 2
+
+def test_stream_url_is_refreshed_before_it_expires():
+    with FakeCache():
+        FakeYouTube.expires_in = 10 * 60  # Inside the safety margin
+        video_metadata.lookup_video(URL)
+        FakeYouTube.expires_in = 6 * 3600
+        stream = video_metadata.get_audio_stream(URL)
+        assert len(FakeYouTube.fetches) == 2 and 'itag=249' in stream.url
+
+        # A fresh URL is reused without asking YouTube
+        assert video_metadata.get_audio_stream(URL).url == stream.url
+        assert len(FakeYouTube.fetches) == 2
+
+def test_submit_validates_and_records_duration():
+    with FakeCache():
+        import app
+        original_inline = app.INLINE_WORKERS
+        app.INLINE_WORKERS = False
+        try:
+            user_id = db.create_user('meta', 'meta@example.com', 'secret')
+            client = app.app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+
+            result = client.post('/submit-job', json={'url': URL, 'model_size': 'tiny'}).get_json()
+            job = db.get_job(result['job_id'])
+            assert (job['video_title'], job['duration_seconds']) == ('Never Gonna Give You Up', 213)
+
+            def private(url):
+                raise VideoPrivate('aaaaaaaaaaa')
+            video_metadata.fetch_video = private
+            response = client.post('/submit-job', json={'url': 'https://youtu.be/aaaaaaaaaaa'})
+            assert response.status_code == 400 and 'not available' in response.get_json()['error']
+
+            # YouTube refusing to answer is not the video's fault: the job is queued anyway
+            def blocked(url):
+                raise BotDetection('bbbbbbbbbbb')
+            video_metadata.fetch_video = blocked
+            response = client.post('/submit-job', json={'url': 'https://youtu.be/bbbbbbbbbbb'})
+            assert response.get_json()['success']
+        finally:
+            app.INLINE_WORKERS = original_inline
+
+if __name__ == "__main__":
+    test_repeat_lookups_use_the_cache()
+    test_stream_url_is_refreshed_before_it_expires()
+    test_submit_validates_and_records_duration()
+    print("✅ Video metadata tests passed")
@@ -0,0 +1,87 @@
+"""
+Admission control for YouTube jobs under queue pressure.
+
+When a job is submitted, the time until it would finish is estimated from
+the work already queued or running (the backlog, shared by the workers) plus
+the job's own transcription time; a job that finds a worker free starts at
+once. The workers are all the transcription slots of the deployment
+(TRANSCRIBE_WORKERS), not the web process's own, which has none when jobs
+run in worker.py processes. If that misses the JOB_SLO_MINUTES target,
+a smaller model that meets it is chosen instead:
+
+  ADMISSION_MODE=downgrade  run the job with the smaller model
+  ADMISSION_MODE=draft      run a draft with the smaller model now, and queue
+                            the requested model as an upgrade job that only
+                            runs when nothing else is waiting
+  ADMISSION_MODE=off        always run the requested model
+
+Models are never downgraded below ADMISSION_MIN_MODEL, and users can opt out
+per job. The decision is recorded on the job row.
+"""
+import os
+
+from job_queue import JOB_WORKERS
+from scheduler import MODEL_COST_FACTORS, job_cost
+
+# Target time from submission to finished subtitles
+JOB_SLO_SECONDS = float(os.environ.get('JOB_SLO_MINUTES', 15)) * 60
+
+ADMISSION_MODES = ('downgrade', 'draft', 'off')
+ADMISSION_MODE = os.environ.get('ADMISSION_MODE', 'downgrade')
+
+# Smallest model a job may be downgraded to
+ADMISSION_MIN_MODEL = os.environ.get('ADMISSION_MIN_MODEL', 'base')
+
+# Jobs transcribed at once by the whole deployment: the inline workers, or every worker.py process x its threads
+TRANSCRIBE_WORKERS = int(os.environ.get('TRANSCRIBE_WORKERS', JOB_WORKERS))
+
+# Seconds of audio the base model transcribes per second on one worker (other models scale by their cost factor)
+BASE_MODEL_SPEED = float(os.environ.get('BASE_MODEL_SPEED', 4))
+
+def format_minutes(seconds):
+    return f"{seconds / 60:.0f} min"
+
+def estimate_finish_seconds(model_size, duration_seconds, backlog_cost, workers, jobs_ahead=None):
+    """Queue wait (backlog spread over the workers) plus the job's own transcription time.
+
+    jobs_ahead is the number of jobs pending or running; when it is below
+    workers a worker is free and the job does not wait.
+    """
+    own = job_cost(duration_seconds, model_size) / BASE_MODEL_SPEED
+    if jobs_ahead is not None and jobs_ahead < workers:
+        return own
+    return backlog_cost / BASE_MODEL_SPEED / max(1, workers) + own
+
+def smaller_models(model_size, min_model=ADMISSION_MIN_MODEL):
+    """Models cheaper than model_size, largest first, down to min_model."""
+    requested = MODEL_COST_FACTORS.get(model_size, 1.0)
+    floor = MODEL_COST_FACTORS.get(min_model, 0)
+    models = [m for m, factor in MODEL_COST_FACTORS.items() if floor <= factor < requested]
+    # One model per speed class (large-v1/v2/v3 cost the same), newest first
+    by_factor = {}
+    for m in sorted(models, reverse=True):
+        by_factor.setdefault(MODEL_COST_FACTORS[m], m)
+    return [by_factor[f] for f in sorted(by_factor, reverse=True)]
+
+def decide(model_size, duration_seconds, backlog_cost, workers, jobs_ahead=None, mode=ADMISSION_MODE,
+           slo_seconds=JOB_SLO_SECONDS, min_model=ADMISSION_MIN_MODEL):
+    """Return (model to run now, decision, note).
+
+    decision is None (run as requested), 'downgraded' or 'draft'.
+    """
+    estimate = estimate_finish_seconds(model_size, duration_seconds, backlog_cost, workers, jobs_ahead)
+    if mode == 'off' or estimate <= slo_seconds:
+        return model_size, None, None
+
+    choice = None
+    for candidate in smaller_models(model_size, min_model):
+        choice = candidate
+        if estimate_finish_seconds(candidate, duration_seconds, backlog_cost, workers, jobs_ahead) <= slo_seconds:
+            break
+    if choice is None:
+        return model_size, None, None
+
+    decision = 'draft' if mode == 'draft' else 'downgraded'
+    note = (f"Queue busy: {model_size} would take ~{format_minutes(estimate)} "
+            f"(target {format_minutes(slo_seconds)}), using {choice}")
+    return choice, decision, note
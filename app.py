@@ -1,27 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, send_file, Response
 from flask_cors import CORS
-import sqlite3
-import hashlib
 import uuid
-import threading
 import os
 import time
 import sys
 from datetime import datetime
 import io
+import queue
 import zipfile
 from werkzeug.utils import secure_filename
 
-# DEBUG: Added enhanced error logging for upload debugging
-# Database connection lock to prevent concurrent access issues
-db_lock = threading.Lock()
-
 # Add parent directory to Python path to import gen.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import your existing functions
-from gen import download_audio, transcribe_audio, clean_youtube_url
-from pytubefix import YouTube
+from gen import (download_audio, remove_downloads, purge_stale_downloads, transcribe_audio, extract_video_id,
+                 TRANSCRIBE_TASK, TRANSCRIBE_ENGINES, JobCancelled)
+from job_queue import JobExecutor
+from cpu_partition import core_allocator
+from db import (DB_PATH, JOB_STATUSES, JOBS_PAGE_SIZE, init_db, hash_password, get_user_by_username,
+                create_user, get_user_jobs, create_job, create_coalesced_job, update_job_status, get_job,
+                get_job_subtitles, cancel_job, is_job_abandoned, save_job_segments, clear_job_segments,
+                get_job_segments, record_audio_stats, create_upload_session, get_upload_session, find_upload_session,
+                mark_chunk_received, get_received_chunks, delete_upload_session, find_completed_uploads,
+                find_upload_audio, save_job_draft, get_job_draft, get_job_scored_segments, create_refine_job,
+                record_reprocessed_seconds, decode_options, get_refinable_job_ids)
+from result_cache import get_cached_result, store_result, options_key
+from long_form import use_long_form, transcribe_long_audio
+from audio_prep import (SAMPLE_RATE, prepare_audio, decoded_audio, has_decoded_audio, purge_expired_audio, remove_file,
+                        media_duration)
+from streaming_upload import StreamingUpload, UploadTooLarge
+from video_metadata import lookup_video, get_audio_stream, validate_video, VideoRejected
+from admission import TRANSCRIBE_WORKERS, decide as admission_decide
+from scheduler import MODEL_COST_FACTORS
+from refine import refine_subtitles, weak_ranges
+from resumable_upload import (UPLOAD_SESSION_CHUNK_BYTES, part_path, chunk_count, create_part_file, write_chunk,
+                              file_sha256, copy_decoded_audio, purge_expired_sessions)
+from events import (broker, changes_since, format_sse, EVENTS_KEEPALIVE_SECONDS, EVENTS_STREAM_SECONDS,
+                    EVENTS_LONG_POLL_SECONDS, EVENTS_RETRY_SECONDS)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
@@ -39,147 +55,160 @@ def allowed_file(filename):
 # Create upload directory if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect('subtitleai.db')
-    c = conn.cursor()
-    
-    # Users table
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  username TEXT UNIQUE NOT NULL,
-                  email TEXT UNIQUE NOT NULL,
-                  password_hash TEXT NOT NULL,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Jobs table
-    c.execute('''CREATE TABLE IF NOT EXISTS jobs
-                 (id TEXT PRIMARY KEY,
-                  user_id INTEGER NOT NULL,
-                  url TEXT,
-                  video_title TEXT,
-                  model_size TEXT DEFAULT 'base',
-                  status TEXT DEFAULT 'pending',
-                  progress TEXT,
-                  subtitle_content TEXT,
-                  error_message TEXT,
-                  job_type TEXT DEFAULT 'youtube',
-                  file_path TEXT,
-                  file_size INTEGER,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  completed_at TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users (id))''')
-    
-    conn.commit()
-    conn.close()
-
-# Helper functions
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def get_user_by_username(username):
-    conn = sqlite3.connect('subtitleai.db')
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    user = c.fetchone()
-    conn.close()
-    return user
-
-def create_user(username, email, password):
-    conn = sqlite3.connect('subtitleai.db')
-    c = conn.cursor()
-    try:
-        password_hash = hash_password(password)
-        c.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
-                  (username, email, password_hash))
-        conn.commit()
-        user_id = c.lastrowid
-        conn.close()
-        return user_id
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None
+# Model of the quick first pass of two-pass jobs
+TWO_PASS_DRAFT_MODEL = os.environ.get('TWO_PASS_DRAFT_MODEL', 'tiny')
 
-def get_user_jobs(user_id):
-    with db_lock:  # Use thread lock to prevent database locking
-        conn = sqlite3.connect('subtitleai.db', timeout=10.0)  # Add timeout
-        c = conn.cursor()
-        c.execute('''SELECT id, user_id, url, video_title, model_size, status, progress,
-                            subtitle_content, error_message, job_type, file_path, file_size,
-                            created_at, completed_at FROM jobs 
-                     WHERE user_id = ? ORDER BY created_at DESC''', (user_id,))
-        jobs = c.fetchall()
-        conn.close()
-        return jobs
-
-def create_job(user_id, url=None, model_size='base', job_type='youtube', file_path=None, file_size=None, video_title=None):
-    job_id = str(uuid.uuid4())
-    
-    with db_lock:  # Use thread lock to prevent database locking
-        conn = sqlite3.connect('subtitleai.db', timeout=10.0)  # Add timeout
-        c = conn.cursor()
-        
-        try:
-            if job_type == 'upload':
-                c.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type, file_path, file_size, video_title) 
-                             VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', ?, ?, ?, ?)''',
-                          (job_id, user_id, url, model_size, job_type, file_path, file_size, video_title))
-            else:
-                c.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type) 
-                             VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', ?)''',
-                          (job_id, user_id, url, model_size, job_type))
-            
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+def complete_from_cache(job_id, cached):
+    """Complete a YouTube job from a subtitle_cache row, skipping download and transcription."""
+    update_job_status(job_id, 'completed', f"✅ Generated {cached['segment_count']} subtitle segments (cached)",
+                      cached['video_title'], cached['content'], segments=cached['segments'])
+    print(f"⚡ Job {job_id} completed from cache")
+
+def partial_results_saver(job_id):
+    """Callback for transcribe_audio that saves each batch of segments as it is produced.
+
+    Progress is reported as seconds transcribed out of the audio duration, and
+    transcription stops early if the job was cancelled and nobody waits for it.
+    """
+    clear_job_segments(job_id)  # Left over from an attempt that was interrupted
+    saved = 0
+    
+    def on_segments(subtitles, duration):
+        nonlocal saved
+        if is_job_abandoned(job_id):
+            raise JobCancelled(job_id)
+        save_job_segments(job_id, saved, subtitles)
+        saved += len(subtitles)
+        transcribed = min(subtitles[-1]['end'], duration)
+        percent = int(transcribed * 100 / duration) if duration else 0
+        update_job_status(job_id, 'processing',
+                          f'Generating subtitles with AI... {format_clock(transcribed)} / {format_clock(duration)} ({percent}%)',
+                          progress_seconds=transcribed, duration_seconds=duration)
     
-    return job_id
+    return on_segments
 
-def update_job_status(job_id, status, progress=None, video_title=None, subtitle_content=None, error_message=None):
-    with db_lock:  # Use thread lock to prevent database locking
-        conn = sqlite3.connect('subtitleai.db', timeout=10.0)  # Add timeout
-        c = conn.cursor()
-        
+def parse_transcribe_options(values):
+    """Validate per-job transcription settings from a JSON body or form, raising ValueError."""
+    options = {}
+    engine = values.get('engine')
+    if engine:
+        if engine not in TRANSCRIBE_ENGINES:
+            raise ValueError(f"engine must be one of {', '.join(TRANSCRIBE_ENGINES)}")
+        options['engine'] = engine
+    batch_size = values.get('batch_size')
+    if batch_size not in (None, ''):
         try:
-            if status == 'completed':
-                print(f"DEBUG: Completing job {job_id}, subtitle_content length: {len(subtitle_content) if subtitle_content else 0}")
-                c.execute('''UPDATE jobs SET status = ?, progress = ?, video_title = ?, 
-                                          subtitle_content = ?, completed_at = CURRENT_TIMESTAMP 
-                             WHERE id = ?''',
-                          (status, progress, video_title, subtitle_content, job_id))
-            elif status == 'failed':
-                c.execute('''UPDATE jobs SET status = ?, progress = ?, error_message = ?, 
-                                          completed_at = CURRENT_TIMESTAMP 
-                             WHERE id = ?''',
-                          (status, progress, error_message, job_id))
-            else:
-                c.execute('UPDATE jobs SET status = ?, progress = ? WHERE id = ?',
-                          (status, progress, job_id))
-            
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            batch_size = int(batch_size)
+        except (TypeError, ValueError):
+            raise ValueError('batch_size must be a number')
+        if not 1 <= batch_size <= 64:
+            raise ValueError('batch_size must be between 1 and 64')
+        options['batch_size'] = batch_size
+    vad = values.get('vad')
+    if vad not in (None, ''):
+        options['vad'] = vad not in (False, 0, '0', 'false', 'off')
+    vad_threshold = values.get('vad_threshold')
+    if vad_threshold not in (None, ''):
+        try:
+            vad_threshold = float(vad_threshold)
+        except (TypeError, ValueError):
+            raise ValueError('vad_threshold must be a number')
+        if not 0 < vad_threshold < 1:
+            raise ValueError('vad_threshold must be between 0 and 1')
+        options['vad_threshold'] = vad_threshold
+    min_silence_ms = values.get('min_silence_ms')
+    if min_silence_ms not in (None, ''):
+        try:
+            min_silence_ms = int(min_silence_ms)
+        except (TypeError, ValueError):
+            raise ValueError('min_silence_ms must be a number')
+        if not 0 <= min_silence_ms <= 10000:
+            raise ValueError('min_silence_ms must be between 0 and 10000')
+        options['min_silence_ms'] = min_silence_ms
+    two_pass = values.get('two_pass')
+    if two_pass not in (None, '') and two_pass not in (False, 0, '0', 'false', 'off'):
+        options['two_pass'] = True
+    return options
+
+def run_transcription(job_id, audio, model_size, options):
+    """Transcribe a job's audio. Two-pass jobs first publish a draft made with TWO_PASS_DRAFT_MODEL."""
+    options = dict(options)
+    two_pass = options.pop('two_pass', False)
+    # A retried job keeps the draft its previous attempt published
+    if two_pass and model_size != TWO_PASS_DRAFT_MODEL and get_job_draft(job_id) is None:
+        draft = transcribe_pass(job_id, audio, TWO_PASS_DRAFT_MODEL, options)
+        if draft:
+            save_job_draft(job_id, subtitles_to_srt(draft), TWO_PASS_DRAFT_MODEL)
+            update_job_status(job_id, 'processing', f'📝 Draft ready, refining with the {model_size} model...')
+            print(f"📝 Draft of job {job_id} published ({len(draft)} segments)")
+        # Nobody is waiting for the refined subtitles of a cancelled job
+        if is_job_abandoned(job_id):
+            raise JobCancelled(job_id)
+    return transcribe_pass(job_id, audio, model_size, options)
+
+def transcribe_pass(job_id, audio, model_size, options):
+    on_segments = partial_results_saver(job_id)
+    
+    def on_info(duration, speech_seconds):
+        # Silence and music removed by VAD are never decoded
+        record_audio_stats(job_id, duration, duration - speech_seconds)
+        print(f"🔇 VAD skipped {format_clock(duration - speech_seconds)} of {format_clock(duration)} audio")
+    
+    # Long recordings are split into chunks transcribed in parallel processes
+    if use_long_form(len(audio) / SAMPLE_RATE):
+        return transcribe_long_audio(audio, model_size, on_segments, on_info, **options)
+    return transcribe_audio(audio, model_size, on_segments, on_info, **options)
 
-def get_job(job_id):
-    conn = sqlite3.connect('subtitleai.db')
-    c = conn.cursor()
-    c.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
-    job = c.fetchone()
-    conn.close()
-    return job
+def refine_job(job_id, url, model_size, options):
+    """Re-transcribe the weak segments of the job this one upgrades, and complete with the spliced subtitles."""
+    source_id = get_job(job_id)['upgrade_of_job_id']
+    source = get_job(source_id)
+    segments = get_job_scored_segments(source_id)
+    if not segments:
+        update_job_status(job_id, 'failed', 'No confidence scores to refine', error_message='No confidence scores')
+        return
+    
+    audio = decoded_audio(source_id)
+    if audio is None:
+        audio = decoded_audio(job_id)
+    if audio is None:
+        if not url:
+            update_job_status(job_id, 'failed', 'The uploaded audio is no longer available',
+                              error_message='Decoded audio was purged')
+            return
+        update_job_status(job_id, 'processing', 'Downloading audio...')
+        audio = prepare_audio(job_id, download_audio(url, stream=get_audio_stream(url), name=job_id))
+    
+    update_job_status(job_id, 'processing', f'Re-transcribing unclear parts with the {model_size} model...')
+    options = {key: value for key, value in options.items() if key != 'two_pass'}
+    def before_range():
+        # A cancelled refine job stops at the next range
+        if is_job_abandoned(job_id):
+            raise JobCancelled(job_id)
+    
+    subtitles, reprocessed, ranges = refine_subtitles(audio, segments, model_size, transcribe_audio,
+                                                      before_range=before_range, **options)
+    duration = len(audio) / SAMPLE_RATE
+    record_reprocessed_seconds(job_id, reprocessed)
+    share = reprocessed * 100 / duration if duration else 0
+    update_job_status(job_id, 'completed',
+                      f'✅ Re-transcribed {ranges} unclear part(s): {format_clock(reprocessed)} of '
+                      f'{format_clock(duration)} audio ({share:.0f}% of a full re-run)',
+                      source['video_title'], subtitles_to_srt(subtitles), segments=subtitles)
+    print(f"🔍 Refined job {source_id} with {model_size}: {reprocessed:.0f}s of {duration:.0f}s re-transcribed")
 
 # Background job processing
-def process_subtitle_job(job_id, url=None, model_size='base', job_type='youtube', file_path=None):
+def process_subtitle_job(job_id, url=None, model_size='base', job_type='youtube', file_path=None, options=None):
+    options = options or {}
     try:
         print(f"🎬 Processing {job_type} job {job_id}")
+        purge_expired_audio()
+        purge_stale_downloads()
+        
+        if job_type == 'refine':
+            refine_job(job_id, url, model_size, options)
         
-        if job_type == 'upload':
+        elif job_type == 'upload':
             print(f"🎬 Processing uploaded video: {file_path}")
             update_job_status(job_id, 'processing', 'Processing uploaded video...')
             
@@ -187,85 +216,109 @@ def process_subtitle_job(job_id, url=None, model_size='base', job_type='youtube'
             video_title = os.path.splitext(os.path.basename(file_path))[0]
             video_title = "".join(c for c in video_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
             
+            # Decode the audio track once; the uploaded video is deleted right after
+            update_job_status(job_id, 'processing', 'Extracting audio...', video_title)
+            audio = prepare_audio(job_id, file_path)
+            
             update_job_status(job_id, 'processing', 'Generating subtitles with AI...', video_title)
             
-            # Transcribe the uploaded video directly
-            subtitles = transcribe_audio(file_path, model_size)
+            subtitles = run_transcription(job_id, audio, model_size, options)
             
             if not subtitles:
                 update_job_status(job_id, 'failed', 'Failed to generate subtitles', error_message='No subtitles generated')
                 return
             
             # Generate SRT content
-            srt_content = ""
-            for i, sub in enumerate(subtitles, 1):
-                start_time = seconds_to_srt_time(sub["start"])
-                end_time = seconds_to_srt_time(sub["end"])
-                srt_content += f"{i}\n{start_time} --> {end_time}\n{sub['text']}\n\n"
-            
-            # Clean up uploaded file after processing
-            try:
-                os.remove(file_path)
-                print(f"🗑️ Cleaned up uploaded file: {file_path}")
-            except Exception as e:
-                print(f"Warning: Could not remove uploaded file: {e}")
+            srt_content = subtitles_to_srt(subtitles)
             
             update_job_status(job_id, 'completed', f'✅ Generated {len(subtitles)} subtitle segments', 
-                             video_title, srt_content)
+                             video_title, srt_content, segments=subtitles)
             
             print(f"✅ Upload job {job_id} completed successfully!")
             
         else:
             # Original YouTube processing logic
             print(f"🎬 Processing YouTube job {job_id}: {url}")
+            
+            # A previous job may have transcribed this video with the same model
+            video_id = extract_video_id(url)
+            cached = get_cached_result(video_id, model_size, TRANSCRIBE_TASK, options)
+            if cached is not None:
+                complete_from_cache(job_id, cached)
+                return
+            
             update_job_status(job_id, 'processing', 'Getting video information...')
             
-            # Get video title
+            # Get video title (cached metadata, usually looked up when the job was submitted)
             try:
-                yt = YouTube(clean_youtube_url(url))
-                video_title = yt.title
+                video_title = lookup_video(url)['title']
                 video_title = "".join(c for c in video_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
             except Exception as e:
                 video_title = "YouTube Video"
                 print(f"Warning: Could not get video title: {e}")
             
-            update_job_status(job_id, 'processing', 'Downloading audio...', video_title)
+            # Stop early if the job was cancelled and no coalesced job is waiting on it
+            if is_job_abandoned(job_id):
+                print(f"🛑 Job {job_id} was cancelled")
+                return
             
-            # Download audio
-            audio_path = download_audio(url)
-            print(f"✅ Audio downloaded: {audio_path}")
+            # A retried job reuses the audio its previous attempt already decoded
+            audio = decoded_audio(job_id)
+            if audio is None:
+                update_job_status(job_id, 'processing', 'Downloading audio...', video_title)
+                
+                # Download audio
+                audio_path = download_audio(url, stream=get_audio_stream(url), name=job_id)
+                print(f"✅ Audio downloaded: {audio_path}")
+                
+                if is_job_abandoned(job_id):
+                    print(f"🛑 Job {job_id} was cancelled")
+                    remove_file(audio_path)
+                    return
+                
+                # Decode once to 16 kHz mono; the download is deleted right after
+                update_job_status(job_id, 'processing', 'Extracting audio...')
+                audio = prepare_audio(job_id, audio_path)
             
             update_job_status(job_id, 'processing', 'Generating subtitles with AI...')
             
             # Generate subtitles
-            subtitles = transcribe_audio(audio_path, model_size)
+            subtitles = run_transcription(job_id, audio, model_size, options)
             
             if not subtitles:
                 update_job_status(job_id, 'failed', 'Failed to generate subtitles', error_message='No subtitles generated')
                 return
             
             # Generate SRT content
-            srt_content = ""
-            for i, sub in enumerate(subtitles, 1):
-                start_time = seconds_to_srt_time(sub["start"])
-                end_time = seconds_to_srt_time(sub["end"])
-                srt_content += f"{i}\n{start_time} --> {end_time}\n{sub['text']}\n\n"
-            
-            # Clean up audio file
-            try:
-                os.remove(audio_path)
-                print(f"🗑️ Cleaned up: {audio_path}")
-            except Exception as e:
-                print(f"Warning: Could not remove temp file: {e}")
+            srt_content = subtitles_to_srt(subtitles)
             
             update_job_status(job_id, 'completed', f'✅ Generated {len(subtitles)} subtitle segments', 
-                             video_title, srt_content)
+                             video_title, srt_content, segments=subtitles)
+            store_result(video_id, model_size, TRANSCRIBE_TASK, srt_content, len(subtitles), video_title, options,
+                         subtitles)
             
             print(f"✅ YouTube job {job_id} completed successfully!")
         
+    except JobCancelled:
+        # Cancelled while transcribing: the job keeps its cancelled status
+        print(f"🛑 Job {job_id} was cancelled")
+        remove_downloads(job_id)
     except Exception as e:
         print(f"❌ Job {job_id} failed: {str(e)}")
         update_job_status(job_id, 'failed', f'❌ Error: {str(e)}', error_message=str(e))
+        # A failed or cancelled job is not retried, so its partial download would never be resumed
+        remove_downloads(job_id)
+
+# Bounded pool of workers that claims pending jobs from the database and runs process_subtitle_job
+job_executor = JobExecutor(process_subtitle_job, DB_PATH)
+
+# Set JOB_INLINE_WORKERS=0 when jobs are run by separate `python worker.py` processes,
+# the web app then only enqueues them
+INLINE_WORKERS = os.environ.get('JOB_INLINE_WORKERS', '1') != '0'
+
+# Inline workers split this process's cores; the queue length sizes each job's share
+if INLINE_WORKERS:
+    core_allocator.configure(slots=job_executor.workers, waiting=job_executor.depth)
 
 def seconds_to_srt_time(seconds):
     hours = int(seconds // 3600)
@@ -274,6 +327,20 @@ def seconds_to_srt_time(seconds):
     milliseconds = int((seconds - int(seconds)) * 1000)
     return f"{hours:02}:{minutes:02}:{secs:02},{milliseconds:03}"
 
+def subtitles_to_srt(subtitles):
+    srt_content = ""
+    for i, sub in enumerate(subtitles, 1):
+        start_time = seconds_to_srt_time(sub["start"])
+        end_time = seconds_to_srt_time(sub["end"])
+        srt_content += f"{i}\n{start_time} --> {end_time}\n{sub['text']}\n\n"
+    return srt_content
+
+def format_clock(seconds):
+    # 1:02:03 / 4:05
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{secs:02}" if hours else f"{minutes}:{secs:02}"
+
 # Routes
 @app.route('/')
 def index():
@@ -340,8 +407,45 @@ def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    jobs = get_user_jobs(session['user_id'])
-    return render_template('dashboard.html', jobs=jobs, username=session['username'])
+    status = request.args.get('status', '')
+    statuses = [s for s in status.split(',') if s in JOB_STATUSES]
+    # The event stream sends changes made after this point
+    events_since = time.time()
+    try:
+        jobs, next_cursor = get_user_jobs(session['user_id'], cursor=request.args.get('cursor'),
+                                          statuses=statuses)
+    except ValueError:
+        return redirect(url_for('dashboard'))
+    # Only offer "Fix unclear parts" where /jobs/<id>/upgrade can run
+    refinable = get_refinable_job_ids([job['id'] for job in jobs if job['status'] == 'completed'])
+    return render_template('dashboard.html', jobs=jobs, username=session['username'],
+                           next_cursor=next_cursor, status_filter=','.join(statuses),
+                           is_first_page=not request.args.get('cursor'), events_since=events_since,
+                           refinable=refinable)
+
+@app.route('/api/jobs')
+def api_jobs():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    limit = request.args.get('limit', JOBS_PAGE_SIZE, type=int)
+    if not 1 <= limit <= 100:
+        return jsonify({'success': False, 'error': 'limit must be between 1 and 100'}), 400
+    
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    if any(s not in JOB_STATUSES for s in statuses):
+        return jsonify({'success': False, 'error': f"status must be one of {', '.join(JOB_STATUSES)}"}), 400
+    
+    try:
+        jobs, next_cursor = get_user_jobs(session['user_id'], limit, request.args.get('cursor'), statuses)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'success': True,
+        'jobs': [dict(job) for job in jobs],
+        'next_cursor': next_cursor
+    })
 
 @app.route('/submit-job', methods=['POST'])
 def submit_job():
@@ -358,15 +462,69 @@ def submit_job():
     if 'youtube.com' not in url and 'youtu.be' not in url:
         return jsonify({'success': False, 'error': 'Please provide a valid YouTube URL'}), 400
     
-    # Create job
-    job_id = create_job(session['user_id'], url, model_size, 'youtube')
+    try:
+        options = parse_transcribe_options(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Videos that were already transcribed with this model and these settings complete immediately
+    cached = get_cached_result(extract_video_id(url), model_size, TRANSCRIBE_TASK, options)
+    
+    if cached is None and job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
+    if cached is not None:
+        job_id = create_job(session['user_id'], url, model_size, 'youtube', options=options)
+        complete_from_cache(job_id, cached)
+        return jsonify({'success': True, 'job_id': job_id, 'cached': True})
+    
+    # Reject unavailable videos now, and record the title and duration on the job
+    try:
+        metadata = validate_video(url)
+    except VideoRejected as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    video_title = metadata['title'] if metadata else None
+    duration_seconds = metadata['length_seconds'] if metadata else None
     
-    # Start background processing
-    thread = threading.Thread(target=process_subtitle_job, args=(job_id, url, model_size, 'youtube'))
-    thread.daemon = True
-    thread.start()
+    # Under load, use a smaller model that can still finish within the SLO (unless the user opted out)
+    admission = None
+    run_model = model_size
+    if data.get('allow_downgrade', True) is not False:
+        # Capacity of every worker sharing the queue (at least the jobs running now), not just this process's
+        backlog, pending, running = job_executor.load()
+        run_model, decision, note = admission_decide(model_size, duration_seconds, backlog,
+                                                     max(TRANSCRIBE_WORKERS, running), pending + running)
+        if decision:
+            admission = {'requested_model_size': model_size, 'decision': decision, 'note': note}
+            print(f"⚖️ {note}")
     
-    return jsonify({'success': True, 'job_id': job_id})
+    # Create job, or attach it to an identical job that is already queued or running
+    job_id, leader_job_id = create_coalesced_job(session['user_id'], url, run_model, extract_video_id(url), options,
+                                                 video_title, duration_seconds, admission)
+    
+    response = {'success': True, 'job_id': job_id}
+    if admission:
+        response['admission'] = {'decision': admission['decision'], 'model_size': run_model,
+                                 'requested_model_size': model_size, 'note': admission['note']}
+    if admission and admission['decision'] == 'draft':
+        # The requested model runs later, once nothing else is waiting
+        upgrade_job_id, _ = create_coalesced_job(session['user_id'], url, model_size, extract_video_id(url), options,
+                                                 video_title, duration_seconds,
+                                                 {'decision': 'upgrade', 'upgrade_of': job_id,
+                                                  'note': f'Full-quality {model_size} version of a {run_model} draft'})
+        response['upgrade_job_id'] = upgrade_job_id
+    
+    if leader_job_id is not None:
+        print(f"🔗 Job {job_id} follows in-flight job {leader_job_id}")
+        response.update(coalesced=True, queue_position=job_executor.position(leader_job_id))
+        return jsonify(response)
+    
+    # Wake a worker to pick up the pending job
+    if INLINE_WORKERS:
+        job_executor.notify()
+    
+    response['queue_position'] = job_executor.position(job_id)
+    return jsonify(response)
 
 @app.route('/submit-upload', methods=['POST'])
 def submit_upload():
@@ -385,6 +543,14 @@ def submit_upload():
     if not allowed_file(file.filename):
         return jsonify({'success': False, 'error': 'Invalid file type. Please upload a video file (mp4, avi, mov, etc.)'}), 400
     
+    try:
+        options = parse_transcribe_options(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
     try:
         # Secure the filename and save
         filename = secure_filename(file.filename)
@@ -402,39 +568,434 @@ def submit_upload():
         # Get video title from filename
         video_title = os.path.splitext(filename)[0]
         
-        # Create job
+        # Create job; the duration lets the scheduler estimate its cost
         job_id = create_job(session['user_id'], None, model_size, 'upload', 
-                           file_path, file_size, video_title)
+                           file_path, file_size, video_title, options,
+                           duration_seconds=media_duration(file_path))
+        
+        # Wake a worker to pick up the pending job
+        if INLINE_WORKERS:
+            job_executor.notify()
+        
+        return jsonify({'success': True, 'job_id': job_id, 'filename': filename,
+                        'queue_position': job_executor.position(job_id)})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Upload failed: {str(e)}'}), 500
+
+@app.route('/submit-upload-stream', methods=['POST'])
+def submit_upload_stream():
+    # Raw request body (not multipart): ?filename=...&model_size=... plus the transcription options.
+    # The body is streamed to disk in chunks and its audio is decoded while it arrives.
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    filename = secure_filename(request.args.get('filename', ''))
+    model_size = request.args.get('model_size', 'base')
+    
+    if filename == '':
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+    
+    if not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Invalid file type. Please upload a video file (mp4, avi, mov, etc.)'}), 400
+    
+    try:
+        options = parse_transcribe_options(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Reject oversized uploads before reading any of the body
+    max_size = app.config['MAX_CONTENT_LENGTH']
+    if request.content_length is not None and request.content_length > max_size:
+        return jsonify({'success': False, 'error': f'File too large (max {max_size // (1024 * 1024)} MB)'}), 413
+    
+    if job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    upload = StreamingUpload(file_path, request.content_length, max_size)
+    try:
+        file_size = upload.write_from(request.stream)
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Upload failed: {str(e)}'}), 400
+    
+    if request.content_length is not None and file_size != request.content_length:
+        upload.abort()
+        return jsonify({'success': False, 'error': 'Upload was interrupted'}), 400
+    
+    try:
+        # The upload is no longer needed once its audio has been decoded
+        audio_path = upload.decoded_audio()
+        if audio_path:
+            print(f"🎵 Decoded audio of {filename} during upload")
+            remove_file(file_path)
+        
+        video_title = os.path.splitext(filename)[0]
+        job_id = create_job(session['user_id'], None, model_size, 'upload',
+                            file_path, file_size, video_title, options, audio_path,
+                            duration_seconds=media_duration(audio_path or file_path))
         
-        # Start background processing
-        thread = threading.Thread(target=process_subtitle_job, 
-                                args=(job_id, None, model_size, 'upload', file_path))
-        thread.daemon = True
-        thread.start()
+        # Wake a worker to pick up the pending job
+        if INLINE_WORKERS:
+            job_executor.notify()
         
-        return jsonify({'success': True, 'job_id': job_id, 'filename': filename})
+        return jsonify({'success': True, 'job_id': job_id, 'filename': filename,
+                        'queue_position': job_executor.position(job_id)})
         
     except Exception as e:
         return jsonify({'success': False, 'error': f'Upload failed: {str(e)}'}), 500
 
+def is_sha256(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+def upload_session_status(upload):
+    return {'success': True, 'upload_id': upload['id'], 'chunk_size': upload['chunk_size'],
+            'chunk_count': chunk_count(upload['file_size'], upload['chunk_size']),
+            'received': get_received_chunks(upload['id'])}
+
+@app.route('/uploads', methods=['POST'])
+def init_upload():
+    # Resumable upload, step 1: JSON {filename, size, sha256, model_size, ...options}.
+    # Answers with the job directly when the same file was uploaded before, otherwise
+    # with an upload session (resumed if the same file is still being uploaded).
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(str(data.get('filename', '')))
+    file_size = data.get('size')
+    sha256 = str(data.get('sha256', '')).lower() or None
+    model_size = data.get('model_size', 'base')
+    
+    if filename == '':
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+    
+    if not allowed_file(filename):
+        return jsonify({'success': False, 'error': 'Invalid file type. Please upload a video file (mp4, avi, mov, etc.)'}), 400
+    
+    max_size = app.config['MAX_CONTENT_LENGTH']
+    if not isinstance(file_size, int) or file_size <= 0:
+        return jsonify({'success': False, 'error': 'Invalid file size'}), 400
+    if file_size > max_size:
+        return jsonify({'success': False, 'error': f'File too large (max {max_size // (1024 * 1024)} MB)'}), 413
+    
+    if sha256 is not None and not is_sha256(sha256):
+        return jsonify({'success': False, 'error': 'Invalid SHA-256'}), 400
+    
+    try:
+        options = parse_transcribe_options(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    user_id = session['user_id']
+    video_title = os.path.splitext(filename)[0]
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
+    
+    # Same file, same settings (compared like the result cache does): reuse the subtitles without uploading anything
+    previous = next((row for row in find_completed_uploads(user_id, sha256, model_size)
+                     if options_key(decode_options(row['options'])) == options_key(options)), None)
+    if previous is not None:
+        job_id = create_job(user_id, None, model_size, 'upload', file_path, file_size, video_title, options,
+                            content_sha256=sha256)
+        # With the scored segments, so the copy can be refined like the original
+        update_job_status(job_id, 'completed', '✅ Reused subtitles of an identical upload', video_title,
+                          previous['content'], segments=get_job_scored_segments(previous['id']))
+        print(f"⚡ Upload job {job_id} reused the subtitles of job {previous['id']}")
+        return jsonify({'success': True, 'job_id': job_id, 'reused': 'subtitles', 'filename': filename})
+    
+    if job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
+    # Same file, other settings: transcribe the audio decoded for the earlier job
+    audio_path = find_upload_audio(user_id, sha256)
+    if audio_path and os.path.exists(audio_path):
+        job_id = create_job(user_id, None, model_size, 'upload', file_path, file_size, video_title, options,
+                            copy_decoded_audio(audio_path, uuid.uuid4()), sha256, media_duration(audio_path))
+        if INLINE_WORKERS:
+            job_executor.notify()
+        print(f"⚡ Upload job {job_id} reuses decoded audio, skipping the transfer")
+        return jsonify({'success': True, 'job_id': job_id, 'reused': 'audio', 'filename': filename,
+                        'queue_position': job_executor.position(job_id)})
+    
+    upload_folder = app.config['UPLOAD_FOLDER']
+    purge_expired_sessions(upload_folder)
+    upload = find_upload_session(user_id, sha256, file_size)
+    if upload is None or not os.path.exists(part_path(upload_folder, upload['id'])):
+        upload_id = create_upload_session(user_id, filename, file_size, UPLOAD_SESSION_CHUNK_BYTES, sha256)
+        create_part_file(upload_folder, upload_id, file_size)
+        upload = get_upload_session(upload_id)
+    return jsonify(upload_session_status(upload))
+
+def get_own_upload(upload_id):
+    upload = get_upload_session(upload_id)
+    if upload is None or upload['user_id'] != session['user_id']:
+        return None
+    return upload
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    # Which chunks the server already has, so an interrupted upload can resume
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify(upload_session_status(upload))
+
+@app.route('/uploads/<upload_id>/chunks/<int:chunk_index>', methods=['PUT'])
+def upload_chunk(upload_id, chunk_index):
+    # Resumable upload, step 2: the raw bytes of one chunk (safe to send again)
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    
+    if request.content_length is not None and request.content_length > upload['chunk_size']:
+        return jsonify({'success': False, 'error': 'Chunk too large'}), 413
+    
+    try:
+        write_chunk(app.config['UPLOAD_FOLDER'], upload, chunk_index, request.stream)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Upload failed: {str(e)}'}), 500
+    
+    mark_chunk_received(upload_id, chunk_index)
+    return jsonify({'success': True, 'chunk': chunk_index})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    # Resumable upload, step 3: JSON {model_size, ...options}; turns the assembled file into a job
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    upload = get_own_upload(upload_id)
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    model_size = data.get('model_size', 'base')
+    try:
+        options = parse_transcribe_options(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    total = chunk_count(upload['file_size'], upload['chunk_size'])
+    missing = sorted(set(range(total)) - set(get_received_chunks(upload_id)))
+    if missing:
+        return jsonify({'success': False, 'error': 'Upload is incomplete', 'missing': missing}), 409
+    
+    upload_folder = app.config['UPLOAD_FOLDER']
+    assembled = part_path(upload_folder, upload_id)
+    if upload['sha256'] and file_sha256(assembled) != upload['sha256']:
+        # A corrupted chunk: start again from scratch
+        remove_file(assembled)
+        delete_upload_session(upload_id)
+        return jsonify({'success': False, 'error': 'Uploaded file does not match its checksum, please retry'}), 422
+    
+    # Keep the session and its chunks so the client can finalize again once the queue drains
+    if job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
+    file_path = os.path.join(upload_folder, f"{upload_id}_{upload['filename']}")
+    os.replace(assembled, file_path)
+    delete_upload_session(upload_id)
+    
+    video_title = os.path.splitext(upload['filename'])[0]
+    job_id = create_job(session['user_id'], None, model_size, 'upload', file_path, upload['file_size'],
+                        video_title, options, content_sha256=upload['sha256'],
+                        duration_seconds=media_duration(file_path))
+    
+    # Wake a worker to pick up the pending job
+    if INLINE_WORKERS:
+        job_executor.notify()
+    
+    return jsonify({'success': True, 'job_id': job_id, 'filename': upload['filename'],
+                    'queue_position': job_executor.position(job_id)})
+
 @app.route('/job-status/<job_id>')
 def job_status(job_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
     job = get_job(job_id)
-    if not job or job[1] != session['user_id']:  # job[1] is user_id
+    if not job or job['user_id'] != session['user_id']:
         return jsonify({'success': False, 'error': 'Job not found'}), 404
     
     return jsonify({
         'success': True,
-        'status': job[5],  # status
-        'progress': job[6],  # progress
-        'video_title': job[3],  # video_title
-        'created_at': job[9],  # created_at
-        'completed_at': job[10]  # completed_at
+        'status': job['status'],
+        'progress': job['progress'],
+        'video_title': job['video_title'],
+        'created_at': job['created_at'],
+        'completed_at': job['completed_at'],
+        'progress_seconds': job['progress_seconds'],
+        'duration_seconds': job['duration_seconds'],
+        'skipped_seconds': job['skipped_seconds'],
+        'model_size': job['model_size'],
+        'requested_model_size': job['requested_model_size'],
+        'admission_decision': job['admission_decision'],
+        'admission_note': job['admission_note'],
+        'upgrade_of_job_id': job['upgrade_of_job_id'],
+        'draft_model_size': job['draft_model_size'],
+        'reprocessed_seconds': job['reprocessed_seconds'],
+        'queue_position': job_executor.position(job['leader_job_id'] or job_id) if job['status'] == 'pending' else None
     })
 
+@app.route('/jobs/<job_id>/partial.srt')
+def partial_subtitles(job_id):
+    # Subtitles produced so far while a job is transcribing (the full file once it completed)
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    job = get_job(job_id)
+    if not job or job['user_id'] != session['user_id']:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    if job['status'] == 'completed':
+        srt_content = get_job_subtitles(job_id) or ''
+    else:
+        # Coalesced jobs share their leader's segments
+        srt_content = subtitles_to_srt(get_job_segments(job['leader_job_id'] or job_id))
+    
+    return Response(srt_content, mimetype='text/plain',
+                    headers={'X-Job-Status': job['status'],
+                             'X-Transcribed-Seconds': str(job['progress_seconds'] or 0),
+                             'X-Duration-Seconds': str(job['duration_seconds'] or 0)})
+
+def with_queue_position(event):
+    if event['status'] == 'pending':
+        event['queue_position'] = job_executor.position(event['leader_job_id'] or event['id'])
+    return event
+
+@app.route('/events')
+def job_events():
+    # One Server-Sent Events stream carries status and progress changes for
+    # all of the user's jobs
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    user_id = session['user_id']
+    # Reconnects resume from the last event received, new streams from when the page was rendered
+    last_event_id = request.headers.get('Last-Event-ID', type=float) or request.args.get('since', type=float)
+    
+    # Every stream holds a server thread; past the limit the browser falls back to short polls
+    if not broker.open_stream():
+        return (jsonify({'success': False, 'error': 'Too many open event streams'}), 503,
+                {'Retry-After': str(EVENTS_RETRY_SECONDS)})
+    
+    def stream():
+        events = broker.subscribe(user_id)
+        try:
+            yield 'retry: 3000\n\n'
+            # Replay what changed while a reconnecting browser was away
+            if last_event_id is not None:
+                for event in changes_since(user_id, last_event_id):
+                    yield format_sse(with_queue_position(event))
+            deadline = time.time() + EVENTS_STREAM_SECONDS
+            while time.time() < deadline:
+                try:
+                    event = events.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(with_queue_position(event))
+        finally:
+            broker.unsubscribe(user_id, events)
+    
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs however the stream ends, even if it never started
+    response.call_on_close(broker.close_stream)
+    return response
+
+@app.route('/events/poll')
+def job_events_poll():
+    # Long-polling fallback for browsers or proxies without Server-Sent Events
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    since = request.args.get('since', type=float)
+    if since is None:
+        # First call: start from now, the dashboard was just rendered
+        return jsonify({'success': True, 'events': [], 'since': time.time()})
+    
+    retry_after = None
+    if broker.open_stream():
+        try:
+            events = broker.wait(session['user_id'], since, EVENTS_LONG_POLL_SECONDS)
+        finally:
+            broker.close_stream()
+    else:
+        # Too many held connections: answer at once and have the browser ask again later
+        events = changes_since(session['user_id'], since)
+        retry_after = EVENTS_RETRY_SECONDS
+    return jsonify({
+        'success': True,
+        'events': [with_queue_position(event) for event in events],
+        'since': max([since] + [event['updated_at'] for event in events]),
+        'retry_after': retry_after
+    })
+
+@app.route('/cancel-job/<job_id>', methods=['POST'])
+def cancel_job_route(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    job = get_job(job_id)
+    if not job or job['user_id'] != session['user_id']:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    if not cancel_job(job_id):
+        return jsonify({'success': False, 'error': 'Job has already finished'}), 409
+    
+    return jsonify({'success': True, 'status': 'cancelled'})
+
+@app.route('/jobs/<job_id>/upgrade', methods=['POST'])
+def upgrade_job(job_id):
+    # Re-transcribe only the low-confidence parts of finished subtitles with a larger model
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+    
+    job = get_job(job_id)
+    if not job or job['user_id'] != session['user_id']:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] != 'completed':
+        return jsonify({'success': False, 'error': 'Job has not completed'}), 409
+    
+    model_size = (request.get_json(silent=True) or {}).get('model_size', 'medium')
+    if MODEL_COST_FACTORS.get(model_size, 0) <= MODEL_COST_FACTORS.get(job['model_size'], 0):
+        return jsonify({'success': False, 'error': f"Choose a larger model than {job['model_size']}"}), 400
+    
+    segments = get_job_scored_segments(job_id)
+    if not segments:
+        return jsonify({'success': False, 'error': 'No confidence scores were recorded for this job',
+                        'reason': 'no_segments'}), 409
+    # YouTube audio can be downloaded again, an upload's only copy is its decoded audio
+    if not job['url'] and not has_decoded_audio(job_id):
+        return jsonify({'success': False, 'error': 'The uploaded audio is no longer available, please upload the file again',
+                        'reason': 'audio_purged'}), 409
+    ranges = weak_ranges(segments)
+    weak_seconds = sum(end - start for start, end in ranges)
+    if not ranges:
+        return jsonify({'success': True, 'job_id': None, 'weak_seconds': 0,
+                        'message': 'No unclear parts found, nothing to re-transcribe'})
+    
+    if job_executor.is_full():
+        return jsonify({'success': False, 'error': 'Server is busy, please try again later'}), 429
+    
+    refine_job_id = create_refine_job(job, model_size)
+    if INLINE_WORKERS:
+        job_executor.notify()
+    
+    duration = job['duration_seconds'] or segments[-1]['end']
+    return jsonify({'success': True, 'job_id': refine_job_id, 'weak_ranges': len(ranges),
+                    'weak_seconds': weak_seconds, 'duration_seconds': duration,
+                    'queue_position': job_executor.position(refine_job_id)})
+
 @app.route('/download/<job_id>')
 def download_subtitle(job_id):
     if 'user_id' not in session:
@@ -442,30 +1003,32 @@ def download_subtitle(job_id):
         return redirect(url_for('login'))
     
     job = get_job(job_id)
-    if not job or job[1] != session['user_id']:  # job[1] is user_id
+    if not job or job['user_id'] != session['user_id']:
         flash('Subtitle file not found.', 'error')
         return redirect(url_for('dashboard'))
     
-    print(f"DEBUG: Job details - Status: {job[5]}, Content length: {len(job[7]) if job[7] else 0}")
-    print(f"DEBUG: Job fields - ID: {job[0]}, User: {job[1]}, Title: {job[3]}")
+    # Two-pass jobs serve their draft until the refined subtitles replace it (and on ?version=draft)
+    draft = get_job_draft(job_id) if job['draft_model_size'] else None
+    use_draft = draft is not None and (job['status'] != 'completed' or request.args.get('version') == 'draft')
     
-    if job[5] != 'completed':  # job[5] is status
+    if job['status'] != 'completed' and not use_draft:
         flash('Subtitle is not ready for download yet. Please wait for processing to complete.', 'error')
         return redirect(url_for('dashboard'))
     
-    if not job[7]:  # job[7] is subtitle_content
+    # Only the download path loads the subtitle body
+    subtitle_content = draft['content'] if use_draft else get_job_subtitles(job_id)
+    if not subtitle_content:
         flash('Subtitle content is empty. Please try regenerating the subtitles.', 'error')
         return redirect(url_for('dashboard'))
     
     # Create file-like object
-    subtitle_bytes = io.BytesIO(job[7].encode('utf-8'))
+    subtitle_bytes = io.BytesIO(subtitle_content.encode('utf-8'))
     subtitle_bytes.seek(0)
     
-    filename = f"{job[3] or 'youtube_video'}_subtitles.srt"  # job[3] is video_title
+    suffix = '_draft' if use_draft else ''
+    filename = f"{job['video_title'] or 'youtube_video'}_subtitles{suffix}.srt"
     filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
     
-    print(f"DEBUG: Serving file: {filename}, Size: {len(job[7])} chars")
-    
     return send_file(subtitle_bytes, 
                      as_attachment=True, 
                      download_name=filename,
@@ -480,19 +1043,20 @@ def debug_job(job_id):
     job = get_job(job_id)
     if not job:
         return f"Job {job_id} not found"
+    content = get_job_subtitles(job_id)
     
     return f"""
     <h2>Job Debug Info</h2>
-    <p><strong>Job ID:</strong> {job[0]}</p>
-    <p><strong>User ID:</strong> {job[1]} (Session: {session['user_id']})</p>
-    <p><strong>URL:</strong> {job[2]}</p>
-    <p><strong>Video Title:</strong> {job[3]}</p>
-    <p><strong>Model Size:</strong> {job[4]}</p>
-    <p><strong>Status:</strong> {job[5]}</p>
-    <p><strong>Progress:</strong> {job[6]}</p>
-    <p><strong>Content Length:</strong> {len(job[7]) if job[7] else 0} chars</p>
+    <p><strong>Job ID:</strong> {job['id']}</p>
+    <p><strong>User ID:</strong> {job['user_id']} (Session: {session['user_id']})</p>
+    <p><strong>URL:</strong> {job['url']}</p>
+    <p><strong>Video Title:</strong> {job['video_title']}</p>
+    <p><strong>Model Size:</strong> {job['model_size']}</p>
+    <p><strong>Status:</strong> {job['status']}</p>
+    <p><strong>Progress:</strong> {job['progress']}</p>
+    <p><strong>Content Length:</strong> {len(content) if content else 0} chars</p>
     <p><strong>Content Preview:</strong></p>
-    <pre>{job[7][:500] if job[7] else 'No content'}...</pre>
+    <pre>{content[:500] if content else 'No content'}...</pre>
     """
 
 
@@ -500,6 +1064,8 @@ init_db()
 
 if __name__ == '__main__':
     init_db()
+    if INLINE_WORKERS:
+        job_executor.start()
     print("🚀 Starting SubtitleAI Pro Web Application...")
     print("📡 Server will run on http://localhost:3000")
     print("🎬 Ready to process subtitle requests!")
@@ -0,0 +1,119 @@
+"""
+One-time audio extraction for transcription jobs.
+
+The audio track of an upload or YouTube download is decoded once with PyAV
+into 16 kHz mono float32 samples (the format Whisper works on), written as
+raw PCM next to the uploads and memory-mapped for the model. The source
+file is deleted straight away. The decoded file is recorded on the job, so
+a retried job, or another pass over the same job, skips the download and
+decode. Decoded audio of finished jobs is kept for
+DECODED_AUDIO_RETENTION_HOURS and then purged.
+"""
+import os
+
+import av
+import numpy as np
+
+from db import set_job_audio, get_job_audio, expired_job_audio, clear_job_audio
+
+# Whisper models take 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Decoded audio files (<job id>.f32, raw float32 samples)
+AUDIO_FOLDER = os.environ.get('DECODED_AUDIO_FOLDER', os.path.join('uploads', 'audio'))
+
+# How long decoded audio of a finished job is kept for re-runs
+AUDIO_RETENTION_SECONDS = float(os.environ.get('DECODED_AUDIO_RETENTION_HOURS', 24)) * 3600
+
+def extract_audio(source_path, dest_path):
+    """Decode the first audio track of `source_path` to raw 16 kHz mono float32; returns its duration."""
+    resampler = av.AudioResampler(format='flt', layout='mono', rate=SAMPLE_RATE)
+    partial_path = dest_path + '.part'
+    samples = 0
+    with av.open(source_path) as container, open(partial_path, 'wb') as out:
+        if not container.streams.audio:
+            raise ValueError('The file has no audio track')
+        stream = container.streams.audio[0]
+        # Only audio packets are decoded, video frames are skipped entirely
+        for packet in container.demux(stream):
+            try:
+                frames = packet.decode()
+            except av.error.InvalidDataError:
+                continue  # Skip corrupt packets like faster-whisper's decoder does
+            for frame in frames:
+                frame.pts = None
+                for resampled in resampler.resample(frame):
+                    data = resampled.to_ndarray()
+                    out.write(data.tobytes())
+                    samples += data.shape[-1]
+        # Flush samples buffered in the resampler
+        for resampled in resampler.resample(None):
+            data = resampled.to_ndarray()
+            out.write(data.tobytes())
+            samples += data.shape[-1]
+    os.replace(partial_path, dest_path)
+    return samples / SAMPLE_RATE
+
+def media_duration(path):
+    """Duration in seconds of decoded audio or a media file (None if the container does not say)."""
+    if path.endswith('.f32'):
+        return os.path.getsize(path) / 4 / SAMPLE_RATE
+    try:
+        with av.open(path) as container:
+            return container.duration / av.time_base if container.duration else None
+    except Exception as e:
+        print(f"Warning: Could not read duration of {path}: {e}")
+        return None
+
+def load_audio(path):
+    """Memory-map a decoded audio file as a float32 array (pages are read as the model needs them)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode='r')
+
+def decoded_audio(job_id):
+    """The job's previously decoded audio, or None if it has not been decoded (or was purged)."""
+    audio_path = get_job_audio(job_id)
+    if audio_path and os.path.exists(audio_path):
+        print(f"♻️ Reusing decoded audio for job {job_id}")
+        return load_audio(audio_path)
+    return None
+
+def has_decoded_audio(job_id):
+    """Whether the job's decoded audio is still on disk, without loading it."""
+    audio_path = get_job_audio(job_id)
+    return bool(audio_path) and os.path.exists(audio_path)
+
+def prepare_audio(job_id, source_path):
+    """Return the job's decoded audio, decoding `source_path` (then deleting it) on first use."""
+    audio = decoded_audio(job_id)
+    if audio is not None:
+        return audio
+
+    os.makedirs(AUDIO_FOLDER, exist_ok=True)
+    audio_path = os.path.join(AUDIO_FOLDER, f"{job_id}.f32")
+    duration = extract_audio(source_path, audio_path)
+    set_job_audio(job_id, audio_path)
+    size_mb = os.path.getsize(source_path) / (1024 * 1024)
+    print(f"🎵 Decoded {duration / 60:.1f} min of audio, removing {size_mb:.1f} MB source file")
+    remove_file(source_path)
+    return load_audio(audio_path)
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not remove {path}: {e}")
+
+def purge_expired_audio(retention_seconds=AUDIO_RETENTION_SECONDS):
+    """Delete decoded audio of jobs that finished more than `retention_seconds` ago."""
+    purged = 0
+    for job_id, audio_path in expired_job_audio(retention_seconds):
+        remove_file(audio_path)
+        clear_job_audio(job_id)
+        purged += 1
+    if purged:
+        print(f"🧹 Purged decoded audio of {purged} finished job(s)")
+    return purged
@@ -0,0 +1,103 @@
+"""
+Split the machine's cores between concurrent transcriptions.
+
+Each CTranslate2 model uses cpu_threads threads, by default one per core,
+so N jobs running at once would start N x cores threads and spend much of
+their time context switching. Instead every transcription reserves its
+share of TRANSCRIBE_CPU_CORES from the cores still free, and returns them
+when it finishes.
+
+The share is decided when a transcription starts: the cores divided by the
+jobs expected to run alongside it (the ones running, this one, and the ones
+waiting in the queue, up to the executor's worker count). A job on an idle
+host gets every core, a full queue gives each job cores // workers. A
+model's thread count cannot change while it decodes, so running jobs are
+not resized; cores a job returns go to the jobs that start after it. Shares
+are always cores // k for some k, so models are loaded with at most as
+many thread counts as there are workers.
+
+The executor that runs the jobs sets the slots and the queue length with
+configure() (app.py for inline workers, worker.py for each worker process).
+Run Tests/bench_cpu_threads.py to see which jobs x threads split gives the
+best throughput on a host.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+# Cores transcriptions on this host may use; worker.py splits them between its processes
+TRANSCRIBE_CPU_CORES = int(os.environ.get('TRANSCRIBE_CPU_CORES', os.cpu_count() or 1))
+
+class CoreAllocator:
+    """Hands each starting transcription its share of the free cores."""
+
+    def __init__(self, cores=TRANSCRIBE_CPU_CORES, slots=1, waiting=None):
+        self.cores = max(1, cores)
+        self.slots = max(1, slots)
+        self.waiting = waiting or (lambda: 0)
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._active = 0
+
+    def configure(self, cores=None, slots=None, waiting=None):
+        """Set the cores to share, the most transcriptions that run at once, and a callable
+        returning how many jobs are waiting to start."""
+        if cores is not None:
+            self.cores = max(1, cores)
+        if slots is not None:
+            self.slots = max(1, slots)
+        if waiting is not None:
+            self.waiting = waiting
+
+    @property
+    def slot_threads(self):
+        """Threads per transcription when every worker is busy."""
+        return max(1, self.cores // self.slots)
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._active
+
+    @property
+    def reserved(self):
+        with self._lock:
+            return self._reserved
+
+    def _share(self, waiting):
+        # Caller holds self._lock
+        expected = min(self.slots, self._active + 1 + waiting)
+        free = self.cores - self._reserved
+        # The largest cores // k that fits in the free cores, never more than the fair share
+        for k in range(expected, self.slots + 1):
+            if self.cores // k <= free:
+                return max(1, self.cores // k)
+        return 1
+
+    @contextmanager
+    def reserve(self):
+        """Reserve threads for the duration of the block; yields the thread count."""
+        try:
+            waiting = self.waiting()
+        except Exception as e:
+            print(f"Warning: Could not count waiting jobs: {e}")
+            waiting = self.slots
+        with self._lock:
+            threads = self._share(waiting)
+            self._reserved += threads
+            self._active += 1
+            overcommitted = self._reserved > self.cores
+        if overcommitted:
+            print(f"🧮 All {self.cores} cores are reserved, this transcription gets {threads} thread(s)")
+        try:
+            yield threads
+        finally:
+            with self._lock:
+                self._reserved -= threads
+                self._active -= 1
+
+    def workers_for(self, cpu_threads):
+        """Jobs that can share a model loaded with cpu_threads before the cores are oversubscribed."""
+        return max(1, self.cores // max(1, cpu_threads))
+
+core_allocator = CoreAllocator()
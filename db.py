@@ -0,0 +1,489 @@
+import sqlite3
+import hashlib
+import threading
+import time
+import uuid
+import os
+import json
+import base64
+
+from migrations import migrate
+
+# SQLite database file shared by the web app and the job workers
+DB_PATH = os.environ.get('SUBTITLEAI_DB', 'subtitleai.db')
+
+# Job metadata returned by listing and status queries. Subtitle bodies are
+# stored in job_subtitles and only loaded by get_job_subtitles().
+JOB_COLUMNS = '''id, user_id, url, video_title, model_size, status, progress, error_message,
+                 job_type, file_path, file_size, created_at, completed_at, video_id, leader_job_id,
+                 updated_at, progress_seconds, duration_seconds, options, skipped_seconds,
+                 requested_model_size, admission_decision, admission_note, upgrade_of_job_id,
+                 draft_model_size, reprocessed_seconds'''
+
+# Fields of a job that change while it runs, sent to dashboards as change events
+JOB_EVENT_COLUMNS = '''id, user_id, status, progress, video_title, leader_job_id, updated_at,
+                       progress_seconds, duration_seconds, draft_model_size'''
+
+JOB_STATUSES = ('pending', 'processing', 'completed', 'failed', 'cancelled')
+
+# Jobs per dashboard page / default /api/jobs page size
+JOBS_PAGE_SIZE = 20
+
+# How long a writer waits for another connection's write lock before failing
+BUSY_TIMEOUT_MS = 10000
+
+# Called with the changed job rows (JOB_EVENT_COLUMNS) after update_job_status
+# commits, e.g. to push them to dashboards connected to this process
+job_change_listeners = []
+
+# Per-thread connection pool. Each thread keeps one open connection per
+# database file, so sqlite3's statement cache reuses prepared statements
+# across calls instead of reconnecting and re-parsing SQL every time.
+_local = threading.local()
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=256)
+    # WAL lets readers proceed while a writer is active; NORMAL sync is safe in WAL mode
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    # Rows can be read by column name (job['status']) as well as by index
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_connection(path=None):
+    """Return this thread's pooled connection to the database."""
+    path = path or DB_PATH
+    pool = getattr(_local, 'pool', None)
+    if pool is None or _local.pid != os.getpid():
+        # Connections must not be shared with a forked child process
+        pool = _local.pool = {}
+        _local.pid = os.getpid()
+    conn = pool.get(path)
+    if conn is None:
+        conn = pool[path] = _open_connection(path)
+    return conn
+
+def close_connection(path=None):
+    """Close this thread's pooled connection (e.g. before the thread exits)."""
+    pool = getattr(_local, 'pool', None)
+    if pool and _local.pid == os.getpid():
+        conn = pool.pop(path or DB_PATH, None)
+        if conn is not None:
+            conn.close()
+
+# Database setup
+def init_db():
+    # Creates the tables on a new database and upgrades existing ones
+    migrate(get_connection())
+
+# Helper functions
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def get_user_by_username(username):
+    conn = get_connection()
+    return conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
+def create_user(username, email, password):
+    conn = get_connection()
+    try:
+        password_hash = hash_password(password)
+        with conn:
+            c = conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                             (username, email, password_hash))
+        return c.lastrowid
+    except sqlite3.IntegrityError:
+        return None
+
+def encode_cursor(job):
+    """Opaque page cursor pointing just after `job` in (created_at, id) order."""
+    raw = json.dumps([job['created_at'], job['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, job_id = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(created_at, str) or not isinstance(job_id, str):
+        raise ValueError('Invalid cursor')
+    return created_at, job_id
+
+def get_user_jobs(user_id, limit=JOBS_PAGE_SIZE, cursor=None, statuses=None):
+    """Return one page of a user's jobs (newest first) and the cursor of the next page.
+
+    Pages are keyset-paginated on (created_at, id), so every page costs the
+    same index range scan however long the user's history is. The returned
+    cursor is None on the last page.
+    """
+    conditions = ['user_id = ?']
+    params = [user_id]
+    if cursor:
+        conditions.append('(created_at, id) < (?, ?)')
+        params.extend(decode_cursor(cursor))
+    if statuses:
+        conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+
+    conn = get_connection()
+    jobs = conn.execute(f'''SELECT {JOB_COLUMNS} FROM jobs
+                            WHERE {' AND '.join(conditions)}
+                            ORDER BY created_at DESC, id DESC LIMIT ?''', (*params, limit + 1)).fetchall()
+    next_cursor = encode_cursor(jobs[limit - 1]) if len(jobs) > limit else None
+    return jobs[:limit], next_cursor
+
+def encode_options(options):
+    # Stored sorted so identical settings compare equal when coalescing jobs
+    return json.dumps(options, sort_keys=True) if options else None
+
+def decode_options(options):
+    return json.loads(options) if options else {}
+
+def create_job(user_id, url=None, model_size='base', job_type='youtube', file_path=None, file_size=None, video_title=None,
+               options=None, audio_path=None, content_sha256=None, duration_seconds=None):
+    job_id = str(uuid.uuid4())
+    options = encode_options(options)
+
+    conn = get_connection()
+    with conn:  # Commits, or rolls back on error
+        if job_type == 'upload':
+            # audio_path is set when the audio was already decoded while the file was uploaded
+            conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type, file_path, file_size,
+                                              video_title, options, audio_path, content_sha256, duration_seconds)
+                            VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (job_id, user_id, url, model_size, job_type, file_path, file_size, video_title, options,
+                          audio_path, content_sha256, duration_seconds))
+        else:
+            conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type, options)
+                            VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', ?, ?)''',
+                         (job_id, user_id, url, model_size, job_type, options))
+
+    return job_id
+
+def create_coalesced_job(user_id, url, model_size, video_id, options=None, video_title=None, duration_seconds=None,
+                         admission=None):
+    """Create a YouTube job, attaching it to an identical in-flight job if there is one.
+
+    Returns (job_id, leader_job_id). A follower (leader_job_id set) is never
+    claimed by a worker; it receives the leader's progress and result through
+    update_job_status. The title and duration are known up front when the
+    video's metadata was looked up at submit time. `admission` holds the
+    admission control decision: requested_model_size, decision, note, upgrade_of.
+    """
+    job_id = str(uuid.uuid4())
+    options = encode_options(options)
+    admission = admission or {}
+    admission_values = (admission.get('requested_model_size'), admission.get('decision'),
+                        admission.get('note'), admission.get('upgrade_of'))
+
+    conn = get_connection()
+    # The write lock makes the leader lookup and the insert atomic across processes
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        leader = None
+        # Deferred upgrade jobs wait for an idle queue, so nothing else should wait on them
+        if video_id and admission.get('decision') != 'upgrade':
+            leader = conn.execute('''SELECT id, status, progress, draft_model_size FROM jobs
+                                     WHERE video_id = ? AND model_size = ? AND status IN ('pending', 'processing')
+                                       AND leader_job_id IS NULL AND job_type = 'youtube' AND options IS ?
+                                       AND admission_decision IS NOT 'upgrade'
+                                     ORDER BY created_at, rowid LIMIT 1''', (video_id, model_size, options)).fetchone()
+        if leader is None:
+            conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type, video_id, options,
+                                              video_title, duration_seconds, requested_model_size, admission_decision,
+                                              admission_note, upgrade_of_job_id)
+                            VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', 'youtube', ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (job_id, user_id, url, model_size, video_id, options, video_title, duration_seconds)
+                         + admission_values)
+        else:
+            conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type,
+                                              video_id, leader_job_id, options, video_title, duration_seconds,
+                                              requested_model_size, admission_decision, admission_note,
+                                              upgrade_of_job_id, draft_model_size)
+                            VALUES (?, ?, ?, ?, ?, ?, 'youtube', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (job_id, user_id, url, model_size, leader['status'], leader['progress'],
+                          video_id, leader['id'], options, video_title, duration_seconds) + admission_values
+                         + (leader['draft_model_size'],))
+            # A draft the leader already published is not sent again
+            conn.execute('''INSERT INTO job_drafts (job_id, content, model_size)
+                            SELECT ?, content, model_size FROM job_drafts WHERE job_id = ?''', (job_id, leader['id']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return job_id, (leader['id'] if leader else None)
+
+def update_job_status(job_id, status, progress=None, video_title=None, subtitle_content=None, error_message=None,
+                      progress_seconds=None, duration_seconds=None, segments=None):
+    # Updates also apply to the job's followers (coalesced identical jobs).
+    # Cancelled jobs keep their status. `segments` are the completed subtitles
+    # with their confidence scores, stored next to the SRT body.
+    conn = get_connection()
+    now = time.time()
+    with conn:  # Commits, or rolls back on error
+        if status in ('completed', 'failed'):
+            conn.execute('DELETE FROM job_segments WHERE job_id = ?', (job_id,))
+        if status == 'completed':
+            conn.execute('''INSERT OR REPLACE INTO job_subtitles (job_id, content, segments)
+                            SELECT id, ?, ? FROM jobs
+                            WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled' ''',
+                         (subtitle_content, json.dumps(segments) if segments else None, job_id, job_id))
+            changed = conn.execute(f'''UPDATE jobs SET status = ?, progress = ?, video_title = ?,
+                                                       completed_at = CURRENT_TIMESTAMP, updated_at = ?
+                                       WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled'
+                                       RETURNING {JOB_EVENT_COLUMNS}''',
+                                   (status, progress, video_title, now, job_id, job_id)).fetchall()
+        elif status == 'failed':
+            changed = conn.execute(f'''UPDATE jobs SET status = ?, progress = ?, error_message = ?,
+                                                       completed_at = CURRENT_TIMESTAMP, updated_at = ?
+                                       WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled'
+                                       RETURNING {JOB_EVENT_COLUMNS}''',
+                                   (status, progress, error_message, now, job_id, job_id)).fetchall()
+        else:
+            # Rewriting the same status and progress is not a change
+            changed = conn.execute(f'''UPDATE jobs SET status = ?, progress = ?,
+                                                       video_title = COALESCE(?, video_title),
+                                                       progress_seconds = COALESCE(?, progress_seconds),
+                                                       duration_seconds = COALESCE(?, duration_seconds),
+                                                       updated_at = ?
+                                       WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled'
+                                         AND (status != ? OR progress IS NOT ?
+                                              OR video_title IS NOT COALESCE(?, video_title)
+                                              OR progress_seconds IS NOT COALESCE(?, progress_seconds))
+                                       RETURNING {JOB_EVENT_COLUMNS}''',
+                                   (status, progress, video_title, progress_seconds, duration_seconds, now,
+                                    job_id, job_id, status, progress, video_title, progress_seconds)).fetchall()
+
+    for listener in job_change_listeners:
+        try:
+            listener(changed)
+        except Exception as e:
+            print(f"Warning: Job change listener failed: {e}")
+
+def record_audio_stats(job_id, duration_seconds, skipped_seconds):
+    """Store how long a job's audio is and how much of it VAD skipped (also on followers)."""
+    conn = get_connection()
+    with conn:
+        conn.execute('''UPDATE jobs SET duration_seconds = ?, skipped_seconds = ?
+                        WHERE id = ? OR leader_job_id = ?''',
+                     (duration_seconds, skipped_seconds, job_id, job_id))
+
+def set_job_audio(job_id, audio_path):
+    conn = get_connection()
+    with conn:
+        conn.execute('UPDATE jobs SET audio_path = ? WHERE id = ?', (audio_path, job_id))
+
+def get_job_audio(job_id):
+    row = get_connection().execute('SELECT audio_path FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return row['audio_path'] if row else None
+
+def clear_job_audio(job_id):
+    conn = get_connection()
+    with conn:
+        conn.execute('UPDATE jobs SET audio_path = NULL WHERE id = ?', (job_id,))
+
+def expired_job_audio(retention_seconds):
+    """(job_id, audio_path) of finished jobs whose decoded audio is older than the retention period."""
+    conn = get_connection()
+    return conn.execute('''SELECT id, audio_path FROM jobs
+                           WHERE audio_path IS NOT NULL AND completed_at < datetime('now', ?)
+                             AND status IN ('completed', 'failed', 'cancelled') AND lease_owner IS NULL''',
+                        (f'-{int(retention_seconds)} seconds',)).fetchall()
+
+def save_job_segments(job_id, first_index, subtitles):
+    """Store a batch of subtitles of a running job, numbered from first_index."""
+    conn = get_connection()
+    with conn:
+        conn.executemany('''INSERT OR REPLACE INTO job_segments (job_id, segment_index, start, end, text)
+                            VALUES (?, ?, ?, ?, ?)''',
+                         [(job_id, first_index + i, sub['start'], sub['end'], sub['text'])
+                          for i, sub in enumerate(subtitles)])
+
+def clear_job_segments(job_id):
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM job_segments WHERE job_id = ?', (job_id,))
+
+def get_job_segments(job_id):
+    """Subtitles saved so far for a running job, in order."""
+    conn = get_connection()
+    return conn.execute('''SELECT start, end, text FROM job_segments
+                           WHERE job_id = ? ORDER BY segment_index''', (job_id,)).fetchall()
+
+def promote_follower(conn, leader_id):
+    # Caller holds a write transaction. The oldest active follower becomes a
+    # pending leader that workers can claim, and the others follow it instead.
+    follower = conn.execute('''SELECT id FROM jobs WHERE leader_job_id = ? AND status != 'cancelled'
+                               ORDER BY created_at, rowid LIMIT 1''', (leader_id,)).fetchone()
+    if follower is None:
+        return None
+    conn.execute('''UPDATE jobs SET leader_job_id = NULL, status = 'pending', progress = 'Queued for processing',
+                                    updated_at = ?
+                    WHERE id = ?''', (time.time(), follower['id']))
+    conn.execute('''UPDATE jobs SET leader_job_id = ? WHERE leader_job_id = ? AND status != 'cancelled' ''',
+                 (follower['id'], leader_id))
+    return follower['id']
+
+def cancel_job(job_id):
+    """Cancel a pending or processing job. Returns False if it already finished.
+
+    Cancelling a follower only detaches it. Cancelling a leader never strands
+    its followers: a pending leader hands its place in the queue to a
+    follower, and a running leader keeps working for them.
+    """
+    conn = get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        job = conn.execute('SELECT status, leader_job_id FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if job is None or job['status'] not in ('pending', 'processing'):
+            conn.rollback()
+            return False
+        conn.execute('''UPDATE jobs SET status = 'cancelled', progress = 'Cancelled by user',
+                                        completed_at = CURRENT_TIMESTAMP, updated_at = ?
+                        WHERE id = ?''', (time.time(), job_id))
+        if job['leader_job_id'] is None and job['status'] == 'pending':
+            promote_follower(conn, job_id)
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def has_active_followers(job_id):
+    conn = get_connection()
+    return conn.execute('''SELECT 1 FROM jobs WHERE leader_job_id = ? AND status != 'cancelled' LIMIT 1''',
+                        (job_id,)).fetchone() is not None
+
+def is_job_abandoned(job_id):
+    """True when a running job was cancelled and nobody is waiting for its result."""
+    conn = get_connection()
+    job = conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return job is not None and job['status'] == 'cancelled' and not has_active_followers(job_id)
+
+def create_upload_session(user_id, filename, file_size, chunk_size, sha256):
+    upload_id = str(uuid.uuid4())
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT INTO upload_sessions (id, user_id, filename, file_size, chunk_size, sha256, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     (upload_id, user_id, filename, file_size, chunk_size, sha256, time.time()))
+    return upload_id
+
+def get_upload_session(upload_id):
+    return get_connection().execute('SELECT * FROM upload_sessions WHERE id = ?', (upload_id,)).fetchone()
+
+def find_upload_session(user_id, sha256, file_size):
+    """An unfinished upload of the same file by the same user, to be resumed."""
+    if not sha256:
+        return None
+    return get_connection().execute('''SELECT * FROM upload_sessions WHERE user_id = ? AND sha256 = ? AND file_size = ?
+                                       ORDER BY created_at DESC LIMIT 1''', (user_id, sha256, file_size)).fetchone()
+
+def mark_chunk_received(upload_id, chunk_index):
+    conn = get_connection()
+    with conn:
+        conn.execute('INSERT OR IGNORE INTO upload_chunks (upload_id, chunk_index) VALUES (?, ?)',
+                     (upload_id, chunk_index))
+
+def get_received_chunks(upload_id):
+    rows = get_connection().execute('SELECT chunk_index FROM upload_chunks WHERE upload_id = ? ORDER BY chunk_index',
+                                    (upload_id,)).fetchall()
+    return [row['chunk_index'] for row in rows]
+
+def delete_upload_session(upload_id):
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+        conn.execute('DELETE FROM upload_sessions WHERE id = ?', (upload_id,))
+
+def expired_upload_sessions(ttl_seconds):
+    return [row['id'] for row in get_connection().execute('SELECT id FROM upload_sessions WHERE created_at < ?',
+                                                          (time.time() - ttl_seconds,))]
+
+def find_completed_uploads(user_id, sha256, model_size):
+    """The user's finished transcriptions of the same file with model_size, newest first.
+
+    Rows hold the job's options and SRT body; the caller picks the one
+    transcribed with equivalent options.
+    """
+    if not sha256:
+        return []
+    return get_connection().execute('''SELECT jobs.id, jobs.video_title, jobs.options, s.content
+                                       FROM jobs JOIN job_subtitles s ON s.job_id = jobs.id
+                                       WHERE jobs.user_id = ? AND jobs.content_sha256 = ? AND jobs.model_size = ?
+                                         AND jobs.status = 'completed'
+                                       ORDER BY jobs.created_at DESC''',
+                                   (user_id, sha256, model_size)).fetchall()
+
+def find_upload_audio(user_id, sha256):
+    """Decoded audio (not yet purged) of an earlier upload of the same file by the user."""
+    if not sha256:
+        return None
+    row = get_connection().execute('''SELECT audio_path FROM jobs
+                                      WHERE user_id = ? AND content_sha256 = ? AND audio_path IS NOT NULL
+                                      ORDER BY created_at DESC LIMIT 1''', (user_id, sha256)).fetchone()
+    return row['audio_path'] if row else None
+
+def get_job(job_id):
+    conn = get_connection()
+    return conn.execute(f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+def get_job_subtitles(job_id):
+    """Load the SRT body of a completed job (only needed for downloads)."""
+    conn = get_connection()
+    row = conn.execute('SELECT content FROM job_subtitles WHERE job_id = ?', (job_id,)).fetchone()
+    return row['content'] if row else None
+
+def get_job_scored_segments(job_id):
+    """Subtitles of a completed job with their confidence scores, or None if they were not recorded."""
+    row = get_connection().execute('SELECT segments FROM job_subtitles WHERE job_id = ?', (job_id,)).fetchone()
+    return json.loads(row['segments']) if row and row['segments'] else None
+
+def get_refinable_job_ids(job_ids):
+    """The jobs among job_ids that recorded confidence scores and whose audio can be had again:
+    a URL to download it from, or decoded audio that was not purged yet."""
+    if not job_ids:
+        return set()
+    rows = get_connection().execute(f'''SELECT jobs.id FROM jobs JOIN job_subtitles s ON s.job_id = jobs.id
+                                        WHERE jobs.id IN ({', '.join('?' * len(job_ids))})
+                                          AND s.segments IS NOT NULL
+                                          AND (jobs.url IS NOT NULL OR jobs.audio_path IS NOT NULL)''',
+                                    list(job_ids)).fetchall()
+    return {row['id'] for row in rows}
+
+def create_refine_job(source, model_size):
+    """Queue a job that re-transcribes the weak segments of the completed job `source` with model_size."""
+    job_id = str(uuid.uuid4())
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT INTO jobs (id, user_id, url, model_size, status, progress, job_type, video_id,
+                                          video_title, options, duration_seconds, upgrade_of_job_id)
+                        VALUES (?, ?, ?, ?, 'pending', 'Queued for processing', 'refine', ?, ?, ?, ?, ?)''',
+                     (job_id, source['user_id'], source['url'], model_size, source['video_id'],
+                      source['video_title'], source['options'], source['duration_seconds'], source['id']))
+    return job_id
+
+def record_reprocessed_seconds(job_id, seconds):
+    conn = get_connection()
+    with conn:
+        conn.execute('UPDATE jobs SET reprocessed_seconds = ? WHERE id = ?', (seconds, job_id))
+
+def save_job_draft(job_id, content, model_size):
+    """Store the draft subtitles of a two-pass job (also on followers) until and after the refined ones arrive."""
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT OR REPLACE INTO job_drafts (job_id, content, model_size)
+                        SELECT id, ?, ? FROM jobs WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled' ''',
+                     (content, model_size, job_id, job_id))
+        conn.execute('''UPDATE jobs SET draft_model_size = ?
+                        WHERE (id = ? OR leader_job_id = ?) AND status != 'cancelled' ''',
+                     (model_size, job_id, job_id))
+
+def get_job_draft(job_id):
+    """The draft of a two-pass job (content, model_size), or None."""
+    return get_connection().execute('SELECT content, model_size FROM job_drafts WHERE job_id = ?',
+                                    (job_id,)).fetchone()
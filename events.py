@@ -0,0 +1,175 @@
+"""
+Job change events for the dashboard.
+
+Every status or progress write stamps jobs.updated_at. Updates made by this
+process are pushed to its subscribers as soon as update_job_status commits;
+updates made by other processes (gunicorn workers, worker.py) are picked up
+by one poller thread per process that reads the rows changed since its last
+look. Each browser holds one stream (/events, or the /events/poll long-poll
+fallback) for all of its user's jobs instead of polling every job card.
+
+An open stream or long poll holds a server thread, so a process keeps at
+most EVENTS_MAX_STREAMS of them open. Past that, /events is refused with a
+503 and /events/poll answers at once, asking the browser to poll again in
+EVENTS_RETRY_SECONDS; the other requests always find a free thread.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from db import JOB_EVENT_COLUMNS, get_connection, job_change_listeners
+
+# How often changes made by other processes are looked up while anyone is subscribed
+EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS', 1))
+
+# A row committed by another process can carry an updated_at slightly older
+# than rows already seen, so each lookup re-reads this much history
+EVENTS_POLL_OVERLAP_SECONDS = 5
+
+# Comment sent on idle streams so proxies keep the connection open
+EVENTS_KEEPALIVE_SECONDS = 15
+
+# Streams are closed after this long; EventSource reconnects with Last-Event-ID
+EVENTS_STREAM_SECONDS = 300
+
+# How long a /events/poll request waits for a change before returning empty
+EVENTS_LONG_POLL_SECONDS = 25
+
+# Streams and long polls held open per process (keep well below the server's threads)
+EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 32))
+
+# How long browsers turned away by EVENTS_MAX_STREAMS wait before polling again
+EVENTS_RETRY_SECONDS = 5
+
+def job_event(row):
+    return {'id': row['id'], 'status': row['status'], 'progress': row['progress'],
+            'video_title': row['video_title'], 'leader_job_id': row['leader_job_id'],
+            'progress_seconds': row['progress_seconds'], 'duration_seconds': row['duration_seconds'],
+            'draft_model_size': row['draft_model_size'], 'updated_at': row['updated_at']}
+
+def format_sse(event):
+    return f"id: {event['updated_at']!r}\nevent: job\ndata: {json.dumps(event)}\n\n"
+
+def changes_since(user_id, since):
+    """Events for a user's jobs that changed after `since` (a time.time() value)."""
+    conn = get_connection()
+    rows = conn.execute(f'''SELECT {JOB_EVENT_COLUMNS} FROM jobs
+                            WHERE updated_at > ? AND user_id = ?
+                            ORDER BY updated_at''', (since, user_id)).fetchall()
+    return [job_event(row) for row in rows]
+
+class EventBroker:
+    """In-process pub/sub of job change events, keyed by user."""
+
+    def __init__(self, max_streams=EVENTS_MAX_STREAMS):
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._open_streams = 0
+        self._subscribers = {}  # user_id -> set of queues
+        self._delivered = {}    # job_id -> updated_at of the last event delivered
+        self._mark = time.time()
+        self._pid = None
+        self._poller = None
+
+    def open_stream(self):
+        """Count a stream or long poll held open; False when max_streams are open already."""
+        with self._lock:
+            if self._open_streams >= self.max_streams:
+                return False
+            self._open_streams += 1
+            return True
+
+    def close_stream(self):
+        with self._lock:
+            self._open_streams -= 1
+
+    @property
+    def open_streams(self):
+        with self._lock:
+            return self._open_streams
+
+    def subscribe(self, user_id):
+        self._start_poller()
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(events)
+        return events
+
+    def unsubscribe(self, user_id, events):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(events)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, rows):
+        """Deliver changed job rows to their owners' subscribers, once per change."""
+        with self._lock:
+            for row in rows:
+                subscribers = self._subscribers.get(row['user_id'])
+                if not subscribers or self._delivered.get(row['id'], 0) >= row['updated_at']:
+                    continue
+                self._delivered[row['id']] = row['updated_at']
+                event = job_event(row)
+                for events in subscribers:
+                    events.put(event)
+
+    def wait(self, user_id, since, timeout=EVENTS_LONG_POLL_SECONDS):
+        """Long-poll: return the user's changes after `since`, waiting up to `timeout` for one."""
+        events = self.subscribe(user_id)
+        try:
+            changes = changes_since(user_id, since)
+            if changes:
+                return changes
+            try:
+                changes = [events.get(timeout=timeout)]
+            except queue.Empty:
+                return []
+            while not events.empty():
+                changes.append(events.get_nowait())
+            return changes
+        finally:
+            self.unsubscribe(user_id, events)
+
+    def poll_once(self):
+        """Publish rows changed by any process since the last look."""
+        with self._lock:
+            if not self._subscribers:
+                # Nobody is listening, so there is nothing to catch up on later
+                self._mark = time.time()
+                self._delivered.clear()
+                return
+            since = self._mark - EVENTS_POLL_OVERLAP_SECONDS
+        rows = get_connection().execute(f'''SELECT {JOB_EVENT_COLUMNS} FROM jobs
+                                            WHERE updated_at > ? ORDER BY updated_at''', (since,)).fetchall()
+        self.publish(rows)
+        with self._lock:
+            if rows:
+                self._mark = max(self._mark, rows[-1]['updated_at'])
+            # Changes older than the overlap window are never read again
+            cutoff = self._mark - EVENTS_POLL_OVERLAP_SECONDS
+            self._delivered = {job_id: updated_at for job_id, updated_at in self._delivered.items()
+                               if updated_at > cutoff}
+
+    def _start_poller(self):
+        with self._lock:
+            # Threads do not survive a fork, so each process starts its own poller
+            if self._pid == os.getpid() and self._poller.is_alive():
+                return
+            self._pid = os.getpid()
+            self._poller = threading.Thread(target=self._run_poller, name='job-events', daemon=True)
+            self._poller.start()
+
+    def _run_poller(self):
+        while True:
+            time.sleep(EVENTS_POLL_SECONDS)
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Warning: Job event poll failed: {e}")
+
+broker = EventBroker()
+job_change_listeners.append(broker.publish)
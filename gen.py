@@ -1,9 +1,46 @@
 from pytubefix import YouTube
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from ranged_download import download
+from cpu_partition import core_allocator
+import glob
 import os
+import time
 import uuid
+import threading
+from collections import OrderedDict
+import re
 from urllib.parse import urlparse, parse_qs
 
+# Whisper task used for every job: translate forces English output
+TRANSCRIBE_TASK = "translate"
+
+# Decoding engines: "sequential" runs WhisperModel.transcribe over the audio
+# window by window; "batched" splits the audio at pauses (VAD) and decodes
+# batch_size segments at once with BatchedInferencePipeline, which keeps
+# more CPU cores busy per job
+TRANSCRIBE_ENGINES = ("sequential", "batched")
+DEFAULT_ENGINE = os.environ.get("WHISPER_ENGINE", "sequential")
+DEFAULT_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", 8))
+
+# Silero voice activity detection drops silence and music before decoding.
+# A 30 ms frame counts as speech above VAD_THRESHOLD; pauses shorter than
+# VAD_MIN_SILENCE_MS do not split speech. The batched engine always uses VAD.
+VAD_FILTER = os.environ.get("WHISPER_VAD", "1") != "0"
+VAD_THRESHOLD = float(os.environ.get("WHISPER_VAD_THRESHOLD", 0.5))
+VAD_MIN_SILENCE_MS = int(os.environ.get("WHISPER_VAD_MIN_SILENCE_MS", 2000))
+
+# Whisper only hears 16 kHz mono, so the cheapest YouTube audio stream of
+# at least this bitrate is as good as the best one
+MIN_AUDIO_BITRATE = int(os.environ.get("YOUTUBE_MIN_AUDIO_KBPS", 48)) * 1000
+
+# Partial results are passed to on_segments once this many segments are
+# ready, or after this long, whichever comes first
+SEGMENT_BATCH_SIZE = 20
+SEGMENT_BATCH_SECONDS = 5
+
+class JobCancelled(Exception):
+    """Raised from a progress callback to stop transcribing a job that was cancelled."""
+
 def clean_youtube_url(url):
     if "youtu.be" in url:
         url = url.split("?")[0]
@@ -14,22 +51,199 @@ def clean_youtube_url(url):
             url = f"https://www.youtube.com/watch?v={video_id}"
     return url
 
+def extract_video_id(url):
+    """Return the 11-character YouTube video id of a watch/short/embed/youtu.be URL, or None."""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host.endswith("youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif "youtube.com" in host:
+        candidate = parse_qs(parsed.query).get("v", [None])[0]
+        if not candidate:
+            match = re.match(r"^/(?:shorts|embed|live|v)/([^/?#]+)", parsed.path)
+            candidate = match.group(1) if match else None
+    else:
+        return None
+    if candidate and re.fullmatch(r"[0-9A-Za-z_-]{11}", candidate):
+        return candidate
+    return None
 
 
-def download_audio(youtube_url, output_dir="downloads"):
-    yt = clean_youtube_url(youtube_url)
-    yt = YouTube(yt)
-    audio_stream = yt.streams.filter(only_audio=True).first()
+def fetch_video(youtube_url):
+    """YouTube metadata for a URL; reuse the object for the title and the streams (one round-trip)."""
+    return YouTube(clean_youtube_url(youtube_url))
+
+def select_audio_stream(streams, min_bitrate=MIN_AUDIO_BITRATE):
+    """Lowest-bitrate audio stream of at least min_bitrate, or the best one if none is that good."""
+    streams = list(streams)
+    # OTF (fragmented live-style) streams cannot be fetched by byte range, and DRC
+    # variants are compressed for playback volume, so only take them as a last resort
+    plain = [s for s in streams if not s.is_otf and not getattr(s, 'is_drc', False)]
+    candidates = plain or streams
+    if not candidates:
+        return None
+    adequate = [s for s in candidates if (s.bitrate or 0) >= min_bitrate]
+    if adequate:
+        return min(adequate, key=lambda s: s.bitrate)
+    return max(candidates, key=lambda s: s.bitrate or 0)
+
+# Audio downloads: <job id>.<subtype>, with .part and .part.chunks files while downloading
+DOWNLOAD_FOLDER = "downloads"
+
+# Partial downloads not written to for this long belong to jobs that will not resume them
+STALE_DOWNLOAD_SECONDS = 24 * 3600
+
+def download_audio(youtube_url, output_dir=DOWNLOAD_FOLDER, stream=None, name=None):
+    """Download the audio of a video with parallel range requests.
+
+    Pass the `stream` (url, subtype, bitrate) the caller already looked up to
+    avoid another metadata request, and a stable `name` (the job id) so a
+    retried job resumes its partial download.
+    """
+    audio_stream = stream or select_audio_stream(fetch_video(youtube_url).streams.filter(only_audio=True))
+    if audio_stream is None:
+        raise ValueError("No audio stream available for this video")
     
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
 
-    unique_filename = f"{uuid.uuid4()}.mp4"
-    download_path = os.path.join(output_dir, unique_filename)
-    audio_stream.download(output_path=output_dir, filename=unique_filename)
+    download_path = os.path.join(output_dir, f"{name or uuid.uuid4()}.{audio_stream.subtype}")
+    print(f"🎧 Downloading {audio_stream.subtype} audio at {(audio_stream.bitrate or 0) // 1000} kbps")
+    download(audio_stream.url, download_path)
     
     return download_path
 
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Warning: Could not remove {path}: {e}")
+
+def remove_downloads(name, output_dir=DOWNLOAD_FOLDER):
+    """Delete the download of job `name`, finished or partial (.part and its .chunks sidecar)."""
+    for path in glob.glob(os.path.join(glob.escape(output_dir), f"{glob.escape(name)}.*")):
+        _remove(path)
+
+def purge_stale_downloads(max_age_seconds=STALE_DOWNLOAD_SECONDS, output_dir=DOWNLOAD_FOLDER):
+    """Delete partial downloads left behind by jobs that crashed and were never retried."""
+    cutoff = time.time() - max_age_seconds
+    purged = 0
+    for path in glob.glob(os.path.join(glob.escape(output_dir), "*.part*")):
+        try:
+            stale = os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            _remove(path)
+            purged += 1
+    if purged:
+        print(f"🧹 Purged {purged} stale partial download file(s)")
+    return purged
+
+# Approximate resident size (MB) of an int8 CPU model, used for the cache budget
+MODEL_MEMORY_MB = {
+    "tiny": 75,
+    "base": 145,
+    "small": 480,
+    "medium": 1500,
+    "large-v1": 3100,
+    "large-v2": 3100,
+    "large-v3": 3100,
+}
+
+# Total memory (MB) the model cache may hold before evicting least recently used models
+MODEL_CACHE_BUDGET_MB = int(os.environ.get("WHISPER_MODEL_CACHE_MB", 2048))
+
+class ModelCache:
+    """Process-wide registry of loaded WhisperModel instances.
+
+    Models are keyed by (model_size, compute_type, cpu_threads) and evicted
+    least-recently-used once the memory budget is exceeded. Models that are
+    currently in use by a job are never evicted.
+    """
+
+    def __init__(self, budget_mb=MODEL_CACHE_BUDGET_MB, loader=None):
+        self.budget_mb = budget_mb
+        self._loader = loader or self._load_model
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # key -> model
+        self._in_use = {}  # key -> number of jobs holding the model
+        self._loading = {}  # key -> Event set once the load finishes
+
+    @staticmethod
+    def _load_model(model_size, compute_type, cpu_threads):
+        # Jobs given the same share of cores use the same model in parallel, one worker each
+        num_workers = core_allocator.workers_for(cpu_threads) if cpu_threads else 1
+        return WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads,
+                            num_workers=num_workers)
+
+    @staticmethod
+    def _estimate_mb(key):
+        return MODEL_MEMORY_MB.get(key[0], MODEL_MEMORY_MB["medium"])
+
+    def _used_mb(self):
+        return sum(self._estimate_mb(key) for key in self._models)
+
+    def _evict(self, needed_mb):
+        # Caller holds self._lock
+        for key in list(self._models):
+            if self._used_mb() + needed_mb <= self.budget_mb:
+                break
+            if self._in_use.get(key):
+                continue
+            del self._models[key]
+            print(f"🧹 Evicted Whisper model {key} from cache")
+
+    def acquire(self, model_size="base", compute_type="int8", cpu_threads=0):
+        key = (model_size, compute_type, cpu_threads)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    return self._models[key]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another thread is loading the same model, wait for it and retry
+            loading.wait()
+
+        try:
+            print(f"🧠 Loading Whisper model {key}...")
+            model = self._loader(model_size, compute_type, cpu_threads)
+            with self._lock:
+                self._evict(self._estimate_mb(key))
+                self._models[key] = model
+                self._in_use[key] = self._in_use.get(key, 0) + 1
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def release(self, model_size="base", compute_type="int8", cpu_threads=0):
+        key = (model_size, compute_type, cpu_threads)
+        with self._lock:
+            if self._in_use.get(key):
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+            self._evict(0)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._models):
+                if not self._in_use.get(key):
+                    del self._models[key]
+
+    def cached_keys(self):
+        with self._lock:
+            return list(self._models)
+
+model_cache = ModelCache()
+
 # def transcribe_audio(audio_path, model_size="base"):
 #     try:
 #         # Explicitly use CPU and int8 compute type for better compatibility
@@ -50,26 +264,81 @@ def download_audio(youtube_url, output_dir="downloads"):
 #         print(f"Error during transcription: {e}")
 #         return []
     
-def transcribe_audio(audio_path, model_size="base"):
+def run_whisper(model, audio, engine=DEFAULT_ENGINE, batch_size=DEFAULT_BATCH_SIZE, vad=VAD_FILTER,
+                vad_threshold=VAD_THRESHOLD, min_silence_ms=VAD_MIN_SILENCE_MS):
+    """Start decoding `audio` with the chosen engine; returns faster-whisper's lazy (segments, info)."""
+    vad_parameters = {"threshold": vad_threshold, "min_silence_duration_ms": min_silence_ms}
+    # Use translate mode to force English output
+    if engine == "batched":
+        return BatchedInferencePipeline(model=model).transcribe(audio, beam_size=5, task=TRANSCRIBE_TASK,
+                                                                batch_size=batch_size, vad_filter=True,
+                                                                vad_parameters=vad_parameters)
+    return model.transcribe(audio, beam_size=5, task=TRANSCRIBE_TASK, vad_filter=vad,
+                            vad_parameters=vad_parameters if vad else None)
+
+def segment_to_subtitle(segment):
+    """Subtitle dict of a faster-whisper segment, keeping its confidence scores."""
+    subtitle = {
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text.strip()
+    }
+    for score in ("avg_logprob", "no_speech_prob", "compression_ratio"):
+        if hasattr(segment, score):
+            subtitle[score] = getattr(segment, score)
+    return subtitle
+
+def transcribe_audio(audio_path, model_size="base", on_segments=None, on_info=None, **options):
+    """Transcribe a file into a list of {start, end, text} subtitles ([] on error).
+
+    JobCancelled raised by a callback is not an error: it stops the
+    transcription and is passed on to the caller.
+
+    Subtitles also carry the segment's avg_logprob, no_speech_prob and
+    compression_ratio, which refine.py uses to find weak segments.
+
+    Segments come out of faster-whisper lazily. When given, on_segments is
+    called with each new batch of subtitles and the audio duration in seconds
+    while transcription is still running, and on_info once with the audio
+    duration and the seconds of it left after VAD. `options` are passed on
+    to run_whisper (engine, batch_size, vad, vad_threshold, min_silence_ms).
+    The model runs with this transcription's share of the CPU cores.
+    """
     try:
-        # Use translate mode to force English output
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
-        
-        segments, _ = model.transcribe(audio_path, beam_size=5, task="translate")
-        
-        subtitles = []
-        for segment in segments:
-            subtitles.append({
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text.strip()
-            })
-        
-        return subtitles
+        with core_allocator.reserve() as cpu_threads:
+            return _transcribe(audio_path, model_size, cpu_threads, on_segments, on_info, options)
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error during transcription: {e}")
         return []
 
+def _transcribe(audio_path, model_size, cpu_threads, on_segments, on_info, options):
+    model = model_cache.acquire(model_size, "int8", cpu_threads)
+    try:
+        segments, info = run_whisper(model, audio_path, **options)
+        if on_info:
+            on_info(info.duration, info.duration_after_vad)
+        
+        subtitles = []
+        batch = []
+        flushed_at = time.monotonic()
+        for segment in segments:
+            subtitle = segment_to_subtitle(segment)
+            subtitles.append(subtitle)
+            batch.append(subtitle)
+            if on_segments and (len(batch) >= SEGMENT_BATCH_SIZE
+                                or time.monotonic() - flushed_at >= SEGMENT_BATCH_SECONDS):
+                on_segments(batch, info.duration)
+                batch = []
+                flushed_at = time.monotonic()
+        if on_segments and batch:
+            on_segments(batch, info.duration)
+    finally:
+        model_cache.release(model_size, "int8", cpu_threads)
+    
+    return subtitles
+
 def seconds_to_srt_time(seconds):
     hours = int(seconds // 3600)
     minutes = int((seconds % 3600) // 60)
@@ -7,7 +7,10 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.environ.get('WEB_CONCURRENCY', 1))
-worker_class = "sync"
+# Threaded workers, so open /events streams do not each block a whole worker process.
+# At most EVENTS_MAX_STREAMS threads are held by streams; keep it well below `threads`.
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
 worker_connections = 1000
 timeout = 300  # Increased timeout for AI processing
 keepalive = 2
@@ -31,3 +34,11 @@ pidfile = None
 user = None
 group = None
 tmp_upload_dir = None
+
+# Server hooks
+def post_fork(server, worker):
+    # Job worker threads do not survive the fork from the preloaded master,
+    # start them (and recover jobs abandoned by a recycled worker) per process
+    from app import job_executor, INLINE_WORKERS
+    if INLINE_WORKERS:
+        job_executor.start()
@@ -0,0 +1,266 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+from db import DB_PATH, get_connection, promote_follower, decode_options
+from scheduler import (JOB_FAIR_WINDOW_SECONDS, JOB_USER_MAX_RUNNING, JOB_USER_WEIGHTS, job_cost, pick_next,
+                       schedule_order)
+
+# Number of jobs transcribed at the same time (defaults to one per CPU core)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', os.cpu_count() or 1))
+
+# Maximum number of jobs waiting for a worker before new submissions are rejected
+JOB_QUEUE_MAX_DEPTH = int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 100))
+
+# A claimed job is re-queued if its worker stops heartbeating for this long
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 60))
+
+# Jobs that keep losing their lease (e.g. crash the worker) are failed after this many attempts
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+
+# How often idle workers look for pending or expired jobs they were not notified about
+# (separate worker processes are never notified and rely on this)
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+
+# Queue positions are recomputed at least this often (waiting jobs age), and whenever the queue changes
+POSITION_CACHE_SECONDS = 5
+
+class JobExecutor:
+    """Runs background jobs on a fixed pool of worker threads.
+
+    The jobs table is the queue: 'pending' rows are claimed atomically, in the
+    order chosen by the scheduler (shortest job first, fair across users), with
+    a lease that a heartbeat thread keeps extending while the job runs. Rows
+    whose lease expired (the process died or was recycled) are put back to
+    'pending' and picked up again, so no work is lost across restarts.
+    """
+
+    def __init__(self, handler, db_path=DB_PATH, workers=JOB_WORKERS,
+                 max_depth=JOB_QUEUE_MAX_DEPTH, lease_seconds=JOB_LEASE_SECONDS):
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self._pid = os.getpid()
+        self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+        self._cond = threading.Condition()
+        self._threads = []
+        self._positions_lock = threading.Lock()
+        self._positions = None  # (queue fingerprint, computed at, {job_id: position})
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    def start(self):
+        """Recover abandoned jobs and start the worker and heartbeat threads.
+
+        Called after the server forks (threads do not survive a fork), and
+        lazily on the first notify().
+        """
+        with self._cond:
+            if os.getpid() != self._pid:
+                # Forked after construction, take a fresh identity
+                self._pid = os.getpid()
+                self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+                self._threads = []
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if self._threads:
+                return
+            self.requeue_expired()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            heartbeat = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+            heartbeat.start()
+            self._threads.append(heartbeat)
+
+    def notify(self):
+        """Wake a worker after a job has been inserted as 'pending'."""
+        self.start()
+        self._positions = None
+        with self._cond:
+            self._cond.notify()
+
+    def queue_state(self, conn):
+        """Pending leader jobs with their cost, plus running jobs and recent work per user, for the scheduler."""
+        pending = [dict(row, cost=job_cost(row['duration_seconds'], row['model_size']),
+                        deferred=row['admission_decision'] == 'upgrade')
+                   for row in conn.execute('''SELECT jobs.id, jobs.user_id, jobs.model_size, jobs.duration_seconds,
+                                                     jobs.admission_decision, users.username,
+                                                     (julianday('now') - julianday(jobs.created_at)) * 86400 AS waited
+                                              FROM jobs LEFT JOIN users ON users.id = jobs.user_id
+                                              WHERE jobs.status = 'pending' AND jobs.leader_job_id IS NULL''')]
+        running = {}
+        served = {}
+        for row in conn.execute('''SELECT user_id, status, model_size, duration_seconds FROM jobs
+                                   WHERE leader_job_id IS NULL
+                                     AND (status = 'processing'
+                                          OR (status IN ('completed', 'failed') AND completed_at >= datetime('now', ?)))''',
+                                (f'-{JOB_FAIR_WINDOW_SECONDS} seconds',)):
+            if row['status'] == 'processing':
+                running[row['user_id']] = running.get(row['user_id'], 0) + 1
+            served[row['user_id']] = served.get(row['user_id'], 0) + job_cost(row['duration_seconds'], row['model_size'])
+        weights = {job['user_id']: JOB_USER_WEIGHTS[job['username']]
+                   for job in pending if job['username'] in JOB_USER_WEIGHTS}
+        return pending, running, served, weights
+
+    def backlog_cost(self):
+        """Scheduler cost of the work ahead of a new job: pending jobs plus what is left of running ones."""
+        return self.load()[0]
+
+    def load(self):
+        """(backlog cost, pending jobs, running jobs) ahead of a new job, in every process sharing the queue."""
+        conn = self._connect()
+        total = 0
+        counts = {'pending': 0, 'processing': 0}
+        for row in conn.execute('''SELECT status, model_size, duration_seconds, progress_seconds FROM jobs
+                                   WHERE leader_job_id IS NULL AND admission_decision IS NOT 'upgrade'
+                                     AND status IN ('pending', 'processing')'''):
+            cost = job_cost(row['duration_seconds'], row['model_size'])
+            if row['status'] == 'processing' and row['duration_seconds'] and row['progress_seconds']:
+                cost *= max(0, 1 - row['progress_seconds'] / row['duration_seconds'])
+            total += cost
+            counts[row['status']] += 1
+        return total, counts['pending'], counts['processing']
+
+    def claim(self):
+        """Atomically move the pending job picked by the scheduler to 'processing' under our lease."""
+        conn = self._connect()
+        # The write lock keeps two workers from reading the same queue state
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            job = pick_next(*self.queue_state(conn), user_cap=JOB_USER_MAX_RUNNING or None)
+            claimed = None
+            if job is not None:
+                now = time.time()
+                claimed = conn.execute('''UPDATE jobs SET status = 'processing', lease_owner = ?, lease_expires_at = ?,
+                                                          attempts = COALESCE(attempts, 0) + 1, updated_at = ?
+                                          WHERE id = ? AND status = 'pending'
+                                          RETURNING id, url, model_size, job_type, file_path, options''',
+                                       (self.owner, now + self.lease_seconds, now, job['id'])).fetchone()
+            conn.commit()
+            if claimed is not None:
+                self._positions = None
+            return claimed
+        except Exception:
+            conn.rollback()
+            raise
+
+    def release(self, job_id):
+        conn = self._connect()
+        with conn:
+            conn.execute('''UPDATE jobs SET lease_owner = NULL, lease_expires_at = NULL
+                            WHERE id = ? AND lease_owner = ?''', (job_id, self.owner))
+
+    def requeue_expired(self):
+        """Put jobs whose worker stopped heartbeating back in the queue."""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            # Followers mirror their leader's status but hold no lease, so only
+            # leaders are checked here and followers are updated along with them
+            conn.execute('''UPDATE jobs SET status = 'failed', progress = '❌ Error: worker stopped repeatedly',
+                                            error_message = 'Job exceeded the maximum number of attempts',
+                                            lease_owner = NULL, lease_expires_at = NULL,
+                                            completed_at = CURRENT_TIMESTAMP, updated_at = ?
+                            WHERE (id IN (SELECT id FROM jobs
+                                          WHERE status = 'processing' AND leader_job_id IS NULL
+                                            AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                                            AND COALESCE(attempts, 0) >= ?)
+                                   OR leader_job_id IN (SELECT id FROM jobs
+                                                        WHERE status = 'processing' AND leader_job_id IS NULL
+                                                          AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                                                          AND COALESCE(attempts, 0) >= ?))
+                              AND status = 'processing' ''', (now, now, JOB_MAX_ATTEMPTS, now, JOB_MAX_ATTEMPTS))
+            requeued = conn.execute('''UPDATE jobs SET status = 'pending', progress = 'Re-queued after worker restart',
+                                                       lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                                       WHERE status = 'processing' AND leader_job_id IS NULL
+                                         AND (lease_expires_at IS NULL OR lease_expires_at < ?)''',
+                                    (now, now)).rowcount
+            conn.execute('''UPDATE jobs SET status = 'pending', progress = 'Re-queued after worker restart',
+                                            updated_at = ?
+                            WHERE status = 'processing'
+                              AND leader_job_id IN (SELECT id FROM jobs WHERE status = 'pending')''', (now,))
+            # A cancelled leader whose worker died hands its followers to a new leader
+            for row in conn.execute('''SELECT id FROM jobs
+                                       WHERE status = 'cancelled' AND lease_owner IS NOT NULL
+                                         AND lease_expires_at < ?''', (now,)).fetchall():
+                conn.execute('UPDATE jobs SET lease_owner = NULL, lease_expires_at = NULL WHERE id = ?', (row[0],))
+                if promote_follower(conn, row[0]):
+                    requeued += 1
+        if requeued:
+            print(f"♻️ Re-queued {requeued} job(s) with expired leases")
+        return requeued
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                conn = self._connect()
+                with conn:
+                    # Cancelled leaders keep running while followers wait for them
+                    conn.execute('''UPDATE jobs SET lease_expires_at = ?
+                                    WHERE lease_owner = ? AND status IN ('processing', 'cancelled')''',
+                                 (time.time() + self.lease_seconds, self.owner))
+            except Exception as e:
+                print(f"Warning: Job heartbeat failed: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                job = self.claim()
+                if job is None:
+                    self.requeue_expired()
+                    job = self.claim()
+            except Exception as e:
+                print(f"Warning: Could not claim job: {e}")
+                job = None
+
+            if job is None:
+                with self._cond:
+                    self._cond.wait(JOB_POLL_SECONDS)
+                continue
+
+            job_id, url, model_size, job_type, file_path, options = job
+            try:
+                self.handler(job_id, url, model_size, job_type, file_path, decode_options(options))
+            except Exception as e:
+                print(f"❌ Worker error for job {job_id}: {e}")
+            finally:
+                self.release(job_id)
+
+    def depth(self):
+        return self._connect().execute('''SELECT COUNT(*) FROM jobs
+                                          WHERE status = 'pending' AND leader_job_id IS NULL''').fetchone()[0]
+
+    def is_full(self):
+        return self.depth() >= self.max_depth
+
+    def _queue_fingerprint(self, conn):
+        # Changes when a job is queued, claimed, cancelled, re-queued or finishes, in any process
+        return tuple(conn.execute('''SELECT SUM(status = 'pending'), SUM(status = 'processing'),
+                                            MAX(CASE WHEN status = 'pending' THEN updated_at END)
+                                     FROM jobs WHERE status IN ('pending', 'processing')
+                                       AND leader_job_id IS NULL''').fetchone())
+
+    def position(self, job_id):
+        """Return the 1-based queue position of a pending job, or None if it is not waiting.
+
+        This is the scheduler's current order; it changes as other jobs arrive.
+        The order is computed once and shared by all callers until the queue
+        changes or POSITION_CACHE_SECONDS pass.
+        """
+        conn = self._connect()
+        fingerprint = self._queue_fingerprint(conn)
+        with self._positions_lock:
+            cached = self._positions
+            if (cached is None or cached[0] != fingerprint
+                    or time.monotonic() - cached[1] > POSITION_CACHE_SECONDS):
+                order = schedule_order(*self.queue_state(conn))
+                cached = self._positions = (fingerprint, time.monotonic(),
+                                            {job['id']: position for position, job in enumerate(order, 1)})
+        return cached[2].get(job_id)
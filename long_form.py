@@ -0,0 +1,159 @@
+"""
+Parallel transcription of long recordings.
+
+Audio longer than LONG_FORM_MIN_SECONDS is cut at its quietest points into
+chunks of roughly LONG_FORM_CHUNK_SECONDS, which are transcribed at the same
+time by a pool of worker processes. The mode is off unless LONG_FORM_PROCESSES
+is above 1. Every process loads its own copy of the model, so the pool is
+started for one job and shut down when the job ends, which frees them.
+Chunks are padded with LONG_FORM_OVERLAP_SECONDS of audio on each side so a
+word at a cut is heard by both neighbours; when stitching, a segment is only
+kept by the chunk that owns its midpoint, and its timestamps are shifted by
+the chunk's offset.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from faster_whisper import decode_audio
+
+from audio_prep import SAMPLE_RATE
+from cpu_partition import core_allocator
+from gen import JobCancelled
+
+# Recordings at least this long are transcribed in parallel chunks
+LONG_FORM_MIN_SECONDS = float(os.environ.get('LONG_FORM_MIN_MINUTES', 30)) * 60
+
+# Processes that transcribe the chunks of one long-form job (each loads its own model; 1 disables the mode)
+LONG_FORM_PROCESSES = int(os.environ.get('LONG_FORM_PROCESSES', 1))
+
+# Target chunk length, and how far around each target the quietest cut point is searched for
+LONG_FORM_CHUNK_SECONDS = 300
+LONG_FORM_SEARCH_SECONDS = 20
+
+# Audio added on both sides of a cut so words spanning it are not lost
+LONG_FORM_OVERLAP_SECONDS = 1.0
+
+# Loudness is measured over 20 ms frames, smoothed over half a second
+_FRAME_SECONDS = 0.02
+_SMOOTH_FRAMES = 25
+
+def use_long_form(duration, processes=LONG_FORM_PROCESSES):
+    return processes > 1 and duration >= LONG_FORM_MIN_SECONDS
+
+def find_split_points(audio, chunk_seconds=LONG_FORM_CHUNK_SECONDS,
+                      search_seconds=LONG_FORM_SEARCH_SECONDS, sample_rate=SAMPLE_RATE):
+    """Sample offsets at which to cut `audio`, each at the quietest point near a chunk boundary."""
+    frame = int(sample_rate * _FRAME_SECONDS)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+    energy = np.square(audio[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    energy = np.convolve(energy, np.ones(_SMOOTH_FRAMES) / _SMOOTH_FRAMES, mode='same')
+
+    chunk_frames = int(chunk_seconds / _FRAME_SECONDS)
+    search_frames = int(search_seconds / _FRAME_SECONDS)
+    cuts = []
+    position = 0
+    # Stop once the rest fits in one chunk, so there is never a tiny last chunk
+    while n_frames - position > chunk_frames + search_frames:
+        low = max(position + 1, position + chunk_frames - search_frames)
+        high = min(n_frames, position + chunk_frames + search_frames)
+        position = low + int(np.argmin(energy[low:high]))
+        cuts.append(position * frame)
+    return cuts
+
+def plan_chunks(n_samples, cuts, overlap_seconds=LONG_FORM_OVERLAP_SECONDS, sample_rate=SAMPLE_RATE):
+    """Return (owned_start, owned_end, padded_start, padded_end) sample ranges for each chunk."""
+    overlap = int(overlap_seconds * sample_rate)
+    bounds = [0] + list(cuts) + [n_samples]
+    return [(start, end, max(0, start - overlap), min(n_samples, end + overlap))
+            for start, end in zip(bounds, bounds[1:])]
+
+def stitch_chunk(chunk, segments, previous=None, sample_rate=SAMPLE_RATE):
+    """Shift a chunk's segments to absolute time and keep the ones it owns.
+
+    `previous` is the last subtitle already kept; a segment repeating it
+    across the cut is dropped.
+    """
+    owned_start, owned_end, padded_start, _ = (value / sample_rate for value in chunk)
+    kept = []
+    for segment in segments:
+        start = segment['start'] + padded_start
+        end = segment['end'] + padded_start
+        if not owned_start <= (start + end) / 2 < owned_end:
+            continue
+        last = kept[-1] if kept else previous
+        if last is not None and segment['text'] == last['text'] and start < last['end']:
+            continue
+        kept.append(dict(segment, start=start, end=end))
+    return kept
+
+def _transcribe_chunk(audio, model_size, cpu_threads, options):
+    # Runs in a pool process, which loads the model once for all the job's chunks.
+    # Returns the chunk's subtitles and its seconds of speech after VAD.
+    from gen import model_cache, run_whisper, segment_to_subtitle
+
+    model = model_cache.acquire(model_size, "int8", cpu_threads)
+    try:
+        segments, info = run_whisper(model, audio, **options)
+        subtitles = [segment_to_subtitle(s) for s in segments]
+        return subtitles, info.duration_after_vad
+    finally:
+        model_cache.release(model_size, "int8", cpu_threads)
+
+def get_pool(processes=LONG_FORM_PROCESSES):
+    # Spawned, not forked: the parent runs threads (job workers, heartbeats)
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+def transcribe_long_audio(audio, model_size="base", on_segments=None, on_info=None,
+                          processes=LONG_FORM_PROCESSES, chunk_seconds=LONG_FORM_CHUNK_SECONDS, **options):
+    """Transcribe a file path or 16 kHz float32 array in parallel chunks.
+
+    Same contract as gen.transcribe_audio: returns {start, end, text}
+    subtitles ([] on error), reports each finished chunk, in order, to
+    on_segments(subtitles, duration), and the speech kept by VAD over all
+    chunks to on_info(duration, speech_seconds) at the end, and passes
+    JobCancelled from a callback on. The job's pool is shut down when it
+    returns.
+    """
+    pool = None
+    try:
+        with core_allocator.reserve() as threads:
+            if not isinstance(audio, np.ndarray):
+                audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+            duration = len(audio) / SAMPLE_RATE
+            chunks = plan_chunks(len(audio), find_split_points(audio, chunk_seconds))
+            # The pool processes split this job's share of the cores: at most one process per reserved thread
+            processes = max(1, min(processes, threads))
+            cpu_threads = max(1, threads // processes)
+            print(f"✂️ Transcribing {duration / 60:.1f} min of audio in {len(chunks)} chunks on {processes} processes")
+
+            pool = get_pool(processes)
+            futures = [pool.submit(_transcribe_chunk, audio[padded_start:padded_end], model_size, cpu_threads, options)
+                       for _, _, padded_start, padded_end in chunks]
+
+            subtitles = []
+            speech_seconds = 0
+            # Chunks are collected in order so partial results are always a prefix
+            for chunk, future in zip(chunks, futures):
+                segments, chunk_speech = future.result()
+                speech_seconds += chunk_speech
+                kept = stitch_chunk(chunk, segments, subtitles[-1] if subtitles else None)
+                subtitles.extend(kept)
+                if on_segments and kept:
+                    on_segments(kept, duration)
+            if on_info:
+                # Overlapping padding is counted twice, never report more speech than audio
+                on_info(duration, min(speech_seconds, duration))
+            return subtitles
+    except JobCancelled:
+        raise
+    except Exception as e:
+        print(f"Error during long-form transcription: {e}")
+        return []
+    finally:
+        if pool is not None:
+            # Chunks not started yet are dropped; the processes exit, and their models with them
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,340 @@
+"""
+Versioned schema migrations for the SubtitleAI database.
+
+Migrations run in order at startup (db.init_db) and each applied version is
+recorded in schema_migrations. Every migration must be idempotent, because
+databases created before this framework existed may already contain some of
+the changes (they were applied by the one-off scripts in Tests/).
+
+To change the schema, append a new (version, name, function, online) entry to
+MIGRATIONS; never edit one that has already shipped. Regular migrations run
+inside a single write transaction. Online migrations (large backfills) run in
+small batches with a commit after each one, so they never hold the write lock
+for long and readers and job workers keep running while they progress.
+"""
+import re
+
+# Rows updated per transaction by online backfills
+BACKFILL_BATCH_SIZE = 1000
+
+def _column_names(conn, table):
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def _add_columns(conn, table, columns):
+    existing = _column_names(conn, table)
+    for column, definition in columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def backfill(conn, sql, batch_size=BACKFILL_BATCH_SIZE):
+    """Run a batched UPDATE until it stops matching rows.
+
+    `sql` must take the batch size as its only parameter and limit itself to
+    that many rows, e.g. UPDATE t SET ... WHERE rowid IN (SELECT rowid FROM t
+    WHERE <not yet backfilled> LIMIT ?).
+    """
+    total = 0
+    while True:
+        with conn:
+            updated = conn.execute(sql, (batch_size,)).rowcount
+        total += updated
+        if updated < batch_size:
+            return total
+
+def create_base_tables(conn):
+    # Users table
+    conn.execute('''CREATE TABLE IF NOT EXISTS users
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     username TEXT UNIQUE NOT NULL,
+                     email TEXT UNIQUE NOT NULL,
+                     password_hash TEXT NOT NULL,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Jobs table
+    conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                    (id TEXT PRIMARY KEY,
+                     user_id INTEGER NOT NULL,
+                     url TEXT,
+                     video_title TEXT,
+                     model_size TEXT DEFAULT 'base',
+                     status TEXT DEFAULT 'pending',
+                     progress TEXT,
+                     subtitle_content TEXT,
+                     error_message TEXT,
+                     job_type TEXT DEFAULT 'youtube',
+                     file_path TEXT,
+                     file_size INTEGER,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     completed_at TIMESTAMP,
+                     FOREIGN KEY (user_id) REFERENCES users (id))''')
+
+def add_upload_columns(conn):
+    # Previously Tests/migrate_db.py
+    _add_columns(conn, 'jobs', (('job_type', "TEXT DEFAULT 'youtube'"),
+                                ('file_path', 'TEXT'),
+                                ('file_size', 'INTEGER')))
+
+def allow_null_job_urls(conn):
+    # Previously Tests/fix_url_constraint.py. SQLite cannot drop a NOT NULL
+    # constraint in place, so rebuild the table keeping every column.
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone()[0]
+    if not re.search(r'\burl\s+TEXT\s+NOT\s+NULL', sql, re.IGNORECASE):
+        return
+    new_sql = re.sub(r'\burl\s+TEXT\s+NOT\s+NULL', 'url TEXT', sql, count=1, flags=re.IGNORECASE)
+    new_sql = re.sub(r'^CREATE TABLE\s+"?jobs"?', 'CREATE TABLE jobs_new', new_sql, count=1, flags=re.IGNORECASE)
+    columns = ', '.join(_column_names(conn, 'jobs'))
+    conn.execute(new_sql)
+    conn.execute(f'INSERT INTO jobs_new ({columns}) SELECT {columns} FROM jobs')
+    conn.execute('DROP TABLE jobs')
+    conn.execute('ALTER TABLE jobs_new RENAME TO jobs')
+
+def add_job_lease_columns(conn):
+    _add_columns(conn, 'jobs', (('lease_owner', 'TEXT'),
+                                ('lease_expires_at', 'REAL'),
+                                ('attempts', 'INTEGER DEFAULT 0')))
+
+def backfill_job_type(conn):
+    backfill(conn, '''UPDATE jobs SET job_type = 'youtube'
+                      WHERE rowid IN (SELECT rowid FROM jobs WHERE job_type IS NULL LIMIT ?)''')
+
+def index_jobs(conn):
+    # Dashboard listing (WHERE user_id = ? ORDER BY created_at DESC)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at)')
+    # Queue scans and status reporting (WHERE status = ? ORDER BY created_at)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)')
+
+def create_job_subtitles(conn):
+    # Subtitle bodies live outside the jobs row so listing and status queries
+    # never read (or page through) megabytes of SRT text
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_subtitles
+                    (job_id TEXT PRIMARY KEY,
+                     content TEXT NOT NULL,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     FOREIGN KEY (job_id) REFERENCES jobs (id))''')
+
+def move_subtitles_out_of_jobs(conn, batch_size=BACKFILL_BATCH_SIZE):
+    last_rowid = 0
+    while True:
+        with conn:
+            rows = conn.execute('''SELECT rowid, id FROM jobs
+                                   WHERE rowid > ? AND subtitle_content IS NOT NULL
+                                   ORDER BY rowid LIMIT ?''', (last_rowid, batch_size)).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            ids = [row[1] for row in rows]
+            placeholders = ', '.join('?' * len(ids))
+            conn.execute(f'''INSERT OR IGNORE INTO job_subtitles (job_id, content)
+                             SELECT id, subtitle_content FROM jobs WHERE id IN ({placeholders})''', ids)
+            conn.execute(f'UPDATE jobs SET subtitle_content = NULL WHERE id IN ({placeholders})', ids)
+
+def index_jobs_for_keyset_pagination(conn):
+    # Dashboard pages are ordered by (created_at, id); with id in the index the
+    # page boundary and the ordering are both served from the index
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user_created_id ON jobs (user_id, created_at, id)')
+    conn.execute('DROP INDEX IF EXISTS idx_jobs_user_created')
+
+def create_subtitle_cache(conn):
+    # Finished YouTube transcriptions, reused by later jobs for the same video
+    conn.execute('''CREATE TABLE IF NOT EXISTS subtitle_cache
+                    (video_id TEXT NOT NULL,
+                     model_size TEXT NOT NULL,
+                     task TEXT NOT NULL,
+                     content TEXT NOT NULL,
+                     segment_count INTEGER,
+                     video_title TEXT,
+                     size_bytes INTEGER NOT NULL,
+                     created_at REAL NOT NULL,
+                     last_used_at REAL NOT NULL,
+                     hits INTEGER DEFAULT 0,
+                     PRIMARY KEY (video_id, model_size, task))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_subtitle_cache_last_used ON subtitle_cache (last_used_at)')
+
+def add_job_coalescing_columns(conn):
+    # Identical in-flight YouTube jobs share one leader job's work
+    _add_columns(conn, 'jobs', (('video_id', 'TEXT'),
+                                ('leader_job_id', 'TEXT')))
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_video_model_status ON jobs (video_id, model_size, status)')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_jobs_leader ON jobs (leader_job_id)
+                    WHERE leader_job_id IS NOT NULL''')
+
+def add_job_updated_at(conn):
+    # Change feed for the dashboard event stream: every status or progress
+    # write stamps updated_at, so any process can find what changed since a point in time
+    _add_columns(conn, 'jobs', (('updated_at', 'REAL'),))
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)')
+
+def create_job_segments(conn):
+    # Subtitles saved while a job is still transcribing, served as partial SRT.
+    # Rows are deleted once the job finishes and job_subtitles holds the result.
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_segments
+                    (job_id TEXT NOT NULL,
+                     segment_index INTEGER NOT NULL,
+                     start REAL NOT NULL,
+                     end REAL NOT NULL,
+                     text TEXT NOT NULL,
+                     PRIMARY KEY (job_id, segment_index)) WITHOUT ROWID''')
+    _add_columns(conn, 'jobs', (('progress_seconds', 'REAL'),
+                                ('duration_seconds', 'REAL')))
+
+def add_job_options(conn):
+    # Per-job transcription settings (JSON), e.g. {"engine": "batched", "batch_size": 16}
+    _add_columns(conn, 'jobs', (('options', 'TEXT'),))
+
+def add_job_skipped_seconds(conn):
+    # Seconds of audio that voice activity detection dropped before decoding
+    _add_columns(conn, 'jobs', (('skipped_seconds', 'REAL'),))
+
+def add_job_audio_path(conn):
+    # Decoded 16 kHz audio of a job, reused by retries until it is purged
+    _add_columns(conn, 'jobs', (('audio_path', 'TEXT'),))
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_jobs_audio_completed ON jobs (completed_at)
+                    WHERE audio_path IS NOT NULL''')
+
+def create_upload_sessions(conn):
+    # Resumable uploads: a session is created up front and its chunks arrive one by one.
+    # Jobs remember the SHA-256 of their upload so identical files are not sent twice.
+    conn.execute('''CREATE TABLE IF NOT EXISTS upload_sessions
+                    (id TEXT PRIMARY KEY,
+                     user_id INTEGER NOT NULL,
+                     filename TEXT NOT NULL,
+                     file_size INTEGER NOT NULL,
+                     chunk_size INTEGER NOT NULL,
+                     sha256 TEXT,
+                     created_at REAL NOT NULL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_upload_sessions_user_sha ON upload_sessions (user_id, sha256)')
+    conn.execute('''CREATE TABLE IF NOT EXISTS upload_chunks
+                    (upload_id TEXT NOT NULL,
+                     chunk_index INTEGER NOT NULL,
+                     PRIMARY KEY (upload_id, chunk_index)) WITHOUT ROWID''')
+    _add_columns(conn, 'jobs', (('content_sha256', 'TEXT'),))
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_jobs_user_content ON jobs (user_id, content_sha256)
+                    WHERE content_sha256 IS NOT NULL''')
+
+def create_video_metadata(conn):
+    # YouTube titles, lengths and chosen audio streams, so repeat lookups skip pytubefix
+    conn.execute('''CREATE TABLE IF NOT EXISTS video_metadata
+                    (video_id TEXT PRIMARY KEY,
+                     title TEXT,
+                     length_seconds REAL,
+                     audio_url TEXT,
+                     audio_subtype TEXT,
+                     audio_bitrate INTEGER,
+                     audio_expires_at REAL,
+                     fetched_at REAL NOT NULL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_video_metadata_fetched ON video_metadata (fetched_at)')
+
+def add_job_admission_columns(conn):
+    # What admission control did with a job submitted under load: the model the user
+    # asked for, the decision ('downgraded', 'draft', 'upgrade') and why. An 'upgrade'
+    # job re-runs a draft (upgrade_of_job_id) with the requested model when the queue is idle.
+    _add_columns(conn, 'jobs', (('requested_model_size', 'TEXT'),
+                                ('admission_decision', 'TEXT'),
+                                ('admission_note', 'TEXT'),
+                                ('upgrade_of_job_id', 'TEXT')))
+
+def create_job_drafts(conn):
+    # Quick draft subtitles of two-pass jobs, kept after the refined version replaces them
+    conn.execute('''CREATE TABLE IF NOT EXISTS job_drafts
+                    (job_id TEXT PRIMARY KEY,
+                     content TEXT NOT NULL,
+                     model_size TEXT NOT NULL,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     FOREIGN KEY (job_id) REFERENCES jobs (id))''')
+    _add_columns(conn, 'jobs', (('draft_model_size', 'TEXT'),))
+
+def add_segment_confidence(conn):
+    # Segments of the finished subtitles with their confidence scores (JSON), used to
+    # re-transcribe only the weak ones; reprocessed_seconds is how much audio that took
+    _add_columns(conn, 'job_subtitles', (('segments', 'TEXT'),))
+    _add_columns(conn, 'jobs', (('reprocessed_seconds', 'REAL'),))
+
+def key_subtitle_cache_by_options(conn):
+    # Per-job VAD and engine settings change the transcript, so they are part of the
+    # cache key. Entries made before cannot tell which settings produced them and are dropped.
+    conn.execute('DROP TABLE IF EXISTS subtitle_cache')
+    conn.execute('''CREATE TABLE subtitle_cache
+                    (video_id TEXT NOT NULL,
+                     model_size TEXT NOT NULL,
+                     task TEXT NOT NULL,
+                     options TEXT NOT NULL DEFAULT '',
+                     content TEXT NOT NULL,
+                     segment_count INTEGER,
+                     video_title TEXT,
+                     size_bytes INTEGER NOT NULL,
+                     created_at REAL NOT NULL,
+                     last_used_at REAL NOT NULL,
+                     hits INTEGER DEFAULT 0,
+                     PRIMARY KEY (video_id, model_size, task, options))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_subtitle_cache_last_used ON subtitle_cache (last_used_at)')
+
+def add_cached_segments(conn):
+    # Scored segments of cached transcriptions, so jobs completed from the cache can be refined
+    _add_columns(conn, 'subtitle_cache', (('segments', 'TEXT'),))
+
+# (version, name, function, online)
+MIGRATIONS = [
+    (1, 'create users and jobs tables', create_base_tables, False),
+    (2, 'add upload columns to jobs', add_upload_columns, False),
+    (3, 'allow NULL url for upload jobs', allow_null_job_urls, False),
+    (4, 'add job queue lease columns', add_job_lease_columns, False),
+    (5, 'backfill job_type for old jobs', backfill_job_type, True),
+    (6, 'index jobs by user and status', index_jobs, False),
+    (7, 'create job_subtitles table', create_job_subtitles, False),
+    (8, 'move subtitle bodies to job_subtitles', move_subtitles_out_of_jobs, True),
+    (9, 'index jobs for keyset pagination', index_jobs_for_keyset_pagination, False),
+    (10, 'create subtitle_cache table', create_subtitle_cache, False),
+    (11, 'add job coalescing columns', add_job_coalescing_columns, False),
+    (12, 'add jobs.updated_at change feed column', add_job_updated_at, False),
+    (13, 'create job_segments table', create_job_segments, False),
+    (14, 'add jobs.options column', add_job_options, False),
+    (15, 'add jobs.skipped_seconds column', add_job_skipped_seconds, False),
+    (16, 'add jobs.audio_path column', add_job_audio_path, False),
+    (17, 'create upload_sessions tables', create_upload_sessions, False),
+    (18, 'create video_metadata table', create_video_metadata, False),
+    (19, 'add job admission columns', add_job_admission_columns, False),
+    (20, 'create job_drafts table', create_job_drafts, False),
+    (21, 'add segment confidence columns', add_segment_confidence, False),
+    (22, 'key subtitle_cache by transcription options', key_subtitle_cache_by_options, False),
+    (23, 'add subtitle_cache.segments column', add_cached_segments, False),
+]
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute('SELECT version FROM schema_migrations')}
+
+def migrate(conn):
+    """Apply all pending migrations and return the versions that were applied."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations
+                    (version INTEGER PRIMARY KEY,
+                     name TEXT NOT NULL,
+                     applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.commit()
+
+    applied = []
+    for version, name, function, online in MIGRATIONS:
+        if version in applied_versions(conn):
+            continue
+
+        if online:
+            function(conn)
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO schema_migrations (version, name) VALUES (?, ?)',
+                             (version, name))
+        else:
+            # Take the write lock first so concurrent processes starting up
+            # (web and workers) apply each migration exactly once
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                    conn.rollback()
+                    continue
+                function(conn)
+                conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        print(f"🗄️ Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
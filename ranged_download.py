@@ -0,0 +1,140 @@
+"""
+Parallel HTTP downloads with byte ranges, retries and resume.
+
+The file is split into DOWNLOAD_CHUNK_BYTES ranges fetched by
+DOWNLOAD_CONNECTIONS threads into a preallocated .part file. A failed or
+cut-off range is retried from the last byte received, with exponential
+backoff. Finished ranges are appended to a .chunks sidecar, so a download
+interrupted by a crash or a job retry resumes instead of starting over.
+Servers that ignore Range requests get a plain single-stream download.
+"""
+import http.client
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Parallel connections per download
+DOWNLOAD_CONNECTIONS = int(os.environ.get('DOWNLOAD_CONNECTIONS', 4))
+
+# Size of each range request (YouTube throttles single requests of more than ~10 MB)
+DOWNLOAD_CHUNK_BYTES = int(float(os.environ.get('DOWNLOAD_CHUNK_MB', 4)) * 1024 * 1024)
+
+# Attempts per range before the download fails
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', 4))
+
+DOWNLOAD_TIMEOUT_SECONDS = 30
+_READ_BYTES = 256 * 1024
+
+def _request(url, start=None, end=None):
+    request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    if start is not None:
+        request.add_header('Range', f'bytes={start}-{end}')
+    return urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+
+def probe(url):
+    """Return (size, supports_ranges) using a one-byte range request."""
+    with _request(url, 0, 0) as response:
+        content_range = response.headers.get('Content-Range', '')
+        if response.status == 206 and '/' in content_range and not content_range.endswith('/*'):
+            return int(content_range.rsplit('/', 1)[1]), True
+        length = response.headers.get('Content-Length')
+        return (int(length) if length else None), False
+
+def _with_retries(fetch, retries, what):
+    for attempt in range(1, retries + 1):
+        try:
+            return fetch()
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            # 4xx other than 429 will not get better by retrying
+            if isinstance(e, urllib.error.HTTPError) and 400 <= e.code < 500 and e.code != 429:
+                raise
+            if attempt == retries:
+                raise
+            print(f"Warning: {what} failed ({e}), retrying (attempt {attempt + 1}/{retries})")
+            time.sleep(min(2 ** attempt * 0.25, 8))
+
+def _fetch_range(url, part_path, start, end, retries):
+    received = 0
+
+    def fetch():
+        nonlocal received
+        # Continue from the last byte received by an earlier attempt
+        with _request(url, start + received, end) as response, open(part_path, 'r+b') as f:
+            if response.status != 206:
+                raise ValueError(f'expected a partial response, got HTTP {response.status}')
+            f.seek(start + received)
+            while True:
+                data = response.read(min(_READ_BYTES, end + 1 - start - received))
+                if not data:
+                    break
+                f.write(data)
+                received += len(data)
+        if received != end + 1 - start:
+            raise ValueError(f'range {start}-{end} ended after {received} bytes')
+
+    _with_retries(fetch, retries, f'Range {start}-{end}')
+
+def _fetch_whole(url, part_path, retries):
+    def fetch():
+        with _request(url) as response, open(part_path, 'wb') as f:
+            while True:
+                data = response.read(_READ_BYTES)
+                if not data:
+                    break
+                f.write(data)
+    _with_retries(fetch, retries, 'Download')
+
+def _load_done(chunks_path, part_path, size, chunk_bytes):
+    # Ranges finished by an earlier attempt. The sidecar starts with the chunk size it
+    # was written with, and is only trusted if that and the .part file size still match.
+    if not (os.path.exists(chunks_path) and os.path.exists(part_path) and os.path.getsize(part_path) == size):
+        return set()
+    with open(chunks_path) as f:
+        lines = f.read().split()
+    if not lines or lines[0] != f'chunk={chunk_bytes}':
+        return set()
+    return {int(line) for line in lines[1:] if line.isdigit()}
+
+def download(url, dest_path, size=None, connections=DOWNLOAD_CONNECTIONS, chunk_bytes=DOWNLOAD_CHUNK_BYTES,
+             retries=DOWNLOAD_RETRIES):
+    """Download `url` to `dest_path`, resuming a previous partial download of the same path."""
+    part_path = dest_path + '.part'
+    chunks_path = part_path + '.chunks'
+    supports_ranges = True
+    if size is None:
+        size, supports_ranges = _with_retries(lambda: probe(url), retries, 'Probe')
+
+    if not supports_ranges or not size:
+        _fetch_whole(url, part_path, retries)
+        os.replace(part_path, dest_path)
+        return dest_path
+
+    done = _load_done(chunks_path, part_path, size, chunk_bytes)
+    if not done:
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        with open(chunks_path, 'w') as f:
+            f.write(f'chunk={chunk_bytes}\n')
+
+    ranges = [(index, start, min(start + chunk_bytes, size) - 1)
+              for index, start in enumerate(range(0, size, chunk_bytes)) if index not in done]
+    if done:
+        print(f"⏯️ Resuming download, {len(done)} of {len(done) + len(ranges)} chunks already on disk")
+
+    lock = threading.Lock()
+
+    def fetch(index, start, end):
+        _fetch_range(url, part_path, start, end, retries)
+        with lock, open(chunks_path, 'a') as f:
+            f.write(f'{index}\n')
+
+    with ThreadPoolExecutor(max_workers=max(1, min(connections, len(ranges)))) as pool:
+        for future in [pool.submit(fetch, *r) for r in ranges]:
+            future.result()
+
+    os.replace(part_path, dest_path)
+    os.remove(chunks_path)
+    return dest_path
@@ -0,0 +1,86 @@
+"""
+Confidence-guided re-transcription of weak segments.
+
+faster-whisper scores every segment: a low avg_logprob means the decoder
+was unsure of the words, a high compression_ratio means repetitive output
+(a typical hallucination) and a high no_speech_prob with a low avg_logprob
+means text invented over noise. Upgrading a job re-decodes only the time
+ranges of such segments with a larger model and splices the new segments
+into the subtitles, instead of re-running the larger model over the whole
+file. Nearby weak segments are decoded together, with some audio around
+them for context; new segments are kept if their midpoint falls in the
+range they replace.
+"""
+import os
+
+from audio_prep import SAMPLE_RATE
+
+# A segment is weak below this average log probability...
+REFINE_MIN_LOGPROB = float(os.environ.get('REFINE_MIN_LOGPROB', -0.8))
+# ...above this compression ratio (repeated text)...
+REFINE_MAX_COMPRESSION_RATIO = float(os.environ.get('REFINE_MAX_COMPRESSION_RATIO', 2.4))
+# ...or above this no-speech probability while also below REFINE_MIN_LOGPROB / 2
+REFINE_MAX_NO_SPEECH_PROB = float(os.environ.get('REFINE_MAX_NO_SPEECH_PROB', 0.6))
+
+# Audio decoded before and after each weak range, for context
+REFINE_PADDING_SECONDS = 1.0
+# Weak ranges closer than this are decoded as one
+REFINE_MERGE_GAP_SECONDS = 3.0
+
+def is_weak(segment, min_logprob=REFINE_MIN_LOGPROB, max_compression=REFINE_MAX_COMPRESSION_RATIO,
+            max_no_speech=REFINE_MAX_NO_SPEECH_PROB):
+    logprob = segment.get('avg_logprob')
+    compression = segment.get('compression_ratio')
+    no_speech = segment.get('no_speech_prob')
+    if logprob is not None and logprob < min_logprob:
+        return True
+    if compression is not None and compression > max_compression:
+        return True
+    return (no_speech is not None and no_speech > max_no_speech
+            and logprob is not None and logprob < min_logprob / 2)
+
+def weak_ranges(segments, merge_gap=REFINE_MERGE_GAP_SECONDS, **thresholds):
+    """(start, end) time ranges covering the weak segments, nearby ones merged."""
+    ranges = []
+    for segment in segments:
+        if not is_weak(segment, **thresholds):
+            continue
+        if ranges and segment['start'] - ranges[-1][1] < merge_gap:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], segment['end']))
+        else:
+            ranges.append((segment['start'], segment['end']))
+    return ranges
+
+def splice(segments, start, end, replacement):
+    """Replace the segments whose midpoint lies in [start, end) with the replacement's segments there."""
+    def inside(segment):
+        return start <= (segment['start'] + segment['end']) / 2 < end
+    kept = [s for s in segments if not inside(s)] + [s for s in replacement if inside(s)]
+    return sorted(kept, key=lambda s: s['start'])
+
+def refine_subtitles(audio, segments, model_size, transcribe, padding=REFINE_PADDING_SECONDS, before_range=None,
+                     **options):
+    """Re-transcribe the weak ranges of `segments` with model_size.
+
+    `audio` is 16 kHz float32; transcribe(audio, model_size, **options) returns
+    subtitles timed from the start of the audio it gets (gen.transcribe_audio).
+    before_range, when given, is called before each range and may raise to stop.
+    Returns (subtitles, seconds of audio re-transcribed, number of ranges).
+    """
+    duration = len(audio) / SAMPLE_RATE
+    ranges = weak_ranges(segments)
+    reprocessed = 0.0
+    for start, end in ranges:
+        if before_range:
+            before_range()
+        slice_start = max(0.0, start - padding)
+        slice_end = min(duration, end + padding)
+        piece = audio[int(slice_start * SAMPLE_RATE):int(slice_end * SAMPLE_RATE)]
+        reprocessed += slice_end - slice_start
+        replacement = transcribe(piece, model_size, **options)
+        if not replacement:
+            # Nothing recognised (or an error): keep what the first model heard
+            continue
+        shifted = [dict(s, start=s['start'] + slice_start, end=s['end'] + slice_start) for s in replacement]
+        segments = splice(segments, start, end, shifted)
+    return segments, reprocessed, len(ranges)
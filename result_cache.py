@@ -0,0 +1,90 @@
+import json
+import os
+import time
+
+from db import get_connection
+from gen import DEFAULT_ENGINE, DEFAULT_BATCH_SIZE, VAD_FILTER, VAD_THRESHOLD, VAD_MIN_SILENCE_MS
+
+# Cached subtitles older than this are transcribed again
+SUBTITLE_CACHE_TTL_SECONDS = int(float(os.environ.get('SUBTITLE_CACHE_TTL_HOURS', 24 * 7)) * 3600)
+
+# Total size of cached subtitle bodies before least recently used entries are evicted
+SUBTITLE_CACHE_MAX_BYTES = int(float(os.environ.get('SUBTITLE_CACHE_MAX_MB', 256)) * 1024 * 1024)
+
+# Transcription options as the server would apply them when a job does not set them
+_DEFAULT_OPTIONS = {'engine': DEFAULT_ENGINE, 'batch_size': DEFAULT_BATCH_SIZE, 'vad': VAD_FILTER,
+                    'vad_threshold': VAD_THRESHOLD, 'min_silence_ms': VAD_MIN_SILENCE_MS}
+
+def options_key(options):
+    """Cache key part for a job's transcription options: '' for the defaults.
+
+    Settings equal to the default are left out, and two_pass is ignored since
+    it only adds a draft in front of the same final transcript.
+    """
+    changed = {key: value for key, value in (options or {}).items()
+               if key != 'two_pass' and _DEFAULT_OPTIONS.get(key, object()) != value}
+    return json.dumps(changed, sort_keys=True) if changed else ''
+
+def get_cached_result(video_id, model_size, task, options=None):
+    """Return the cached (content, segment_count, video_title, segments) row, or None on a miss.
+
+    segments is the list of scored subtitles, or None for entries stored without them.
+    """
+    if not video_id:
+        return None
+    key = (video_id, model_size, task, options_key(options))
+    conn = get_connection()
+    now = time.time()
+    row = conn.execute('''SELECT content, segment_count, video_title, segments, created_at FROM subtitle_cache
+                          WHERE video_id = ? AND model_size = ? AND task = ? AND options = ?''',
+                       key).fetchone()
+    if row is None:
+        return None
+    if row['created_at'] < now - SUBTITLE_CACHE_TTL_SECONDS:
+        with conn:
+            conn.execute('''DELETE FROM subtitle_cache
+                            WHERE video_id = ? AND model_size = ? AND task = ? AND options = ?''', key)
+        return None
+    with conn:
+        conn.execute('''UPDATE subtitle_cache SET last_used_at = ?, hits = hits + 1
+                        WHERE video_id = ? AND model_size = ? AND task = ? AND options = ?''',
+                     (now,) + key)
+    return dict(row, segments=json.loads(row['segments']) if row['segments'] else None)
+
+def store_result(video_id, model_size, task, content, segment_count, video_title=None, options=None,
+                 segments=None):
+    if not video_id or not content:
+        return
+    segments_json = json.dumps(segments) if segments else None
+    conn = get_connection()
+    now = time.time()
+    with conn:
+        conn.execute('''INSERT OR REPLACE INTO subtitle_cache
+                        (video_id, model_size, task, options, content, segment_count, video_title, segments,
+                         size_bytes, created_at, last_used_at, hits)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)''',
+                     (video_id, model_size, task, options_key(options), content, segment_count, video_title,
+                      segments_json, len(content.encode('utf-8')) + len(segments_json or ''), now, now))
+    evict()
+
+def evict(max_bytes=None):
+    """Drop expired entries, then least recently used ones until the cache fits its size budget."""
+    max_bytes = SUBTITLE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM subtitle_cache WHERE created_at < ?',
+                     (time.time() - SUBTITLE_CACHE_TTL_SECONDS,))
+        total = conn.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM subtitle_cache').fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        evicted = 0
+        for row in conn.execute('''SELECT video_id, model_size, task, options, size_bytes FROM subtitle_cache
+                                   ORDER BY last_used_at''').fetchall():
+            if total <= max_bytes:
+                break
+            conn.execute('''DELETE FROM subtitle_cache
+                            WHERE video_id = ? AND model_size = ? AND task = ? AND options = ?''',
+                         (row['video_id'], row['model_size'], row['task'], row['options']))
+            total -= row['size_bytes']
+            evicted += 1
+    return evicted
@@ -0,0 +1,84 @@
+"""
+Resumable chunked uploads.
+
+The browser hashes the file (SHA-256) and opens an upload session. If the
+user already uploaded the same file, the session is skipped: the earlier
+subtitles or decoded audio are reused. Otherwise the file is sent as
+numbered chunks of UPLOAD_SESSION_CHUNK_BYTES, each written at its offset
+in a preallocated .part file, so chunks can be retried or sent again after
+a network failure or a page reload without starting over. Finalizing
+checks that every chunk arrived and that the assembled file matches the
+hash, then the file becomes a normal upload job.
+"""
+import hashlib
+import os
+import shutil
+
+from audio_prep import remove_file
+from db import delete_upload_session, expired_upload_sessions
+from streaming_upload import UPLOAD_CHUNK_BYTES
+
+# Size of each chunk sent by the browser
+UPLOAD_SESSION_CHUNK_BYTES = int(float(os.environ.get('UPLOAD_SESSION_CHUNK_MB', 8)) * 1024 * 1024)
+
+# Unfinished upload sessions (and their partial files) are removed after this long
+UPLOAD_SESSION_TTL_SECONDS = float(os.environ.get('UPLOAD_SESSION_HOURS', 24)) * 3600
+
+def part_path(folder, upload_id):
+    return os.path.join(folder, f"{upload_id}.part")
+
+def chunk_count(file_size, chunk_size):
+    return max(1, -(-file_size // chunk_size))
+
+def chunk_length(upload, chunk_index):
+    """Expected size of a chunk: chunk_size, except for the last one."""
+    start = chunk_index * upload['chunk_size']
+    return min(upload['chunk_size'], upload['file_size'] - start)
+
+def create_part_file(folder, upload_id, file_size):
+    os.makedirs(folder, exist_ok=True)
+    with open(part_path(folder, upload_id), 'wb') as f:
+        f.truncate(file_size)
+
+def write_chunk(folder, upload, chunk_index, stream):
+    """Write one chunk from `stream` at its offset, reading at most UPLOAD_CHUNK_BYTES at a time."""
+    if not 0 <= chunk_index < chunk_count(upload['file_size'], upload['chunk_size']):
+        raise ValueError('Invalid chunk number')
+    expected = chunk_length(upload, chunk_index)
+    written = 0
+    with open(part_path(folder, upload['id']), 'r+b') as f:
+        f.seek(chunk_index * upload['chunk_size'])
+        while written < expected:
+            data = stream.read(min(UPLOAD_CHUNK_BYTES, expected - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+        if written != expected or stream.read(1):
+            raise ValueError(f'Chunk {chunk_index} must be exactly {expected} bytes')
+    return written
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def copy_decoded_audio(audio_path, name):
+    """Give a new job its own link to earlier decoded audio, so purging one job does not affect the other."""
+    dest = os.path.join(os.path.dirname(audio_path), f"{name}.f32")
+    try:
+        os.link(audio_path, dest)
+    except OSError:
+        shutil.copyfile(audio_path, dest)
+    return dest
+
+def purge_expired_sessions(folder, ttl_seconds=UPLOAD_SESSION_TTL_SECONDS):
+    expired = expired_upload_sessions(ttl_seconds)
+    for upload_id in expired:
+        remove_file(part_path(folder, upload_id))
+        delete_upload_session(upload_id)
+    if expired:
+        print(f"🧹 Removed {len(expired)} abandoned upload(s)")
+    return len(expired)
@@ -0,0 +1,130 @@
+"""
+Order in which pending jobs are claimed.
+
+Each job's cost is its media duration times a speed factor for its model.
+Users are served by weighted fair queuing: a user's share is the cost of
+their running jobs plus what they had transcribed in the last
+JOB_FAIR_WINDOW_SECONDS, divided by their weight. The job claimed next is
+the one that would finish first in virtual time (share + cost / weight), so
+short jobs go first and one user's backlog of long videos cannot starve
+everyone else. With JOB_USER_MAX_RUNNING set, no user runs more jobs than
+that at once, so with fewer than the number of workers, a worker stays free
+for short jobs even while one user's long jobs occupy the rest. A job's
+cost shrinks the longer it waits, so long jobs are not postponed forever.
+Deferred jobs (full-quality upgrades of drafts made under load) only run
+when no other job is waiting.
+
+pick_next is a pure function so the policy can be simulated in tests.
+"""
+import heapq
+import os
+from collections import deque
+
+# Relative transcription time per second of audio, by model size
+MODEL_COST_FACTORS = {
+    "tiny": 0.5,
+    "base": 1.0,
+    "small": 3.0,
+    "medium": 8.0,
+    "large-v1": 16.0,
+    "large-v2": 16.0,
+    "large-v3": 16.0,
+}
+
+# Assumed media duration of jobs whose length is not known
+DEFAULT_JOB_SECONDS = 600
+
+# Jobs one user may have running at once, across all worker processes (0: no limit)
+JOB_USER_MAX_RUNNING = int(os.environ.get('JOB_USER_MAX_RUNNING', 0))
+
+# Work finished this long ago no longer counts against a user's share
+JOB_FAIR_WINDOW_SECONDS = int(os.environ.get('JOB_FAIR_WINDOW_SECONDS', 3600))
+
+# A job that has waited this long is treated as half its cost (a third after twice as long, ...)
+JOB_AGING_SECONDS = int(os.environ.get('JOB_AGING_SECONDS', 1800))
+
+def parse_weights(value):
+    """'alice:2,bob:0.5' -> {'alice': 2.0, 'bob': 0.5}"""
+    weights = {}
+    for item in (value or '').split(','):
+        name, _, weight = item.strip().rpartition(':')
+        if name:
+            weights[name] = float(weight)
+    return weights
+
+# Scheduling weight per username (default 1): a weight-2 user gets twice the share
+JOB_USER_WEIGHTS = parse_weights(os.environ.get('JOB_USER_WEIGHTS'))
+
+def job_cost(duration_seconds, model_size):
+    duration = duration_seconds if duration_seconds else DEFAULT_JOB_SECONDS
+    return duration * MODEL_COST_FACTORS.get(model_size, 1.0)
+
+def pick_next(pending, running, served, weights=None, user_cap=None, aging_seconds=JOB_AGING_SECONDS):
+    """Choose the job to claim next, or None if every waiting user is at their cap.
+
+    pending: jobs with 'id', 'user_id', 'cost', 'waited' (seconds in the queue) and optionally 'deferred'
+    running: {user_id: number of running jobs}
+    served: {user_id: cost of running and recently finished jobs}
+    weights: {user_id: weight}, 1 for users not listed
+    user_cap: running jobs allowed per user (None: no cap)
+    """
+    if not pending:
+        return None
+    weights = weights or {}
+    pending = [job for job in pending if not job.get('deferred')] or pending
+
+    def aged_cost(job):
+        return job['cost'] / (1 + max(0, job['waited']) / aging_seconds)
+
+    by_user = {}
+    for job in pending:
+        by_user.setdefault(job['user_id'], []).append(job)
+    users = [user for user in by_user if user_cap is None or running.get(user, 0) < user_cap]
+    if not users:
+        return None
+
+    def virtual_finish(job):
+        weight = weights.get(job['user_id'], 1.0)
+        return (served.get(job['user_id'], 0) + aged_cost(job)) / weight
+
+    candidates = [min(by_user[user], key=aged_cost) for user in users]
+    return min(candidates, key=lambda job: (virtual_finish(job), -job['waited']))
+
+def schedule_order(pending, running, served, weights=None, aging_seconds=JOB_AGING_SECONDS):
+    """All pending jobs in the order they would be claimed if nothing else changed.
+
+    Caps are ignored: they delay a job until the user's earlier jobs finish,
+    but do not change its place in line. Gives the same order as calling
+    pick_next repeatedly, in O(n log n): each user's jobs are sorted once, and
+    only the user just served has their place among the users updated.
+    """
+    weights = weights or {}
+    served = dict(served)
+
+    def aged_cost(job):
+        return job['cost'] / (1 + max(0, job['waited']) / aging_seconds)
+
+    order = []
+    # Deferred jobs only come after every other job
+    for group in ([job for job in pending if not job.get('deferred')], [job for job in pending if job.get('deferred')]):
+        by_user = {}
+        for job in group:
+            by_user.setdefault(job['user_id'], []).append(job)
+        queues = {user: deque(sorted(jobs, key=aged_cost)) for user, jobs in by_user.items()}
+        rank = {user: i for i, user in enumerate(by_user)}
+
+        def entry(user):
+            job = queues[user][0]
+            weight = weights.get(user, 1.0)
+            return ((served.get(user, 0) + aged_cost(job)) / weight, -job['waited'], rank[user], user)
+
+        heap = [entry(user) for user in queues]
+        heapq.heapify(heap)
+        while heap:
+            user = heapq.heappop(heap)[-1]
+            job = queues[user].popleft()
+            served[user] = served.get(user, 0) + job['cost']
+            order.append(job)
+            if queues[user]:
+                heapq.heappush(heap, entry(user))
+    return order
@@ -109,10 +109,121 @@ function setupFileUpload() {
     }
 }
 
-// File upload submission
+// SHA-256 computed incrementally over file slices, so large videos are never
+// read into memory at once (crypto.subtle has no streaming digest and is missing
+// on plain-HTTP origins)
+const SHA256_K = new Uint32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2
+]);
+
+class Sha256 {
+    constructor() {
+        this.h = new Uint32Array([0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+                                  0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]);
+        this.w = new Uint32Array(64);
+        this.buffer = new Uint8Array(64);
+        this.buffered = 0;
+        this.length = 0;
+    }
+
+    update(bytes) {
+        this.length += bytes.length;
+        let i = 0;
+        if (this.buffered > 0) {
+            const take = Math.min(64 - this.buffered, bytes.length);
+            this.buffer.set(bytes.subarray(0, take), this.buffered);
+            this.buffered += take;
+            i = take;
+            if (this.buffered < 64) return;
+            this.block(this.buffer, 0);
+            this.buffered = 0;
+        }
+        for (; i + 64 <= bytes.length; i += 64) {
+            this.block(bytes, i);
+        }
+        this.buffer.set(bytes.subarray(i), 0);
+        this.buffered = bytes.length - i;
+    }
+
+    block(bytes, offset) {
+        const w = this.w;
+        for (let t = 0; t < 16; t++) {
+            const j = offset + t * 4;
+            w[t] = (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+        }
+        for (let t = 16; t < 64; t++) {
+            const a = w[t - 15], b = w[t - 2];
+            const s0 = ((a >>> 7) | (a << 25)) ^ ((a >>> 18) | (a << 14)) ^ (a >>> 3);
+            const s1 = ((b >>> 17) | (b << 15)) ^ ((b >>> 19) | (b << 13)) ^ (b >>> 10);
+            w[t] = (w[t - 16] + s0 + w[t - 7] + s1) | 0;
+        }
+        let [a, b, c, d, e, f, g, h] = this.h;
+        for (let t = 0; t < 64; t++) {
+            const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+            const t1 = (h + S1 + ((e & f) ^ (~e & g)) + SHA256_K[t] + w[t]) | 0;
+            const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+            const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            h = g; g = f; f = e; e = (d + t1) | 0;
+            d = c; c = b; b = a; a = (t1 + t2) | 0;
+        }
+        const state = this.h;
+        state[0] += a; state[1] += b; state[2] += c; state[3] += d;
+        state[4] += e; state[5] += f; state[6] += g; state[7] += h;
+    }
+
+    hex() {
+        const bits = this.length * 8;
+        const padding = new Uint8Array(((this.buffered < 56 ? 56 : 120) - this.buffered) + 8);
+        padding[0] = 0x80;
+        const view = new DataView(padding.buffer);
+        view.setUint32(padding.length - 8, Math.floor(bits / 0x100000000));
+        view.setUint32(padding.length - 4, bits >>> 0);
+        this.update(padding);
+        return Array.from(this.h, word => word.toString(16).padStart(8, '0')).join('');
+    }
+}
+
+async function sha256File(file, onProgress) {
+    const hash = new Sha256();
+    const sliceSize = 4 * 1024 * 1024;
+    for (let offset = 0; offset < file.size; offset += sliceSize) {
+        const slice = file.slice(offset, offset + sliceSize);
+        hash.update(new Uint8Array(await slice.arrayBuffer()));
+        onProgress(Math.min(offset + sliceSize, file.size) / file.size);
+    }
+    return hash.hex();
+}
+
+// Send one chunk, retrying with backoff when the network drops
+async function putChunk(uploadId, index, blob) {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(`/uploads/${uploadId}/chunks/${index}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: blob
+            });
+            const result = await response.json();
+            if (result.success || response.status < 500 || attempt >= 5) return result;
+        } catch (error) {
+            if (attempt >= 5) throw error;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+    }
+}
+
+// File upload submission: hash the file, then upload only the chunks the server does not have yet
 async function submitUpload() {
     const fileInput = document.getElementById('video-file');
     const modelSize = document.getElementById('upload-model_size').value;
+    const engine = document.getElementById('upload-engine').value;
     const uploadBtn = document.getElementById('upload-btn');
     const progressContainer = document.getElementById('upload-progress');
     const progressFill = document.getElementById('progress-fill');
@@ -122,10 +233,14 @@ async function submitUpload() {
         showAlert('Please select a video file', 'error');
         return;
     }
+    const file = fileInput.files[0];
+    const settings = { model_size: modelSize, engine: engine };
     
-    const formData = new FormData();
-    formData.append('video_file', fileInput.files[0]);
-    formData.append('model_size', modelSize);
+    const showProgress = (label, fraction) => {
+        const percent = Math.round(fraction * 100);
+        progressFill.style.width = `${percent}%`;
+        progressText.textContent = `${label} ${percent}%`;
+    };
     
     // Disable button and show progress
     uploadBtn.disabled = true;
@@ -133,27 +248,53 @@ async function submitUpload() {
     progressContainer.style.display = 'block';
     
     try {
-        const response = await fetch('/submit-upload', {
+        const sha256 = await sha256File(file, fraction => showProgress('Checking file', fraction));
+        
+        const initResponse = await fetch('/uploads', {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size, sha256: sha256, ...settings })
         });
+        let result = await initResponse.json();
         
-        // Update progress (this is a simple progress simulation)
-        let progress = 0;
-        const progressInterval = setInterval(() => {
-            progress += 10;
-            progressFill.style.width = `${Math.min(progress, 90)}%`;
-            progressText.textContent = `${Math.min(progress, 90)}%`;
-        }, 200);
-        
-        const result = await response.json();
+        // Without a job yet, send the missing chunks and assemble them on the server
+        if (result.success && !result.job_id) {
+            const uploadId = result.upload_id;
+            const received = new Set(result.received);
+            let done = received.size;
+            showProgress('Uploading', done / result.chunk_count);
+            
+            for (let index = 0; index < result.chunk_count && result.success; index++) {
+                if (received.has(index)) continue;
+                const start = index * result.chunk_size;
+                const chunkResult = await putChunk(uploadId, index, file.slice(start, start + result.chunk_size));
+                if (!chunkResult.success) {
+                    result = chunkResult;
+                    break;
+                }
+                showProgress('Uploading', ++done / result.chunk_count);
+            }
+            
+            if (result.success) {
+                const finalizeResponse = await fetch(`/uploads/${uploadId}/finalize`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(settings)
+                });
+                result = await finalizeResponse.json();
+            }
+        }
         
-        clearInterval(progressInterval);
-        progressFill.style.width = '100%';
-        progressText.textContent = '100%';
+        showProgress('Done', 1);
         
         if (result.success) {
-            showAlert(`File uploaded successfully! Processing "${result.filename}" will begin shortly.`, 'success');
+            if (result.reused === 'subtitles') {
+                showAlert(`You already transcribed "${result.filename}", the subtitles are ready.`, 'success');
+            } else if (result.reused === 'audio') {
+                showAlert(`"${result.filename}" was uploaded before, processing starts without uploading it again.`, 'success');
+            } else {
+                showAlert(`File uploaded successfully! Processing "${result.filename}" will begin shortly.`, 'success');
+            }
             
             // Reset form
             fileInput.value = '';
@@ -171,7 +312,8 @@ async function submitUpload() {
         }
         
     } catch (error) {
-        showAlert(`Network error: ${error.message}`, 'error');
+        // Uploaded chunks are kept: submitting the same file again resumes where it stopped
+        showAlert(`Network error: ${error.message}. Submit the file again to resume.`, 'error');
         progressContainer.style.display = 'none';
     } finally {
         uploadBtn.disabled = false;
@@ -192,6 +334,9 @@ function formatFileSize(bytes) {
 async function submitJob() {
     const url = document.getElementById('videoUrl').value.trim();
     const modelSize = document.getElementById('modelSize').value;
+    const engine = document.getElementById('engine').value;
+    const allowDowngrade = document.getElementById('allowDowngrade').checked;
+    const twoPass = document.getElementById('twoPass').checked;
     const submitBtn = document.getElementById('submitBtn');
     const statusDiv = document.getElementById('jobStatus');
     
@@ -217,14 +362,26 @@ async function submitJob() {
             },
             body: JSON.stringify({
                 url: url,
-                model_size: modelSize
+                model_size: modelSize,
+                engine: engine,
+                allow_downgrade: allowDowngrade,
+                two_pass: twoPass
             })
         });
         
         const result = await response.json();
         
         if (result.success) {
-            showAlert('Job submitted successfully! Processing will begin shortly.', 'success');
+            if (result.cached) {
+                showAlert('Subtitles for this video were already available and are ready to download!', 'success');
+            } else if (result.admission) {
+                const later = result.upgrade_job_id ? ` The ${result.admission.requested_model_size} version will follow when the queue is idle.` : '';
+                showAlert(`${result.admission.note}.${later}`, 'success');
+            } else if (result.coalesced) {
+                showAlert('This video is already being processed, your job will share its result.', 'success');
+            } else {
+                showAlert('Job submitted successfully! Processing will begin shortly.', 'success');
+            }
             document.getElementById('videoUrl').value = '';
             
             // Refresh the page to show the new job
@@ -258,35 +415,57 @@ function showAlert(message, type) {
     }, 5000);
 }
 
-// Job status polling
-function startJobStatusPolling() {
-    const jobCards = document.querySelectorAll('.job-card[data-job-id]');
+// Job status updates: one event stream for all of the user's jobs
+function startJobEvents() {
+    const jobsList = document.getElementById('jobsList');
+    const hasActiveJobs = document.querySelectorAll(
+        '.job-card[data-status="pending"], .job-card[data-status="processing"]').length > 0;
     
-    jobCards.forEach(card => {
-        const jobId = card.dataset.jobId;
-        const status = card.dataset.status;
-        
-        if (status === 'pending' || status === 'processing') {
-            pollJobStatus(jobId, card);
-        }
-    });
+    if (!jobsList || !hasActiveJobs) {
+        return;
+    }
+    
+    const since = jobsList.dataset.eventsSince;
+    if (window.EventSource) {
+        const source = new EventSource(`/events?since=${since}`);
+        source.addEventListener('job', event => handleJobEvent(JSON.parse(event.data)));
+        source.onerror = () => {
+            // EventSource reconnects by itself unless the stream was refused (503 when the server is full)
+            if (source.readyState === EventSource.CLOSED) {
+                pollJobEvents(since);
+            }
+        };
+    } else {
+        pollJobEvents(since);
+    }
 }
 
-async function pollJobStatus(jobId, cardElement) {
+// Long-polling fallback for browsers without Server-Sent Events
+async function pollJobEvents(since) {
     try {
-        const response = await fetch(`/job-status/${jobId}`);
+        const response = await fetch(`/events/poll?since=${since}`);
         const result = await response.json();
         
         if (result.success) {
-            updateJobCard(cardElement, result);
-            
-            // Continue polling if still processing
-            if (result.status === 'pending' || result.status === 'processing') {
-                setTimeout(() => pollJobStatus(jobId, cardElement), 3000);
+            result.events.forEach(handleJobEvent);
+            if (result.retry_after) {
+                // The server has no thread to spare for a long poll, ask again later
+                setTimeout(() => pollJobEvents(result.since), result.retry_after * 1000);
+            } else {
+                pollJobEvents(result.since);
             }
         }
     } catch (error) {
-        console.error('Error polling job status:', error);
+        console.error('Error polling job events:', error);
+        setTimeout(() => pollJobEvents(since), 5000);
+    }
+}
+
+function handleJobEvent(jobData) {
+    const card = document.querySelector(`.job-card[data-job-id="${jobData.id}"]`);
+    if (card) {
+        card.dataset.status = jobData.status;
+        updateJobCard(card, jobData);
     }
 }
 
@@ -302,6 +481,9 @@ function updateJobCard(cardElement, jobData) {
     // Update progress
     if (progressElement) {
         progressElement.textContent = jobData.progress || '';
+        if (jobData.status === 'pending' && jobData.queue_position) {
+            progressElement.textContent = `⏳ Queued (position ${jobData.queue_position})`;
+        }
     }
     
     // Update video title if available
@@ -313,28 +495,86 @@ function updateJobCard(cardElement, jobData) {
     }
     
     // Update actions
+    const jobId = cardElement.dataset.jobId;
     if (jobData.status === 'completed') {
+        const draftLink = jobData.draft_model_size
+            ? `<a href="/download/${jobId}?version=draft" class="btn btn-secondary">📝 Draft (${jobData.draft_model_size})</a>`
+            : '';
         actionsElement.innerHTML = `
-            <a href="/download/${cardElement.dataset.jobId}" class="btn btn-success">
+            <a href="/download/${jobId}" class="btn btn-success">
                 📥 Download SRT
             </a>
+            ${draftLink}
         `;
     } else if (jobData.status === 'failed') {
         actionsElement.innerHTML = `
             <span style="color: #d32f2f; font-weight: 500;">❌ Failed</span>
         `;
+    } else if (jobData.status === 'cancelled') {
+        actionsElement.innerHTML = `
+            <span style="color: #616161; font-weight: 500;">🚫 Cancelled</span>
+        `;
+    } else if (jobData.status === 'processing') {
+        actionsElement.innerHTML = `
+            <span style="color: #1976d2; font-weight: 500;">
+                <span class="loading-spinner"></span>Processing...
+            </span>
+            ${jobData.draft_model_size ? `<a href="/download/${jobId}" class="btn btn-success">📝 Download draft</a>` : ''}
+            <a href="/jobs/${cardElement.dataset.jobId}/partial.srt" target="_blank" class="btn btn-secondary">👀 Preview so far</a>
+            <button class="btn btn-secondary" onclick="cancelJob('${cardElement.dataset.jobId}')">✖ Cancel</button>
+        `;
+    }
+}
+
+// Re-transcribe the low-confidence parts of a finished job with a larger model
+async function upgradeJob(jobId, modelSize = 'medium') {
+    try {
+        const response = await fetch(`/jobs/${jobId}/upgrade`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ model_size: modelSize })
+        });
+        const result = await response.json();
+        
+        if (!result.success) {
+            showAlert(`Error: ${result.error}`, 'error');
+        } else if (!result.job_id) {
+            showAlert(result.message, 'success');
+        } else {
+            const share = Math.round(result.weak_seconds * 100 / result.duration_seconds);
+            showAlert(`Re-transcribing ${result.weak_ranges} unclear part(s), about ${share}% of the audio.`, 'success');
+            setTimeout(() => {
+                window.location.reload();
+            }, 2000);
+        }
+    } catch (error) {
+        showAlert(`Network error: ${error.message}`, 'error');
     }
 }
 
-// Auto-refresh dashboard
-function setupAutoRefresh() {
-    const isDashboard = window.location.pathname === '/dashboard';
-    const hasActiveJobs = document.querySelectorAll('.status-pending, .status-processing').length > 0;
-    
-    if (isDashboard && hasActiveJobs) {
-        setTimeout(() => {
-            window.location.reload();
-        }, 30000); // Refresh every 30 seconds
+// Cancel a queued or running job
+async function cancelJob(jobId) {
+    if (!confirm('Cancel this job?')) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/cancel-job/${jobId}`, { method: 'POST' });
+        const result = await response.json();
+        
+        if (result.success) {
+            const card = document.querySelector(`.job-card[data-job-id="${jobId}"]`);
+            if (card) {
+                card.dataset.status = 'cancelled';
+                updateJobCard(card, { status: 'cancelled', progress: 'Cancelled by user' });
+            }
+        } else {
+            showAlert(result.error || 'Failed to cancel job', 'error');
+        }
+    } catch (error) {
+        showAlert('Network error. Please try again.', 'error');
     }
 }
 
@@ -395,11 +635,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Setup file upload functionality
     setupFileUpload();
     
-    // Start job status polling
-    startJobStatusPolling();
-    
-    // Setup auto-refresh
-    setupAutoRefresh();
+    // Subscribe to job status updates (replaces page auto-refresh and per-job polling)
+    startJobEvents();
     
     // Add event listeners
     const submitBtn = document.getElementById('submitBtn');
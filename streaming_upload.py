@@ -0,0 +1,167 @@
+"""
+Streaming ingestion of raw (non-multipart) video uploads.
+
+The request body is read in chunks of at most UPLOAD_CHUNK_BYTES and
+written straight to its final path, so the body is never buffered in memory
+or written to disk twice. While the upload is still arriving, a background
+thread demuxes the part of the file written so far and decodes its audio
+(see audio_prep), so extraction overlaps with the network transfer.
+Containers that keep their index at the end (non-faststart MP4) make the
+demuxer wait for the last bytes; fragmented MP4, WebM and MKV decode as
+they arrive. If incremental decoding fails, the job decodes the saved file
+as usual.
+"""
+import os
+import threading
+
+from audio_prep import AUDIO_FOLDER, extract_audio, remove_file
+
+# Largest piece of the request body read (and held in memory) at once
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_KB', 1024)) * 1024
+
+# Decode audio while the upload is still arriving (0 decodes once it is complete)
+UPLOAD_STREAM_DECODE = os.environ.get('UPLOAD_STREAM_DECODE', '1') != '0'
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadAborted(Exception):
+    pass
+
+class GrowingFile:
+    """Read-only, seekable view of a file that is still being written.
+
+    Reads past the bytes written so far block until more arrive; seeking
+    relative to the end waits for the total size, unless it was announced
+    up front (Content-Length).
+    """
+
+    def __init__(self, path, upload):
+        self.upload = upload
+        self.file = open(path, 'rb')
+        self.position = 0
+
+    def read(self, size=-1):
+        available = self.upload.wait_for(None if size < 0 else self.position + size)
+        end = available if size < 0 else min(available, self.position + size)
+        self.file.seek(self.position)
+        data = self.file.read(max(0, end - self.position))
+        self.position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_END:
+            offset += self.upload.total_size()
+        elif whence == os.SEEK_CUR:
+            offset += self.position
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self.file.close()
+
+class StreamingUpload:
+    """Writes an upload chunk by chunk, decoding its audio alongside."""
+
+    def __init__(self, file_path, expected_size=None, max_size=None, decode=UPLOAD_STREAM_DECODE):
+        self.file_path = file_path
+        self.expected_size = expected_size
+        self.max_size = max_size
+        self.written = 0
+        self.done = False
+        self.aborted = False
+        self.condition = threading.Condition()
+        self.out = open(file_path, 'wb')
+
+        self.audio_path = None
+        self.decode_error = None
+        self.decoder = None
+        if decode:
+            os.makedirs(AUDIO_FOLDER, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(file_path))[0]
+            self.audio_path = os.path.join(AUDIO_FOLDER, f"{stem}.f32")
+            self.decoder = threading.Thread(target=self._decode, daemon=True)
+            self.decoder.start()
+
+    def write_from(self, stream, chunk_bytes=UPLOAD_CHUNK_BYTES):
+        """Copy `stream` to the upload file, never reading more than `chunk_bytes` at once."""
+        try:
+            while True:
+                chunk = stream.read(chunk_bytes)
+                if not chunk:
+                    break
+                self.write(chunk)
+            self.finish()
+        except Exception:
+            self.abort()
+            raise
+        return self.written
+
+    def write(self, chunk):
+        if self.max_size is not None and self.written + len(chunk) > self.max_size:
+            raise UploadTooLarge(f'Upload exceeds {self.max_size // (1024 * 1024)} MB')
+        self.out.write(chunk)
+        self.out.flush()  # The decoder reads the file from another handle
+        with self.condition:
+            self.written += len(chunk)
+            self.condition.notify_all()
+
+    def finish(self):
+        self.out.close()
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def abort(self):
+        if not self.out.closed:
+            self.out.close()
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+        if self.decoder:
+            self.decoder.join()
+            remove_file(self.audio_path)
+            remove_file(self.audio_path + '.part')
+        remove_file(self.file_path)
+
+    def wait_for(self, size):
+        """Block until `size` bytes (or the whole upload, if None) are written; returns bytes available."""
+        with self.condition:
+            while not self.done and not self.aborted and (size is None or self.written < size):
+                self.condition.wait()
+            if self.aborted:
+                raise UploadAborted()
+            return self.written
+
+    def total_size(self):
+        if self.expected_size is not None:
+            return self.expected_size
+        return self.wait_for(None)
+
+    def _decode(self):
+        source = GrowingFile(self.file_path, self)
+        try:
+            extract_audio(source, self.audio_path)
+        except Exception as e:
+            self.decode_error = e
+        finally:
+            source.close()
+
+    def decoded_audio(self):
+        """Path of the audio decoded during the upload, or None if the job has to decode the file itself."""
+        if not self.decoder:
+            return None
+        self.decoder.join()
+        if self.decode_error is not None:
+            if not isinstance(self.decode_error, UploadAborted):
+                print(f"Warning: Could not decode audio during upload: {self.decode_error}")
+            remove_file(self.audio_path)
+            remove_file(self.audio_path + '.part')
+            return None
+        return self.audio_path
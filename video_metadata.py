@@ -0,0 +1,106 @@
+import os
+import time
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+from pytubefix.exceptions import VideoUnavailable, BotDetection, PoTokenRequired, LoginRequired
+
+from db import get_connection
+from gen import fetch_video, select_audio_stream, extract_video_id
+
+# Titles, lengths and chosen audio streams of YouTube videos are fetched again after this long
+VIDEO_METADATA_TTL_SECONDS = int(float(os.environ.get('VIDEO_METADATA_TTL_HOURS', 24)) * 3600)
+
+# Longest video accepted at submit time (0 accepts any length)
+YOUTUBE_MAX_SECONDS = float(os.environ.get('YOUTUBE_MAX_MINUTES', 0)) * 60
+
+# Signed stream URLs expire (usually after ~6 hours); stop using one this long before it does
+STREAM_URL_MARGIN_SECONDS = 30 * 60
+# Lifetime assumed for a stream URL that does not say when it expires
+STREAM_URL_DEFAULT_SECONDS = 5 * 3600
+
+# Raised by pytubefix for videos that exist but cannot be fetched right now; worth a retry later
+_TRANSIENT_ERRORS = (BotDetection, PoTokenRequired, LoginRequired)
+
+class VideoRejected(Exception):
+    """The video cannot be transcribed (private, removed, live, too long...)."""
+
+def _stream_expiry(url, fetched_at):
+    expire = parse_qs(urlparse(url).query).get('expire', [None])[0]
+    return float(expire) if expire and expire.isdigit() else fetched_at + STREAM_URL_DEFAULT_SECONDS
+
+def get_cached_metadata(video_id):
+    """Return the cached video_metadata row, or None on a miss or once it expired."""
+    if not video_id:
+        return None
+    conn = get_connection()
+    row = conn.execute('SELECT * FROM video_metadata WHERE video_id = ?', (video_id,)).fetchone()
+    if row is None:
+        return None
+    if row['fetched_at'] < time.time() - VIDEO_METADATA_TTL_SECONDS:
+        with conn:
+            conn.execute('DELETE FROM video_metadata WHERE video_id = ?', (video_id,))
+        return None
+    return row
+
+def store_metadata(video_id, title, length_seconds, stream=None):
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute('''INSERT OR REPLACE INTO video_metadata
+                        (video_id, title, length_seconds, audio_url, audio_subtype, audio_bitrate,
+                         audio_expires_at, fetched_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                     (video_id, title, length_seconds,
+                      stream.url if stream else None, stream.subtype if stream else None,
+                      stream.bitrate if stream else None, _stream_expiry(stream.url, now) if stream else None, now))
+        conn.execute('DELETE FROM video_metadata WHERE fetched_at < ?', (now - VIDEO_METADATA_TTL_SECONDS,))
+    return conn.execute('SELECT * FROM video_metadata WHERE video_id = ?', (video_id,)).fetchone()
+
+def lookup_video(url, refresh=False):
+    """Title, length and audio stream of a video: from the cache, or from one metadata request."""
+    video_id = extract_video_id(url)
+    cached = None if refresh else get_cached_metadata(video_id)
+    if cached is not None:
+        return cached
+    yt = fetch_video(url)
+    stream = select_audio_stream(yt.streams.filter(only_audio=True))
+    print(f"🔎 Fetched metadata of {video_id}: {yt.length}s")
+    return store_metadata(video_id, yt.title, yt.length, stream)
+
+def cached_audio_stream(metadata):
+    """The stream recorded in a metadata row, if its signed URL is still usable."""
+    if metadata is None or not metadata['audio_url']:
+        return None
+    if metadata['audio_expires_at'] < time.time() + STREAM_URL_MARGIN_SECONDS:
+        return None
+    return SimpleNamespace(url=metadata['audio_url'], subtype=metadata['audio_subtype'],
+                           bitrate=metadata['audio_bitrate'])
+
+def get_audio_stream(url):
+    """Audio stream to download, refreshing the cached metadata when its URL is about to expire."""
+    stream = cached_audio_stream(get_cached_metadata(extract_video_id(url)))
+    if stream is None:
+        stream = cached_audio_stream(lookup_video(url, refresh=True))
+    return stream
+
+def validate_video(url):
+    """Check a video before a job is queued; returns its metadata row, or None if YouTube could not be asked.
+
+    Raises VideoRejected for videos that can never be transcribed.
+    """
+    try:
+        metadata = lookup_video(url)
+    except _TRANSIENT_ERRORS as e:
+        print(f"Warning: Could not validate {url}: {e}")
+        return None
+    except VideoUnavailable as e:
+        raise VideoRejected(f'Video is not available: {e}')
+    except Exception as e:
+        print(f"Warning: Could not validate {url}: {e}")
+        return None
+    if not metadata['audio_url']:
+        raise VideoRejected('Video has no downloadable audio')
+    if YOUTUBE_MAX_SECONDS and (metadata['length_seconds'] or 0) > YOUTUBE_MAX_SECONDS:
+        raise VideoRejected(f'Video is longer than {YOUTUBE_MAX_SECONDS / 60:.0f} minutes')
+    return metadata
@@ -0,0 +1,80 @@
+"""
+Standalone transcription worker.
+
+Runs jobs from the SQLite job queue in separate processes so that CPU-heavy
+transcription does not share a process (GIL, memory) with the web workers.
+Start the web tier with JOB_INLINE_WORKERS=0 so it only enqueues jobs, then
+run one or more workers on the same host (same database and uploads folder):
+
+    python worker.py --processes 2 --threads 1
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+
+from cpu_partition import TRANSCRIBE_CPU_CORES, core_allocator
+from job_queue import JOB_WORKERS
+
+def share_cores(executor, processes, allocator=core_allocator, host_cores=TRANSCRIBE_CPU_CORES):
+    # Each process gets its part of the host's cores, split between its job threads
+    cores = max(1, host_cores // max(1, processes))
+    allocator.configure(cores=cores, slots=executor.workers, waiting=executor.depth)
+    return cores
+
+def run_worker_process(threads, processes=1):
+    # Import inside the child so every process gets its own model cache and executor
+    from app import process_subtitle_job
+    from db import DB_PATH
+    from job_queue import JobExecutor
+
+    executor = JobExecutor(process_subtitle_job, DB_PATH, workers=threads)
+    cores = share_cores(executor, processes)
+    executor.start()
+    print(f"👷 Transcription worker {os.getpid()} started with {threads} thread(s) on {cores} core(s)")
+
+    # The parent handles Ctrl+C and terminates its children
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: os._exit(0))
+    while True:
+        time.sleep(3600)
+
+def main():
+    parser = argparse.ArgumentParser(description='SubtitleAI Pro transcription worker')
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('WORKER_PROCESSES', 1)),
+                        help='number of worker processes (default: 1)')
+    parser.add_argument('--threads', type=int, default=JOB_WORKERS,
+                        help='jobs run concurrently by each process (default: JOB_WORKERS)')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = []
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"🚀 Starting {args.processes} transcription worker process(es)")
+    while not stopping:
+        # Keep the requested number of processes alive, replacing any that died.
+        # Jobs held by a dead process are re-queued once their lease expires.
+        processes = [p for p in processes if p.is_alive()]
+        while len(processes) < args.processes:
+            process = ctx.Process(target=run_worker_process, args=(args.threads, args.processes), daemon=True)
+            process.start()
+            processes.append(process)
+        time.sleep(1)
+
+    print("🛑 Stopping transcription workers...")
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(10)
+
+if __name__ == '__main__':
+    main()